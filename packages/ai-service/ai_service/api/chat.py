@@ -2,24 +2,48 @@
 Chat and vector search endpoints.
 """
 
-import json
 import time
+from typing import Dict, List, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
 from loguru import logger
+from starlette.background import BackgroundTask
 
+from ai_service.config.settings import settings
 from ai_service.models.chat import (
     ChatRequest,
     ChatResponse,
+    VectorSearchBatchRequest,
+    VectorSearchBatchResponse,
+    VectorSearchBatchResult,
     VectorSearchRequest,
     VectorSearchResponse,
 )
+from ai_service.services.admission import (
+    AdmissionRejected,
+    AdmissionTicket,
+    admission_controller,
+)
 from ai_service.services.rag import rag_pipeline
+from ai_service.utils.stream_framing import ENCODERS, MEDIA_TYPES, coalesce_events
 
 router = APIRouter()
 
 
+async def _admit(kind: str) -> AdmissionTicket:
+    """Acquire an admission slot or fail fast with 429/503 and Retry-After."""
+    try:
+        return await admission_controller.acquire(kind)
+    except AdmissionRejected as exc:
+        logger.warning(f"Rejected {kind} request: {exc.reason}")
+        raise HTTPException(
+            status_code=exc.status_code,
+            detail=exc.reason,
+            headers=exc.headers,
+        )
+
+
 @router.post("/chat", response_model=ChatResponse)
 async def chat(
     request: ChatRequest,
@@ -44,7 +68,8 @@ async def chat(
             )
         
         # Process through RAG pipeline
-        response = await rag_pipeline.process_chat_request(request)
+        async with await _admit("chat"):
+            response = await rag_pipeline.process_chat_request(request)
         
         logger.info(f"Chat request processed successfully in {response.response_time_ms}ms")
         return response
@@ -76,20 +101,111 @@ async def vector_search(request: VectorSearchRequest) -> VectorSearchResponse:
         return VectorSearchResponse(sources=[], took_ms=int((time.time() - start) * 1000))
 
 
+def _milliseconds(timings: Dict[str, float]) -> Dict[str, float]:
+    return {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+
+
+@router.post("/vector-search/batch", response_model=VectorSearchBatchResponse)
+async def vector_search_batch(
+    request: VectorSearchBatchRequest,
+) -> VectorSearchBatchResponse:
+    """Vector search for several queries (e.g. prefetched suggestions) at once.
+
+    The queries are embedded together and searched with one index query;
+    post-filtering runs per query. Results keep the order of ``queries``.
+    """
+    if len(request.queries) > settings.vector_search_batch_max:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.vector_search_batch_max} queries per batch",
+        )
+    if any(not query.strip() for query in request.queries):
+        raise HTTPException(status_code=400, detail="Queries cannot be empty")
+
+    start = time.time()
+    timings: Dict[str, float] = {}
+    query_timings: List[Dict[str, float]] = [{} for _ in request.queries]
+    batch = await rag_pipeline._retrieve_documents_batch(
+        request.queries,
+        top_k=request.top_k,
+        timings=timings,
+        query_timings=query_timings,
+    )
+    results = [
+        VectorSearchBatchResult(
+            query=query,
+            sources=rag_pipeline._create_source_references(chunks),
+            timings_ms=_milliseconds(stages),
+        )
+        for query, chunks, stages in zip(request.queries, batch, query_timings)
+    ]
+    return VectorSearchBatchResponse(
+        results=results,
+        timings_ms=_milliseconds(timings),
+        took_ms=int((time.time() - start) * 1000),
+    )
+
+
+def _stream_format(requested: Optional[str], accept: str) -> str:
+    """Pick the stream framing from ?format=, the Accept header or settings."""
+    if requested:
+        if requested not in ENCODERS:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Unsupported stream format '{requested}' "
+                    f"(use one of {sorted(ENCODERS)})"
+                ),
+            )
+        return requested
+    if MEDIA_TYPES["sse"] in accept:
+        return "sse"
+    return settings.stream_format if settings.stream_format in ENCODERS else "ndjson"
+
+
 @router.post("/chat/stream")
-async def chat_stream(request: ChatRequest) -> StreamingResponse:
-    """Stream chat response chunks for progressive UI."""
+async def chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    format: Optional[str] = Query(
+        default=None, description="Stream framing: ndjson or sse"
+    ),
+) -> StreamingResponse:
+    """Stream chat response chunks for progressive UI.
+
+    Events are NDJSON lines by default, or Server-Sent Events with
+    ``?format=sse`` / ``Accept: text/event-stream``. Consecutive token events
+    are merged and flushed every ``STREAM_FLUSH_INTERVAL_MS``.
+    """
 
     if not request.question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty")
 
+    stream_format = _stream_format(format, http_request.headers.get("accept", ""))
+
+    # Admit before the response starts so saturation maps to a status code
+    ticket = await _admit("stream")
+
     async def event_generator():
-        async for event in rag_pipeline.stream_chat(request):
-            yield json.dumps(event, ensure_ascii=False) + "\n"
+        try:
+            async for data in coalesce_events(
+                rag_pipeline.stream_chat(request),
+                encode=ENCODERS[stream_format],
+                flush_interval=settings.stream_flush_interval_ms / 1000,
+                flush_bytes=settings.stream_flush_bytes,
+            ):
+                yield data
+        finally:
+            ticket.release()
 
     headers = {"Cache-Control": "no-cache"}
+    if stream_format == "sse":
+        # Keep reverse proxies from buffering the event stream
+        headers["X-Accel-Buffering"] = "no"
     return StreamingResponse(
         event_generator(),
-        media_type="application/x-ndjson",
+        media_type=MEDIA_TYPES[stream_format],
         headers=headers,
+        # Also covers clients that disconnect before the body starts
+        background=BackgroundTask(ticket.release),
     )
@@ -2,13 +2,17 @@
 Health check and system information endpoints.
 """
 
-from typing import Dict, Any
+from typing import Any, Dict
 
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import ORJSONResponse
 from loguru import logger
 
+from ai_service.config.settings import settings
 from ai_service.models.chat import HealthResponse
+from ai_service.services.health_monitor import health_monitor
 from ai_service.services.rag import rag_pipeline
+
 from .dependencies import verify_api_key
 
 router = APIRouter()
@@ -16,52 +20,57 @@ router = APIRouter()
 
 @router.get("/health", response_model=HealthResponse)
 async def health_check() -> HealthResponse:
-    """Check the health of all services."""
+    """Report service health from the cached background check."""
     try:
-        # Get system info from RAG pipeline
-        system_info = await rag_pipeline.get_system_info()
-        
-        # Determine overall status
-        vector_status = "healthy"
-        llm_status = "healthy"
-        
-        if "error" in system_info:
-            vector_status = "unhealthy"
-            llm_status = "unhealthy"
-        else:
-            vector_stats = system_info.get("vector_store", {})
-            llm_health = system_info.get("llm_service", {})
-            
-            if "error" in vector_stats:
-                vector_status = "unhealthy"
-            
-            if llm_health.get("status") != "healthy":
-                llm_status = "unhealthy"
-        
-        # Count indexed documents
-        documents_indexed = 0
-        if vector_status == "healthy" and "vector_store" in system_info:
-            documents_indexed = system_info["vector_store"].get("total_documents", 0)
-        
+        snapshot = await health_monitor.get_snapshot()
         return HealthResponse(
-            status="healthy" if vector_status == "healthy" and llm_status == "healthy" else "degraded",
-            version="0.1.0",
-            vector_db_status=vector_status,
-            llm_status=llm_status,
-            documents_indexed=documents_indexed
+            status=snapshot.status,
+            version=settings.version,
+            vector_db_status=snapshot.vector_db_status,
+            llm_status=snapshot.llm_status,
+            documents_indexed=snapshot.documents_indexed,
+            checked_at=snapshot.checked_at,
+            age_seconds=round(snapshot.age_seconds, 3),
         )
-        
+
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         return HealthResponse(
             status="unhealthy",
-            version="0.1.0",
+            version=settings.version,
             vector_db_status="unknown",
             llm_status="unknown",
             documents_indexed=0
         )
 
 
+@router.get("/health/live")
+async def liveness() -> Dict[str, str]:
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "alive"}
+
+
+@router.get("/health/ready")
+async def readiness() -> ORJSONResponse:
+    """Readiness probe: the embedding model and vector store are usable.
+
+    Returns 503 while not ready. The LLM status is included for visibility
+    but does not affect readiness.
+    """
+    snapshot = await health_monitor.get_snapshot()
+    return ORJSONResponse(
+        status_code=200 if snapshot.ready else 503,
+        content={
+            "status": "ready" if snapshot.ready else "not_ready",
+            "vector_db_status": snapshot.vector_db_status,
+            "embedding_status": snapshot.embedding_status,
+            "llm_status": snapshot.llm_status,
+            "checked_at": snapshot.checked_at.isoformat(),
+            "age_seconds": round(snapshot.age_seconds, 3),
+        },
+    )
+
+
 @router.get("/system-info", dependencies=[Depends(verify_api_key)])
 async def get_system_info() -> Dict[str, Any]:
     """Get detailed system information."""
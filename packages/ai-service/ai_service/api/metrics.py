@@ -0,0 +1,18 @@
+"""
+Prometheus metrics endpoint.
+"""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ai_service.utils.metrics import registry
+
+router = APIRouter()
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    """Expose service metrics in the Prometheus text format."""
+    return PlainTextResponse(registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
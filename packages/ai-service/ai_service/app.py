@@ -5,20 +5,20 @@ Creates and configures the main application instance.
 
 from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.responses import ORJSONResponse
 from loguru import logger
 
+# Import routers
+from ai_service.api import admin, chat, conversations, health, metrics
 from ai_service.config.settings import settings
 from ai_service.models.chat import ErrorResponse
 from ai_service.services.embedding import embedding_service
-from ai_service.services.vector_store import vector_store
+from ai_service.services.health_monitor import health_monitor
 from ai_service.services.llm import llm_service
-
-# Import routers
-from ai_service.api import health, chat, conversations, admin
+from ai_service.services.vector_store import vector_store
 
 
 @asynccontextmanager
@@ -30,8 +30,13 @@ async def lifespan(app: FastAPI):
     try:
         # Initialize services
         await embedding_service.initialize()
+        if settings.rerank_enabled:
+            from ai_service.services.reranker import reranker_service
+
+            await reranker_service.initialize()
         await vector_store.initialize()
         await llm_service.initialize()
+        await health_monitor.start()
         
         logger.info("All services initialized successfully")
         yield
@@ -43,6 +48,7 @@ async def lifespan(app: FastAPI):
     finally:
         # Shutdown
         logger.info("Shutting down AI service...")
+        await health_monitor.stop()
         await llm_service.close()
 
 
@@ -82,6 +88,7 @@ def create_app() -> FastAPI:
 
     # Include routers
     app.include_router(health.router, tags=["Health"])
+    app.include_router(metrics.router, tags=["Metrics"])
     app.include_router(chat.router, prefix=settings.api_prefix, tags=["Chat"])
     app.include_router(conversations.router, prefix=settings.api_prefix, tags=["Conversations"])
     app.include_router(admin.router, prefix=settings.api_prefix, tags=["Admin"])
@@ -0,0 +1 @@
+"""Offline benchmark harnesses for the AI service."""
@@ -0,0 +1,150 @@
+"""
+Embedding backend benchmark.
+
+Loads the embedding model with each requested backend (``torch``, ``onnx``,
+``onnx-int8``) and reports load time, single-query latency percentiles,
+batch throughput and cosine agreement with the torch embeddings.
+"""
+
+from __future__ import annotations
+
+import json
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from ai_service.benchmarks.stats import current_commit, latency_summary
+from ai_service.config.settings import settings
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+DEFAULT_TEXTS = (
+    Path(__file__).resolve().parents[2] / "benchmarks" / "retrieval_sample.jsonl"
+)
+
+
+def load_texts(path: Path) -> List[str]:
+    """Read benchmark texts: ``question`` fields of a JSONL file, else lines."""
+    texts: List[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if not line.strip():
+            continue
+        if path.suffix == ".jsonl":
+            texts.append(json.loads(line)["question"])
+        else:
+            texts.append(line.strip())
+    return texts
+
+
+def _loader(backend: str, model_name: str) -> Callable[[], Any]:
+    if backend == "torch":
+        from ai_service.services.embedding import load_sentence_transformer
+
+        return lambda: load_sentence_transformer(model_name)
+    if backend in ("onnx", "onnx-int8"):
+        from ai_service.services.embedding_onnx import load_onnx_model
+
+        quantize = backend == "onnx-int8"
+        return lambda: load_onnx_model(model_name, quantize=quantize)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def benchmark_model(
+    model: Any, texts: Sequence[str], *, batch_size: int = 32, repeat: int = 3
+) -> Dict[str, Any]:
+    """Time single-text and batch ``encode`` calls; return stats and vectors."""
+    texts = list(texts)
+    model.encode(
+        texts[:batch_size], convert_to_numpy=True, batch_size=batch_size
+    )  # warmup
+
+    single_ms: List[float] = []
+    for _ in range(max(1, repeat)):
+        for text in texts:
+            start = time.perf_counter()
+            model.encode(text, convert_to_numpy=True)
+            single_ms.append((time.perf_counter() - start) * 1000)
+
+    batch_s: List[float] = []
+    vectors = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        vectors = model.encode(texts, convert_to_numpy=True, batch_size=batch_size)
+        batch_s.append(time.perf_counter() - start)
+
+    best = min(batch_s)
+    return {
+        "single_latency_ms": latency_summary(single_ms),
+        "batch_texts_per_s": round(len(texts) / best, 1) if best > 0 else 0.0,
+        "batch_seconds": round(best, 4),
+        "vectors": np.asarray(vectors, dtype=np.float32),
+    }
+
+
+def run_embedding_benchmark(
+    *,
+    backends: Sequence[str] = BACKENDS,
+    texts_path: Optional[Path] = None,
+    batch_size: int = 32,
+    repeat: int = 3,
+    output: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Benchmark each backend on the same texts.
+
+    Agreement is the cosine similarity of each backend's embeddings with the
+    torch ones, so it is reported only when ``torch`` is among ``backends``.
+    """
+    from ai_service.services.embedding_onnx import cosine_similarities
+
+    texts = load_texts(texts_path or DEFAULT_TEXTS)
+    if not texts:
+        raise ValueError(f"No benchmark texts found in {texts_path or DEFAULT_TEXTS}")
+
+    # torch first, so the others can be compared with it
+    ordered = sorted(backends, key=lambda backend: backend != "torch")
+    results: Dict[str, Dict[str, Any]] = {}
+    reference = None
+    for backend in ordered:
+        logger.info(f"Benchmarking {backend} embeddings on {len(texts)} texts")
+        start = time.perf_counter()
+        model = _loader(backend, settings.embedding_model)()
+        load_s = time.perf_counter() - start
+
+        result = benchmark_model(model, texts, batch_size=batch_size, repeat=repeat)
+        vectors = result.pop("vectors")
+        result["load_seconds"] = round(load_s, 3)
+        if backend == "torch":
+            reference = vectors
+        elif reference is not None:
+            agreement = cosine_similarities(vectors, reference)
+            result["cosine_vs_torch"] = {
+                "min": round(float(agreement.min()), 5),
+                "mean": round(float(agreement.mean()), 5),
+            }
+        results[backend] = result
+
+    report = {
+        "meta": {
+            "benchmark": "embedding",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": current_commit(),
+            "embedding_model": settings.embedding_model,
+            "texts": len(texts),
+            "batch_size": batch_size,
+            "repeat": max(1, repeat),
+        },
+        "summary": results,
+    }
+
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        logger.info(f"Wrote benchmark report to {output}")
+
+    return report
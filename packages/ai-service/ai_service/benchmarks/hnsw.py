@@ -0,0 +1,198 @@
+"""
+HNSW recall/latency sweep.
+
+Builds throwaway in-memory ChromaDB collections from the indexed embeddings
+(or synthetic vectors) for every combination of ``M``, ``construction_ef``
+and ``search_ef`` and reports recall@k against exact search together with
+build time and single-query latency, so an operating point can be chosen
+before applying it with ``ai-service index rebuild``.
+
+Queries are stored vectors with a little Gaussian noise, which keeps the
+benchmark free of the embedding model.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from loguru import logger
+
+from ai_service.benchmarks.stats import current_commit, latency_summary
+from ai_service.config.settings import settings
+
+
+def _unit_rows(array: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(array, axis=1, keepdims=True)
+    return (array / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def synthetic_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, roughly shaped like document embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, count // 50), dim))
+    labels = rng.integers(0, len(centers), count)
+    return _unit_rows(centers[labels] + 0.5 * rng.standard_normal((count, dim)))
+
+
+def sample_queries(
+    vectors: np.ndarray, count: int, noise: float = 0.05, seed: int = 0
+) -> np.ndarray:
+    """Perturbed copies of ``count`` random rows of ``vectors``."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(vectors), size=min(count, len(vectors)), replace=False)
+    return _unit_rows(
+        vectors[rows] + noise * rng.standard_normal((len(rows), vectors.shape[1]))
+    )
+
+
+def exact_neighbors(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    """Row indices of the ``k`` most cosine-similar vectors for each query."""
+    scores = queries @ vectors.T
+    k = min(k, vectors.shape[0])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(found: Sequence[Sequence[int]], exact: np.ndarray) -> float:
+    """Mean fraction of the exact neighbours that were returned."""
+    if not len(exact):
+        return 0.0
+    hits = [len(set(f) & set(e.tolist())) / len(e) for f, e in zip(found, exact)]
+    return float(np.mean(hits))
+
+
+def sweep(
+    vectors: np.ndarray,
+    queries: np.ndarray,
+    *,
+    m_values: Sequence[int],
+    construction_ef_values: Sequence[int],
+    search_ef_values: Sequence[int],
+    k: int = 10,
+) -> List[Dict[str, Any]]:
+    """Build and query one collection per parameter combination."""
+    import chromadb
+    from chromadb.config import Settings as ChromaSettings
+
+    client = chromadb.EphemeralClient(
+        settings=ChromaSettings(anonymized_telemetry=False, allow_reset=True)
+    )
+    exact = exact_neighbors(vectors, queries, k)
+    ids = [str(i) for i in range(len(vectors))]
+    embeddings = vectors.tolist()
+    query_rows = queries.tolist()
+
+    rows: List[Dict[str, Any]] = []
+    for m, construction_ef, search_ef in itertools.product(
+        m_values, construction_ef_values, search_ef_values
+    ):
+        name = f"hnsw-sweep-{uuid.uuid4().hex[:8]}"
+        collection = client.create_collection(
+            name=name,
+            metadata={
+                "hnsw:space": "cosine",
+                "hnsw:M": m,
+                "hnsw:construction_ef": construction_ef,
+                "hnsw:search_ef": search_ef,
+            },
+        )
+        start = time.perf_counter()
+        # Stay under ChromaDB's maximum batch size
+        for offset in range(0, len(ids), 5000):
+            collection.add(
+                ids=ids[offset : offset + 5000],
+                embeddings=embeddings[offset : offset + 5000],
+            )
+        build_s = time.perf_counter() - start
+
+        found: List[List[int]] = []
+        latencies_ms: List[float] = []
+        for query in query_rows:
+            start = time.perf_counter()
+            result = collection.query(
+                query_embeddings=[query], n_results=k, include=["distances"]
+            )
+            latencies_ms.append((time.perf_counter() - start) * 1000)
+            found.append([int(i) for i in result["ids"][0]])
+        client.delete_collection(name)
+
+        row = {
+            "M": m,
+            "construction_ef": construction_ef,
+            "search_ef": search_ef,
+            "build_seconds": round(build_s, 3),
+            f"recall@{k}": round(recall_at_k(found, exact), 4),
+            "latency_ms": latency_summary(latencies_ms),
+        }
+        logger.info(
+            f"M={m} construction_ef={construction_ef} search_ef={search_ef}: "
+            f"recall@{k}={row[f'recall@{k}']} p50={row['latency_ms']['p50']}ms"
+        )
+        rows.append(row)
+    return rows
+
+
+async def run_hnsw_benchmark(
+    *,
+    m_values: Sequence[int] = (8, 16, 32),
+    construction_ef_values: Sequence[int] = (100, 200),
+    search_ef_values: Sequence[int] = (10, 50, 100),
+    k: int = 10,
+    queries: int = 200,
+    synthetic: int = 0,
+    dim: int = 384,
+    seed: int = 0,
+    output: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Run the sweep over the current index, or ``synthetic`` random vectors."""
+    if synthetic:
+        vectors = synthetic_vectors(synthetic, dim, seed)
+        source = f"synthetic:{synthetic}x{dim}"
+    else:
+        from ai_service.services.vector_store import vector_store
+
+        _, vectors, _, _ = await vector_store.export_records()
+        vectors = _unit_rows(np.asarray(vectors, dtype=np.float32))
+        source = settings.collection_name
+    if not len(vectors):
+        raise ValueError("The index is empty; run ingestion first or use --synthetic")
+
+    query_vectors = sample_queries(vectors, queries, seed=seed)
+    rows = sweep(
+        vectors,
+        query_vectors,
+        m_values=m_values,
+        construction_ef_values=construction_ef_values,
+        search_ef_values=search_ef_values,
+        k=k,
+    )
+
+    report = {
+        "meta": {
+            "benchmark": "hnsw",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": current_commit(),
+            "source": source,
+            "vectors": int(len(vectors)),
+            "queries": int(len(query_vectors)),
+            "k": k,
+        },
+        "summary": rows,
+    }
+
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        logger.info(f"Wrote benchmark report to {output}")
+
+    return report
@@ -0,0 +1,200 @@
+"""
+Intent matching benchmark.
+
+Compares the compiled keyword matcher with the per-keyword substring scans
+it replaced (``any(keyword in text ...)`` per list), on benchmark queries
+and on chunks of the docs. Runs are repeated with extra synthetic keywords
+added to every class to show how each approach scales with the rule size.
+"""
+
+from __future__ import annotations
+
+import json
+import random
+import string
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Sequence
+
+from loguru import logger
+
+from ai_service.benchmarks.embedding import DEFAULT_TEXTS, load_texts
+from ai_service.benchmarks.stats import current_commit, latency_summary
+from ai_service.config.settings import settings
+from ai_service.services.intent import GENERAL_INTENT, IntentRules, load_intent_rules
+
+CHUNK_CHARS = 1000
+
+
+def load_chunks(docs_path: Path, chunk_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split the markdown files under ``docs_path`` into fixed-size chunks."""
+    chunks: List[str] = []
+    for path in sorted(docs_path.rglob("*.md")):
+        text = path.read_text(encoding="utf-8", errors="ignore")
+        chunks.extend(
+            text[i : i + chunk_chars] for i in range(0, len(text), chunk_chars)
+        )
+    return chunks
+
+
+def with_extra_keywords(
+    table: Mapping[str, List[str]], extra: int, seed: int = 0
+) -> Dict[str, List[str]]:
+    """Return ``table`` with ``extra`` random (non-matching) keywords per class."""
+    rng = random.Random(seed)
+    return {
+        name: list(keywords)
+        + ["".join(rng.choices(string.ascii_lowercase, k=10)) for _ in range(extra)]
+        for name, keywords in table.items()
+    }
+
+
+def substring_classify(intents: Mapping[str, List[str]], query: str) -> str:
+    """The previous classifier: one ``any(... in ...)`` per intent, in order."""
+    query_lower = query.lower()
+    for intent, keywords in intents.items():
+        if any(keyword in query_lower for keyword in keywords):
+            return intent
+    return GENERAL_INTENT
+
+
+def substring_matches(
+    table: Mapping[str, List[str]], text: str
+) -> Dict[str, FrozenSet[str]]:
+    """The previous content scan: every keyword of every class, one by one."""
+    text_lower = text.lower()
+    found: Dict[str, FrozenSet[str]] = {}
+    for name, keywords in table.items():
+        matched = frozenset(k for k in keywords if k in text_lower)
+        if matched:
+            found[name] = matched
+    return found
+
+
+def _time(
+    fn: Callable[[str], Any], texts: Sequence[str], repeat: int
+) -> Dict[str, Any]:
+    fn(texts[0])  # warmup
+    per_text_us: List[float] = []
+    outputs: List[Any] = []
+    for _ in range(max(1, repeat)):
+        outputs = []
+        for text in texts:
+            start = time.perf_counter()
+            outputs.append(fn(text))
+            per_text_us.append((time.perf_counter() - start) * 1e6)
+    return {"latency_us": latency_summary(per_text_us), "outputs": outputs}
+
+
+def _compare(
+    name: str,
+    baseline: Callable[[str], Any],
+    matcher: Callable[[str], Any],
+    texts: Sequence[str],
+    repeat: int,
+) -> Dict[str, Any]:
+    old = _time(baseline, texts, repeat)
+    new = _time(matcher, texts, repeat)
+    mismatches = sum(a != b for a, b in zip(old["outputs"], new["outputs"]))
+    if mismatches:
+        logger.warning(
+            f"{name}: matcher disagrees with substring scans on {mismatches} texts"
+        )
+    old_p50 = old["latency_us"]["p50"]
+    new_p50 = new["latency_us"]["p50"]
+    return {
+        "texts": len(texts),
+        "substring_us": old["latency_us"],
+        "matcher_us": new["latency_us"],
+        "speedup_p50": round(old_p50 / new_p50, 2) if new_p50 > 0 else None,
+        "mismatches": mismatches,
+    }
+
+
+def run_intent_benchmark(
+    *,
+    texts_path: Optional[Path] = None,
+    docs_path: Optional[Path] = None,
+    rules_path: Optional[Path] = None,
+    extra_keywords: Sequence[int] = (0, 100, 1000),
+    repeat: int = 3,
+    output: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Benchmark query classification and chunk keyword scans.
+
+    Each entry of ``extra_keywords`` is one run in which that many random
+    keywords are appended to every intent and content class. Outputs of both
+    approaches are compared; ``mismatches`` should always be 0.
+    """
+    queries = load_texts(texts_path or DEFAULT_TEXTS)
+    if not queries:
+        raise ValueError(f"No benchmark queries found in {texts_path or DEFAULT_TEXTS}")
+    docs_path = Path(docs_path or settings.docs_path)
+    chunks = load_chunks(docs_path) if docs_path.is_dir() else []
+    if not chunks:
+        logger.warning(
+            f"No markdown found under {docs_path}; only queries are benchmarked"
+        )
+
+    base = load_intent_rules(rules_path or settings.intent_rules_path)
+    intents = {name: base.query_matcher.keywords(name) for name in base.intents}
+    content = {
+        name: base.content_matcher.keywords(name)
+        for name in base.content_matcher.classes
+    }
+
+    summary: List[Dict[str, Any]] = []
+    for extra in extra_keywords:
+        run_intents = with_extra_keywords(intents, extra)
+        run_content = with_extra_keywords(content, extra, seed=1)
+        start = time.perf_counter()
+        rules = IntentRules(run_intents, run_content)
+        build_ms = (time.perf_counter() - start) * 1000
+        keyword_count = len(rules.query_matcher) + len(rules.content_matcher)
+        logger.info(f"Benchmarking {keyword_count} keywords")
+
+        row: Dict[str, Any] = {
+            "extra_keywords_per_class": extra,
+            "query_keywords": len(rules.query_matcher),
+            "content_keywords": len(rules.content_matcher),
+            "build_ms": round(build_ms, 3),
+            "classify": _compare(
+                "classify",
+                lambda q: substring_classify(run_intents, q),
+                rules.classify,
+                queries,
+                repeat,
+            ),
+        }
+        if chunks:
+            row["content"] = _compare(
+                "content",
+                lambda text: substring_matches(run_content, text),
+                rules.content_matches,
+                chunks,
+                repeat,
+            )
+        summary.append(row)
+
+    report = {
+        "meta": {
+            "benchmark": "intent",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": current_commit(),
+            "queries": len(queries),
+            "chunks": len(chunks),
+            "chunk_chars": CHUNK_CHARS,
+            "repeat": max(1, repeat),
+        },
+        "summary": summary,
+    }
+
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        logger.info(f"Wrote benchmark report to {output}")
+
+    return report
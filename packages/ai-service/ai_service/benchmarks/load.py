@@ -0,0 +1,293 @@
+"""
+Load generator for the chat endpoints.
+
+Drives ``/api/chat`` and ``/api/chat/stream`` with a configurable concurrency
+and endpoint/question mix, and reports throughput, latency, time-to-first-token
+and inter-token latency per endpoint. Pair it with the stub LLM server
+(``ai-service stub-llm``) to get a provider-independent baseline.
+
+Streams are requested as NDJSON. Tokens are counted from the streamed text,
+so the figures stay per token when the server coalesces tokens into frames.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+from loguru import logger
+
+from ai_service.benchmarks.stats import current_commit, latency_summary
+from ai_service.utils.tokens import count_tokens
+
+ENDPOINTS = {
+    "chat": "/api/chat",
+    "stream": "/api/chat/stream",
+}
+
+DEFAULT_QUESTIONS = [
+    "如何配置开发服务器代理？",
+    "什么是 HMR 热模块替换？",
+    "How do I configure path aliases in vite.config.ts?",
+    "Vite 6.0 有哪些新特性？",
+    "为什么要进行依赖预构建？",
+]
+
+
+@dataclass
+class EndpointStats:
+    """Raw samples collected for one endpoint."""
+
+    requests: int = 0
+    errors: int = 0
+    status_codes: Dict[str, int] = field(default_factory=dict)
+    latency_ms: List[float] = field(default_factory=list)
+    ttft_ms: List[float] = field(default_factory=list)
+    inter_token_ms: List[float] = field(default_factory=list)
+    tokens: int = 0
+
+    def summary(self, elapsed_s: float) -> Dict[str, Any]:
+        """Aggregate samples into the report format."""
+        report: Dict[str, Any] = {
+            "requests": self.requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / self.requests, 4)
+            if self.requests
+            else 0.0,
+            "status_codes": dict(sorted(self.status_codes.items())),
+            "throughput_rps": round(self.requests / elapsed_s, 3) if elapsed_s else 0.0,
+            "latency_ms": latency_summary(self.latency_ms),
+        }
+        if self.ttft_ms:
+            report["ttft_ms"] = latency_summary(self.ttft_ms)
+            report["inter_token_ms"] = latency_summary(self.inter_token_ms)
+            report["tokens_per_second"] = (
+                round(self.tokens / elapsed_s, 3) if elapsed_s else 0.0
+            )
+        return report
+
+
+def load_questions(path: Optional[Path]) -> List[str]:
+    """Load questions from JSONL (``question`` field) or plain text lines."""
+    if path is None:
+        return list(DEFAULT_QUESTIONS)
+
+    questions: List[str] = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            questions.append(json.loads(line)["question"])
+        else:
+            questions.append(line)
+    return questions
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parse an endpoint mix like ``"chat:1,stream:3"`` into weights."""
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, weight = part.partition(":")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(
+                f"Unknown endpoint '{name}', expected one of {sorted(ENDPOINTS)}"
+            )
+        mix[name] = float(weight) if weight else 1.0
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("Endpoint mix must contain at least one positive weight")
+    return mix
+
+
+async def _call_chat(
+    client: httpx.AsyncClient, question: str, stats: EndpointStats
+) -> None:
+    start = time.perf_counter()
+    status = "error"
+    try:
+        response = await client.post(ENDPOINTS["chat"], json={"question": question})
+        status = str(response.status_code)
+        ok = response.status_code == 200
+    except httpx.HTTPError:
+        ok = False
+    stats.latency_ms.append((time.perf_counter() - start) * 1000)
+    stats.requests += 1
+    stats.status_codes[status] = stats.status_codes.get(status, 0) + 1
+    if not ok:
+        stats.errors += 1
+
+
+async def _call_stream(
+    client: httpx.AsyncClient, question: str, stats: EndpointStats
+) -> None:
+    start = time.perf_counter()
+    status = "error"
+    ok = False
+    first_token: Optional[float] = None
+    last_token: Optional[float] = None
+    gaps: List[float] = []
+    tokens = 0
+    try:
+        # NDJSON regardless of the server's STREAM_FORMAT default
+        async with client.stream(
+            "POST",
+            ENDPOINTS["stream"],
+            json={"question": question},
+            params={"format": "ndjson"},
+        ) as response:
+            status = str(response.status_code)
+            ok = response.status_code == 200
+            async for line in response.aiter_lines():
+                line = line.strip()
+                if not line:
+                    continue
+                event = json.loads(line)
+                kind = event.get("type")
+                if kind == "token":
+                    now = time.perf_counter()
+                    # A frame may carry several coalesced tokens
+                    count = max(1, count_tokens(event.get("token") or ""))
+                    if first_token is None:
+                        first_token = now
+                    else:
+                        # Spread the frame's delay over the tokens it carries
+                        gap = (now - last_token) * 1000 / count
+                        gaps.extend([gap] * count)
+                    last_token = now
+                    tokens += count
+                elif kind == "error":
+                    ok = False
+    except (httpx.HTTPError, json.JSONDecodeError):
+        ok = False
+
+    stats.latency_ms.append((time.perf_counter() - start) * 1000)
+    stats.requests += 1
+    stats.status_codes[status] = stats.status_codes.get(status, 0) + 1
+    if not ok:
+        stats.errors += 1
+        return
+    if first_token is not None:
+        stats.ttft_ms.append((first_token - start) * 1000)
+        stats.inter_token_ms.extend(gaps)
+        stats.tokens += tokens
+
+
+async def run_load_test(
+    base_url: str,
+    *,
+    concurrency: int = 8,
+    requests: Optional[int] = 100,
+    duration_s: Optional[float] = None,
+    mix: Optional[Dict[str, float]] = None,
+    questions: Optional[Sequence[str]] = None,
+    timeout_s: float = 120.0,
+    seed: Optional[int] = None,
+    transport: Optional[httpx.AsyncBaseTransport] = None,
+) -> Dict[str, Any]:
+    """Generate load against the chat endpoints and summarize per endpoint.
+
+    The run stops after ``requests`` total requests or ``duration_s`` seconds,
+    whichever comes first (at least one of them must be set).
+
+    Args:
+        base_url: Service root URL, e.g. ``http://localhost:8000``
+        concurrency: Number of concurrent virtual users
+        requests: Total request budget across all users
+        duration_s: Wall-clock budget in seconds
+        mix: Endpoint weights, e.g. ``{"chat": 1, "stream": 3}``
+        questions: Question pool sampled uniformly
+        timeout_s: Per-request timeout
+        seed: Random seed for reproducible endpoint/question sequences
+        transport: Optional httpx transport (for in-process testing)
+    """
+    if requests is None and duration_s is None:
+        raise ValueError("Either requests or duration_s must be set")
+
+    mix = mix or {"chat": 1.0, "stream": 1.0}
+    questions = list(questions or DEFAULT_QUESTIONS)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    rng = random.Random(seed)
+    stats = {name: EndpointStats() for name in names}
+    callers = {"chat": _call_chat, "stream": _call_stream}
+
+    issued = 0
+    start = time.perf_counter()
+    deadline = start + duration_s if duration_s is not None else None
+
+    def next_job() -> Optional[tuple]:
+        nonlocal issued
+        if requests is not None and issued >= requests:
+            return None
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        issued += 1
+        return rng.choices(names, weights)[0], rng.choice(questions)
+
+    async def user(client: httpx.AsyncClient) -> None:
+        while (job := next_job()) is not None:
+            endpoint, question = job
+            await callers[endpoint](client, question, stats[endpoint])
+
+    limits = httpx.Limits(
+        max_connections=concurrency, max_keepalive_connections=concurrency
+    )
+    async with httpx.AsyncClient(
+        base_url=base_url, timeout=timeout_s, limits=limits, transport=transport
+    ) as client:
+        await asyncio.gather(*(user(client) for _ in range(max(1, concurrency))))
+
+    elapsed = time.perf_counter() - start
+    total_requests = sum(s.requests for s in stats.values())
+    return {
+        "meta": {
+            "benchmark": "load",
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "commit": current_commit(),
+            "base_url": base_url,
+            "concurrency": concurrency,
+            "mix": mix,
+            "questions": len(questions),
+        },
+        "summary": {
+            "elapsed_s": round(elapsed, 3),
+            "requests": total_requests,
+            "throughput_rps": round(total_requests / elapsed, 3) if elapsed else 0.0,
+            "endpoints": {name: s.summary(elapsed) for name, s in stats.items()},
+        },
+    }
+
+
+async def run_load_benchmark(
+    base_url: str,
+    *,
+    output: Optional[Path] = None,
+    questions_path: Optional[Path] = None,
+    mix_spec: str = "chat:1,stream:1",
+    **kwargs: Any,
+) -> Dict[str, Any]:
+    """CLI wrapper around :func:`run_load_test` that optionally writes JSON."""
+    report = await run_load_test(
+        base_url,
+        mix=parse_mix(mix_spec),
+        questions=load_questions(questions_path),
+        **kwargs,
+    )
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        logger.info(f"Wrote load test report to {output}")
+    return report
@@ -0,0 +1,282 @@
+"""
+Retrieval quality and latency benchmark.
+
+Runs a labelled question set through ``RAGPipeline._retrieve_documents`` and
+reports recall@k, MRR and per-stage latency percentiles. Results are written
+as JSON so runs can be compared across commits.
+"""
+
+from __future__ import annotations
+
+import json
+import tempfile
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from loguru import logger
+
+from ai_service.benchmarks.stats import current_commit, latency_summary
+from ai_service.config.settings import settings
+
+# Stages reported by the retrieval path, in pipeline order
+STAGES = ("embed", "query", "post_filter")
+
+
+@dataclass
+class BenchmarkCase:
+    """A benchmark question and the documents that should answer it."""
+
+    question: str
+    expected: List[str]
+
+
+def _normalize_path(path: str) -> str:
+    """Normalize a docs-relative path for comparison."""
+    normalized = path.replace("\\", "/")
+    while normalized.startswith("./"):
+        normalized = normalized[2:]
+    return normalized.lstrip("/")
+
+
+def load_cases(path: Path) -> List[BenchmarkCase]:
+    """Load benchmark cases from a JSONL or YAML file.
+
+    Each case has a ``question`` and ``expected`` document paths relative to
+    the docs root (a single path string is accepted). YAML files may contain
+    either a list of cases or a mapping with a ``cases`` list.
+    """
+    text = path.read_text(encoding="utf-8")
+    if path.suffix in (".yaml", ".yml"):
+        import yaml
+
+        raw = yaml.safe_load(text) or []
+        if isinstance(raw, dict):
+            raw = raw.get("cases", [])
+    else:
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    cases: List[BenchmarkCase] = []
+    for item in raw:
+        expected = item.get("expected") or []
+        if isinstance(expected, str):
+            expected = [expected]
+        cases.append(
+            BenchmarkCase(
+                question=item["question"],
+                expected=[_normalize_path(p) for p in expected],
+            )
+        )
+    return cases
+
+
+def recall_at_k(retrieved: Sequence[str], expected: Sequence[str], k: int) -> float:
+    """Fraction of expected documents found in the first ``k`` results."""
+    if not expected:
+        return 0.0
+    wanted = set(expected)
+    return len(wanted.intersection(retrieved[:k])) / len(wanted)
+
+
+def reciprocal_rank(retrieved: Sequence[str], expected: Sequence[str]) -> float:
+    """Reciprocal rank of the first expected document, 0 if none is found."""
+    wanted = set(expected)
+    for rank, path in enumerate(retrieved, 1):
+        if path in wanted:
+            return 1.0 / rank
+    return 0.0
+
+
+async def run_benchmark(
+    cases: Sequence[BenchmarkCase],
+    *,
+    pipeline: Any = None,
+    top_k: Optional[int] = None,
+    repeat: int = 1,
+    warmup: int = 1,
+) -> Dict[str, Any]:
+    """Run every case through retrieval and aggregate quality and latency.
+
+    Args:
+        cases: Labelled questions to evaluate
+        pipeline: Object exposing ``_retrieve_documents`` (defaults to the global
+            RAG pipeline)
+        top_k: ``top_k`` passed to retrieval; recall is reported for
+            k=1..min(top_k, MAX_RETRIEVED_CHUNKS)
+        repeat: Timed runs per case; quality is taken from the first run
+        warmup: Untimed runs before measuring, to load models and caches
+
+    Returns:
+        Report with ``summary`` and per-query ``queries`` sections
+    """
+    from ai_service.services.rag import MAX_RETRIEVED_CHUNKS, rag_pipeline
+
+    if pipeline is None:
+        pipeline = rag_pipeline
+
+    top_k = top_k or settings.retrieval_top_k
+    # Retrieval never returns more than MAX_RETRIEVED_CHUNKS; recall at a
+    # larger k would only repeat the value at the cap
+    ks = list(range(1, min(top_k, MAX_RETRIEVED_CHUNKS) + 1))
+
+    for case in list(cases)[:warmup]:
+        await pipeline._retrieve_documents(case.question, top_k=top_k)
+
+    total_ms: List[float] = []
+    stages = STAGES + (("rerank",) if settings.rerank_enabled else ())
+    stage_ms: Dict[str, List[float]] = {stage: [] for stage in stages}
+    recalls: Dict[int, List[float]] = {k: [] for k in ks}
+    reciprocal_ranks: List[float] = []
+    queries: List[Dict[str, Any]] = []
+
+    for case in cases:
+        retrieved: List[str] = []
+        case_ms: List[float] = []
+        for run in range(max(1, repeat)):
+            timings: Dict[str, float] = {}
+            start = time.perf_counter()
+            results = await pipeline._retrieve_documents(
+                case.question, top_k=top_k, timings=timings
+            )
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            case_ms.append(elapsed_ms)
+            total_ms.append(elapsed_ms)
+            for stage in stages:
+                stage_ms[stage].append(timings.get(stage, 0.0) * 1000)
+
+            if run == 0:
+                for chunk, _score in results:
+                    path = _normalize_path(chunk.relative_path)
+                    if path not in retrieved:
+                        retrieved.append(path)
+
+        case_recall = {k: recall_at_k(retrieved, case.expected, k) for k in ks}
+        for k, value in case_recall.items():
+            recalls[k].append(value)
+        rr = reciprocal_rank(retrieved, case.expected)
+        reciprocal_ranks.append(rr)
+
+        queries.append(
+            {
+                "question": case.question,
+                "expected": case.expected,
+                "retrieved": retrieved,
+                "reciprocal_rank": rr,
+                "recall": {f"@{k}": v for k, v in case_recall.items()},
+                "latency_ms": latency_summary(case_ms),
+            }
+        )
+
+    count = len(cases)
+    summary = {
+        "queries": count,
+        "runs_per_query": max(1, repeat),
+        "recall": {
+            f"@{k}": round(sum(values) / count, 4) if count else 0.0
+            for k, values in recalls.items()
+        },
+        "mrr": round(sum(reciprocal_ranks) / count, 4) if count else 0.0,
+        "latency_ms": {
+            "total": latency_summary(total_ms),
+            **{stage: latency_summary(values) for stage, values in stage_ms.items()},
+        },
+    }
+
+    return {
+        "meta": _collect_meta(top_k, MAX_RETRIEVED_CHUNKS),
+        "summary": summary,
+        "queries": queries,
+    }
+
+
+def _collect_meta(top_k: int, max_retrieved_chunks: int) -> Dict[str, Any]:
+    """Describe the configuration a report was produced with."""
+    return {
+        "benchmark": "retrieval",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "commit": current_commit(),
+        "top_k": top_k,
+        "max_retrieved_chunks": max_retrieved_chunks,
+        "similarity_threshold": settings.similarity_threshold,
+        "embedding_model": settings.embedding_model,
+        "chunk_unit": settings.chunk_unit,
+        "chunk_size": settings.chunk_size,
+        "chunk_overlap": settings.chunk_overlap,
+        "vector_db_type": settings.vector_db_type,
+    }
+
+
+# Settings redirected to the benchmark's own directory for the run
+BENCHMARK_PATH_SETTINGS = (
+    "docs_path",
+    "chromadb_path",
+    "numpy_index_path",
+    "snapshot_path",
+)
+
+
+async def run_retrieval_benchmark(
+    dataset: Path,
+    *,
+    docs_path: Optional[Path] = None,
+    index_dir: Optional[Path] = None,
+    top_k: Optional[int] = None,
+    repeat: int = 1,
+    output: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Index a docs fixture and benchmark retrieval against it.
+
+    The index is built in ``index_dir`` (a temporary directory by default) with
+    incremental ingestion, so repeated runs against the same directory only
+    re-embed changed files. Every backend's paths (ChromaDB, NumPy index and
+    snapshots) point into that directory for the run, so the configured
+    indexes are never read or written. Nothing is fetched from the network as
+    long as the embedding model is already in the local cache (set
+    ``HF_HUB_OFFLINE=1``) or ``EMBEDDING_MODEL`` points to a local directory.
+    """
+    from ai_service.services.ingestion import DocumentIngester
+    from ai_service.services.rag import RAGPipeline
+    from ai_service.services.vector_store import (
+        create_vector_store,
+        writable_vector_store,
+    )
+
+    cases = load_cases(dataset)
+    if not cases:
+        raise ValueError(f"No benchmark cases found in {dataset}")
+
+    docs_path = Path(docs_path or settings.docs_path)
+    saved = {name: getattr(settings, name) for name in BENCHMARK_PATH_SETTINGS}
+    try:
+        with tempfile.TemporaryDirectory(prefix="ai-service-bench-") as tmp_dir:
+            root = Path(index_dir or tmp_dir)
+            settings.docs_path = str(docs_path)
+            settings.chromadb_path = str(index_dir or root / "chroma_db")
+            settings.numpy_index_path = str(root / "numpy_index")
+            settings.snapshot_path = str(root / "snapshots")
+
+            # Stores built from the paths above, not the module-level globals
+            store = create_vector_store()
+            logger.info(f"Indexing {docs_path} into {root}")
+            await DocumentIngester(
+                str(docs_path), vector=writable_vector_store(store)
+            ).run_ingestion()
+
+            logger.info(f"Running {len(cases)} benchmark queries")
+            report = await run_benchmark(
+                cases, pipeline=RAGPipeline(vector=store), top_k=top_k, repeat=repeat
+            )
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+    if output is not None:
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(
+            json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8"
+        )
+        logger.info(f"Wrote benchmark report to {output}")
+
+    return report
@@ -0,0 +1,36 @@
+"""
+Summary statistics and report helpers shared by the benchmark harnesses.
+"""
+
+import subprocess
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+
+def latency_summary(values_ms: Sequence[float]) -> Dict[str, float]:
+    """Return mean and p50/p95/p99 of latencies in milliseconds."""
+    if not values_ms:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    arr = np.asarray(values_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "mean": round(float(arr.mean()), 3),
+        "p50": round(float(p50), 3),
+        "p95": round(float(p95), 3),
+        "p99": round(float(p99), 3),
+    }
+
+
+def current_commit() -> Optional[str]:
+    """Return the short git commit of the working tree, if available."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            timeout=5,
+        ).stdout.strip()
+    except Exception:
+        return None
@@ -0,0 +1,186 @@
+"""
+OpenAI-compatible stub LLM server for load testing.
+
+Serves ``/v1/chat/completions`` (streaming and non-streaming) with a
+configurable time-to-first-token, token rate and error rate, so the chat
+endpoints can be load-tested by pointing ``BASE_URL`` at it instead of a paid
+provider.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Dict, List
+
+import orjson
+from fastapi import FastAPI, Request
+from fastapi.responses import ORJSONResponse, StreamingResponse
+
+# Token pool cycled through to build completions (mixed English and Chinese)
+_VOCABULARY = (
+    "Vite uses native ES modules to serve source code during development . "
+    "使用 vite.config.ts 配置 开发 服务器 的 代理 与 别名 。 "
+    "The production build is bundled with Rollup for optimal output ."
+).split()
+
+
+@dataclass
+class StubConfig:
+    """Behaviour of the stub server."""
+
+    ttft_ms: float = 300.0
+    tokens_per_second: float = 50.0
+    completion_tokens: int = 200
+    error_rate: float = 0.0
+    # Share of injected errors returned as 429 instead of 500
+    rate_limit_share: float = 0.5
+    jitter: float = 0.1
+    seed: int | None = None
+
+
+def _stub_tokens(count: int, offset: int) -> List[str]:
+    """Deterministic token sequence of ``count`` items."""
+    size = len(_VOCABULARY)
+    return [_VOCABULARY[(offset + i) % size] + " " for i in range(count)]
+
+
+def _estimate_prompt_tokens(messages: List[Dict[str, Any]]) -> int:
+    """Rough prompt token estimate (about 4 characters per token)."""
+    chars = sum(len(str(m.get("content") or "")) for m in messages)
+    return max(1, chars // 4)
+
+
+def create_stub_app(config: StubConfig | None = None) -> FastAPI:
+    """Create the stub OpenAI-compatible application."""
+    config = config or StubConfig()
+    rng = random.Random(config.seed)
+    app = FastAPI(title="Stub LLM", default_response_class=ORJSONResponse)
+    app.state.stub_config = config
+
+    def jittered(seconds: float) -> float:
+        if config.jitter <= 0:
+            return seconds
+        return max(0.0, seconds * (1 + rng.uniform(-config.jitter, config.jitter)))
+
+    def injected_error() -> ORJSONResponse | None:
+        if config.error_rate <= 0 or rng.random() >= config.error_rate:
+            return None
+        if rng.random() < config.rate_limit_share:
+            status, kind, message = 429, "rate_limit_exceeded", "Rate limit reached"
+        else:
+            status, kind, message = 500, "server_error", "Injected stub failure"
+        headers = {"retry-after": "1"} if status == 429 else None
+        return ORJSONResponse(
+            status_code=status,
+            content={"error": {"message": message, "type": kind, "code": kind}},
+            headers=headers,
+        )
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        error = injected_error()
+        if error is not None:
+            return error
+
+        model = body.get("model") or "stub-model"
+        messages = body.get("messages") or []
+        max_tokens = body.get("max_tokens") or config.completion_tokens
+        count = max(1, min(int(max_tokens), config.completion_tokens))
+        tokens = _stub_tokens(count, offset=len(messages))
+        prompt_tokens = _estimate_prompt_tokens(messages)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": count,
+            "total_tokens": prompt_tokens + count,
+        }
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        created = int(time.time())
+        token_interval = (
+            1.0 / config.tokens_per_second if config.tokens_per_second > 0 else 0.0
+        )
+
+        if not body.get("stream"):
+            await asyncio.sleep(
+                jittered(config.ttft_ms / 1000 + token_interval * count)
+            )
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(tokens)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def frame(
+            delta: Dict[str, Any], finish_reason: str | None = None, **extra: Any
+        ) -> bytes:
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+                **extra,
+            }
+            return b"data: " + orjson.dumps(chunk) + b"\n\n"
+
+        async def stream() -> AsyncIterator[bytes]:
+            await asyncio.sleep(jittered(config.ttft_ms / 1000))
+            yield frame({"role": "assistant", "content": ""})
+            for i, token in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(jittered(token_interval))
+                yield frame({"content": token})
+            yield frame({}, "stop")
+            if include_usage:
+                yield (
+                    b"data: "
+                    + orjson.dumps(
+                        {
+                            "id": completion_id,
+                            "object": "chat.completion.chunk",
+                            "created": created,
+                            "model": model,
+                            "choices": [],
+                            "usage": usage,
+                        }
+                    )
+                    + b"\n\n"
+                )
+            yield b"data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    async def list_models():
+        return {"object": "list", "data": [{"id": "stub-model", "object": "model"}]}
+
+    # Accept BASE_URL with or without the /v1 suffix
+    for prefix in ("/v1", ""):
+        app.add_api_route(
+            f"{prefix}/chat/completions", chat_completions, methods=["POST"]
+        )
+        app.add_api_route(f"{prefix}/models", list_models, methods=["GET"])
+
+    return app
+
+
+def run_stub_server(host: str, port: int, config: StubConfig) -> None:
+    """Run the stub server with uvicorn (blocking)."""
+    import uvicorn
+
+    uvicorn.run(create_stub_app(config), host=host, port=port, log_level="warning")
@@ -1,17 +1,19 @@
 """
 Unified CLI entrypoint for AI service.
 Provides commands for ingestion (incremental) and serving the API.
+
+Subcommand dependencies are imported inside their branches so that light
+commands such as ``migrate`` do not load torch, chromadb or FastAPI.
 """
 
+import argparse
 import asyncio
-from typing import Optional, List
+import json
 import sys
-import argparse
+from typing import List, Optional
+
 from loguru import logger
 
-from ai_service.services.ingestion import DocumentIngester
-from ai_service.main import main as serve_main
-from ai_service.migrations import run_migrations
 from ai_service.config.settings import settings
 
 
@@ -70,6 +72,257 @@ def build_parser() -> argparse.ArgumentParser:
         "--verbose", action="store_true", help="Enable verbose logging"
     )
 
+    # Index maintenance commands
+    index_parser = subparsers.add_parser("index", help="Manage the vector index")
+    index_subparsers = index_parser.add_subparsers(dest="index_command", required=True)
+    index_subparsers.add_parser(
+        "snapshot",
+        help="Publish the current index as a read-only snapshot "
+        "(VECTOR_DB_TYPE=snapshot)",
+    )
+    rebuild_parser = index_subparsers.add_parser(
+        "rebuild",
+        help="Copy the ChromaDB index into a new collection with the HNSW_* settings",
+    )
+    rebuild_parser.add_argument(
+        "--drop-old",
+        action="store_true",
+        help="Delete the previous collection after switching (restart servers first)",
+    )
+
+    # Benchmark command
+    benchmark_parser = subparsers.add_parser("benchmark", help="Run offline benchmarks")
+    benchmark_subparsers = benchmark_parser.add_subparsers(
+        dest="benchmark", required=True
+    )
+
+    retrieval_parser = benchmark_subparsers.add_parser(
+        "retrieval",
+        help="Measure retrieval recall@k, MRR and per-stage latency",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    retrieval_parser.add_argument(
+        "--dataset",
+        type=str,
+        required=True,
+        help="JSONL/YAML file of {question, expected: [doc paths]} cases",
+    )
+    retrieval_parser.add_argument(
+        "--docs",
+        type=str,
+        default=None,
+        help="Docs fixture to index (defaults to DOCS_PATH)",
+    )
+    retrieval_parser.add_argument(
+        "--index-dir",
+        type=str,
+        default=None,
+        help="Directory to build/reuse the index in (defaults to a temp dir)",
+    )
+    retrieval_parser.add_argument(
+        "--top-k",
+        type=int,
+        default=None,
+        help="Retrieval top_k (recall@k is reported up to the retrieval cap of 3)",
+    )
+    retrieval_parser.add_argument(
+        "--repeat", type=int, default=1, help="Timed runs per question"
+    )
+    retrieval_parser.add_argument(
+        "--output", type=str, default=None, help="Write the full JSON report here"
+    )
+    retrieval_parser.add_argument(
+        "--verbose", action="store_true", help="Enable verbose logging"
+    )
+
+    load_parser = benchmark_subparsers.add_parser(
+        "load",
+        help="Load-test /api/chat and /api/chat/stream",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    load_parser.add_argument(
+        "--url", type=str, default="http://localhost:8000", help="Service base URL"
+    )
+    load_parser.add_argument(
+        "--concurrency", type=int, default=8, help="Concurrent virtual users"
+    )
+    load_parser.add_argument(
+        "--requests", type=int, default=100, help="Total requests (0 = unlimited)"
+    )
+    load_parser.add_argument(
+        "--duration", type=float, default=None, help="Stop after this many seconds"
+    )
+    load_parser.add_argument(
+        "--mix",
+        type=str,
+        default="chat:1,stream:1",
+        help="Endpoint weights, e.g. chat:1,stream:3",
+    )
+    load_parser.add_argument(
+        "--questions",
+        type=str,
+        default=None,
+        help="JSONL ({question}) or text file with one question per line",
+    )
+    load_parser.add_argument(
+        "--timeout", type=float, default=120.0, help="Per-request timeout in seconds"
+    )
+    load_parser.add_argument("--seed", type=int, default=None, help="Random seed")
+    load_parser.add_argument(
+        "--output", type=str, default=None, help="Write the full JSON report here"
+    )
+
+    embedding_bench_parser = benchmark_subparsers.add_parser(
+        "embedding",
+        help="Compare embedding backends: latency, throughput, agreement with torch",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    embedding_bench_parser.add_argument(
+        "--backends",
+        type=str,
+        default="torch,onnx,onnx-int8",
+        help="Comma-separated backends (torch, onnx, onnx-int8)",
+    )
+    embedding_bench_parser.add_argument(
+        "--texts",
+        type=str,
+        default=None,
+        help="JSONL ({question}) or text file to embed "
+        "(defaults to the retrieval sample)",
+    )
+    embedding_bench_parser.add_argument(
+        "--batch-size", type=int, default=32, help="Batch size for throughput runs"
+    )
+    embedding_bench_parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed passes over the texts"
+    )
+    embedding_bench_parser.add_argument(
+        "--output", type=str, default=None, help="Write the full JSON report here"
+    )
+
+    hnsw_parser = benchmark_subparsers.add_parser(
+        "hnsw",
+        help="Sweep HNSW parameters and report recall@k against exact search "
+        "and latency",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    hnsw_parser.add_argument("--m", type=str, default="8,16,32", help="hnsw:M values")
+    hnsw_parser.add_argument(
+        "--construction-ef",
+        type=str,
+        default="100,200",
+        help="hnsw:construction_ef values",
+    )
+    hnsw_parser.add_argument(
+        "--search-ef", type=str, default="10,50,100", help="hnsw:search_ef values"
+    )
+    hnsw_parser.add_argument("--k", type=int, default=10, help="Neighbours per query")
+    hnsw_parser.add_argument(
+        "--queries", type=int, default=200, help="Number of queries"
+    )
+    hnsw_parser.add_argument(
+        "--synthetic",
+        type=int,
+        default=0,
+        help="Use this many random vectors instead of the current index",
+    )
+    hnsw_parser.add_argument(
+        "--dim", type=int, default=384, help="Dimension of synthetic vectors"
+    )
+    hnsw_parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    hnsw_parser.add_argument(
+        "--output", type=str, default=None, help="Write the full JSON report here"
+    )
+
+    intent_bench_parser = benchmark_subparsers.add_parser(
+        "intent",
+        help="Compare the intent keyword matcher with per-keyword substring scans",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    intent_bench_parser.add_argument(
+        "--texts",
+        type=str,
+        default=None,
+        help="JSONL ({question}) or text file of queries "
+        "(defaults to the retrieval sample)",
+    )
+    intent_bench_parser.add_argument(
+        "--docs",
+        type=str,
+        default=None,
+        help="Markdown docs to scan (defaults to DOCS_PATH)",
+    )
+    intent_bench_parser.add_argument(
+        "--rules",
+        type=str,
+        default=None,
+        help="Intent rules file (defaults to INTENT_RULES_PATH)",
+    )
+    intent_bench_parser.add_argument(
+        "--extra-keywords",
+        type=str,
+        default="0,100,1000",
+        help="Random keywords added to every class, one run per value",
+    )
+    intent_bench_parser.add_argument(
+        "--repeat", type=int, default=3, help="Timed passes over the texts"
+    )
+    intent_bench_parser.add_argument(
+        "--output", type=str, default=None, help="Write the full JSON report here"
+    )
+
+    # Embedding sidecar command
+    sidecar_parser = subparsers.add_parser(
+        "embedding-sidecar",
+        help="Serve embeddings to local workers over a Unix socket",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    sidecar_parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Unix socket path (defaults to EMBEDDING_SIDECAR_SOCKET or a temp path)",
+    )
+    sidecar_parser.add_argument(
+        "--threads",
+        type=int,
+        default=None,
+        help="torch intra-op threads (default: all CPUs)",
+    )
+
+    # Stub LLM server command
+    stub_parser = subparsers.add_parser(
+        "stub-llm",
+        help="Run an OpenAI-compatible stub LLM server for load testing",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter,
+    )
+    stub_parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Server host"
+    )
+    stub_parser.add_argument("--port", type=int, default=9000, help="Server port")
+    stub_parser.add_argument(
+        "--ttft-ms", type=float, default=300.0, help="Time to first token (ms)"
+    )
+    stub_parser.add_argument(
+        "--tokens-per-second", type=float, default=50.0, help="Token generation rate"
+    )
+    stub_parser.add_argument(
+        "--completion-tokens", type=int, default=200, help="Tokens per completion"
+    )
+    stub_parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of failed requests"
+    )
+    stub_parser.add_argument(
+        "--rate-limit-share",
+        type=float,
+        default=0.5,
+        help="Share of injected errors returned as 429 instead of 500",
+    )
+    stub_parser.add_argument(
+        "--jitter", type=float, default=0.1, help="Relative random jitter on delays"
+    )
+    stub_parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
     return parser
 
 
@@ -89,6 +342,8 @@ def main(argv: Optional[List[str]] = None) -> int:
     _configure_logging(getattr(args, "verbose", False))
 
     if args.command == "ingest":
+        from ai_service.services.ingestion import DocumentIngester
+
         logger.info("Starting document ingestion...")
         ingester = DocumentIngester()
         asyncio.run(ingester.run_ingestion())
@@ -96,6 +351,8 @@ def main(argv: Optional[List[str]] = None) -> int:
         return 0
 
     elif args.command == "serve":
+        from ai_service.main import main as serve_main
+
         logger.info("Starting FastAPI server...")
         # Update settings with CLI arguments
         if args.host:
@@ -108,10 +365,12 @@ def main(argv: Optional[List[str]] = None) -> int:
         return 0
 
     elif args.command == "migrate":
-        db_path = args.db_path or settings.conversation_db_path
-        # Resolve default migration directory to project root /migration
         from pathlib import Path
 
+        from ai_service.migrations import run_migrations
+
+        db_path = args.db_path or settings.conversation_db_path
+        # Resolve default migration directory to project root /migration
         default_dir = Path(__file__).resolve().parents[1] / "migration"
         migration_dir = Path(args.migration_dir) if args.migration_dir else default_dir
         logger.info(f"Running migrations on {db_path} from {migration_dir}")
@@ -119,6 +378,136 @@ def main(argv: Optional[List[str]] = None) -> int:
         logger.info(f"Applied {applied} migration(s)")
         return 0
 
+    elif args.command == "index":
+        if args.index_command == "snapshot":
+            from ai_service.services.snapshot_store import publish_snapshot
+            from ai_service.services.vector_store import writable_vector_store
+
+            version = asyncio.run(publish_snapshot(writable_vector_store()))
+            print(version)
+
+        elif args.index_command == "rebuild":
+            if settings.vector_db_type != "chromadb":
+                logger.error("index rebuild applies to VECTOR_DB_TYPE=chromadb only")
+                return 1
+            from ai_service.services.vector_store import vector_store
+
+            result = asyncio.run(
+                vector_store.rebuild_collection(drop_old=args.drop_old)
+            )
+            print(json.dumps(result, ensure_ascii=False, indent=2))
+        return 0
+
+    elif args.command == "benchmark":
+        from pathlib import Path
+
+        if args.benchmark == "retrieval":
+            from ai_service.benchmarks.retrieval import run_retrieval_benchmark
+
+            report = asyncio.run(
+                run_retrieval_benchmark(
+                    Path(args.dataset),
+                    docs_path=Path(args.docs) if args.docs else None,
+                    index_dir=Path(args.index_dir) if args.index_dir else None,
+                    top_k=args.top_k,
+                    repeat=args.repeat,
+                    output=Path(args.output) if args.output else None,
+                )
+            )
+            print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+
+        elif args.benchmark == "load":
+            from ai_service.benchmarks.load import run_load_benchmark
+
+            report = asyncio.run(
+                run_load_benchmark(
+                    args.url,
+                    output=Path(args.output) if args.output else None,
+                    questions_path=Path(args.questions) if args.questions else None,
+                    mix_spec=args.mix,
+                    concurrency=args.concurrency,
+                    requests=args.requests or None,
+                    duration_s=args.duration,
+                    timeout_s=args.timeout,
+                    seed=args.seed,
+                )
+            )
+            print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+
+        elif args.benchmark == "embedding":
+            from ai_service.benchmarks.embedding import run_embedding_benchmark
+
+            report = run_embedding_benchmark(
+                backends=[b.strip() for b in args.backends.split(",") if b.strip()],
+                texts_path=Path(args.texts) if args.texts else None,
+                batch_size=args.batch_size,
+                repeat=args.repeat,
+                output=Path(args.output) if args.output else None,
+            )
+            print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+
+        elif args.benchmark == "hnsw":
+            from ai_service.benchmarks.hnsw import run_hnsw_benchmark
+
+            def _ints(spec: str) -> List[int]:
+                return [int(v) for v in spec.split(",") if v.strip()]
+
+            report = asyncio.run(
+                run_hnsw_benchmark(
+                    m_values=_ints(args.m),
+                    construction_ef_values=_ints(args.construction_ef),
+                    search_ef_values=_ints(args.search_ef),
+                    k=args.k,
+                    queries=args.queries,
+                    synthetic=args.synthetic,
+                    dim=args.dim,
+                    seed=args.seed,
+                    output=Path(args.output) if args.output else None,
+                )
+            )
+            print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+
+        elif args.benchmark == "intent":
+            from ai_service.benchmarks.intent import run_intent_benchmark
+
+            report = run_intent_benchmark(
+                texts_path=Path(args.texts) if args.texts else None,
+                docs_path=Path(args.docs) if args.docs else None,
+                rules_path=Path(args.rules) if args.rules else None,
+                extra_keywords=[
+                    int(v) for v in args.extra_keywords.split(",") if v.strip()
+                ],
+                repeat=args.repeat,
+                output=Path(args.output) if args.output else None,
+            )
+            print(json.dumps(report["summary"], ensure_ascii=False, indent=2))
+        return 0
+
+    elif args.command == "embedding-sidecar":
+        from ai_service.services.embedding_sidecar import run_sidecar
+
+        run_sidecar(args.socket, num_threads=args.threads)
+        return 0
+
+    elif args.command == "stub-llm":
+        from ai_service.benchmarks.stub_llm import StubConfig, run_stub_server
+
+        logger.info(f"Starting stub LLM server on {args.host}:{args.port}")
+        run_stub_server(
+            args.host,
+            args.port,
+            StubConfig(
+                ttft_ms=args.ttft_ms,
+                tokens_per_second=args.tokens_per_second,
+                completion_tokens=args.completion_tokens,
+                error_rate=args.error_rate,
+                rate_limit_share=args.rate_limit_share,
+                jitter=args.jitter,
+                seed=args.seed,
+            ),
+        )
+        return 0
+
     return 0
 
 
@@ -3,9 +3,10 @@ Configuration management for AI service.
 All configuration values are read directly from .env file.
 """
 
-import os
 import json
-from typing import Optional, List
+import os
+from typing import Dict, List, Optional
+
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -49,6 +50,19 @@ def get_list(key: str, default: List[str] = None) -> List[str]:
         # Fallback to comma-separated values
         return [item.strip() for item in value.split(",") if item.strip()]
 
+def get_dict(key: str, default: Dict[str, str] = None) -> Dict[str, str]:
+    """Convert environment variable to dict (JSON object or key:value pairs)."""
+    value = os.getenv(key)
+    if not value:
+        return dict(default or {})
+
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        # Fallback to comma-separated key:value pairs
+        pairs = (item.split(":", 1) for item in value.split(",") if ":" in item)
+        return {k.strip(): v.strip() for k, v in pairs}
+
 def get_str(key: str, default: str = "") -> str:
     """Get string environment variable with default."""
     return os.getenv(key, default)
@@ -81,14 +95,91 @@ class SettingsModule:
         self.temperature = get_float("TEMPERATURE", 0.1)
         self.max_tokens = get_int("MAX_TOKENS", 1000)
         
+        # LLM HTTP client (connection pool, keep-alive and timeouts in seconds)
+        self.llm_max_connections = get_int("LLM_MAX_CONNECTIONS", 100)
+        self.llm_max_keepalive_connections = get_int(
+            "LLM_MAX_KEEPALIVE_CONNECTIONS", 20
+        )
+        self.llm_keepalive_expiry = get_float("LLM_KEEPALIVE_EXPIRY", 60.0)
+        self.llm_http2 = get_bool("LLM_HTTP2", False)  # requires the h2 package
+        self.llm_connect_timeout = get_float("LLM_CONNECT_TIMEOUT", 5.0)
+        self.llm_read_timeout = get_float("LLM_READ_TIMEOUT", 60.0)
+        self.llm_first_byte_timeout = get_float("LLM_FIRST_BYTE_TIMEOUT", 30.0)
+        self.llm_pool_timeout = get_float("LLM_POOL_TIMEOUT", 10.0)
+        self.llm_prewarm_connections = get_int("LLM_PREWARM_CONNECTIONS", 2)
+
+        # LLM provider routing
+        # JSON list of {"name", "base_url", "api_key", "model", "weight"}; empty
+        # means a single provider from API_KEY/BASE_URL/MODEL
+        self.llm_providers = get_list("LLM_PROVIDERS", [])
+        self.llm_max_retries = get_int("LLM_MAX_RETRIES", 2)
+        self.llm_retry_backoff_base = get_float("LLM_RETRY_BACKOFF_BASE", 0.25)
+        self.llm_retry_backoff_max = get_float("LLM_RETRY_BACKOFF_MAX", 4.0)
+        self.llm_hedge_enabled = get_bool("LLM_HEDGE_ENABLED", True)
+        self.llm_hedge_percentile = get_float("LLM_HEDGE_PERCENTILE", 0.95)
+        self.llm_hedge_min_delay = get_float("LLM_HEDGE_MIN_DELAY", 0.25)
+        self.llm_hedge_default_delay = get_float("LLM_HEDGE_DEFAULT_DELAY", 2.0)
+        self.llm_breaker_failure_threshold = get_int("LLM_BREAKER_FAILURE_THRESHOLD", 5)
+        self.llm_breaker_cooldown = get_float("LLM_BREAKER_COOLDOWN", 30.0)
+        # Ask for token usage on streams (stream_options.include_usage); disable
+        # for OpenAI-compatible providers that reject the parameter
+        self.llm_stream_usage = get_bool("LLM_STREAM_USAGE", True)
+
         # Embedding Configuration
         self.embedding_model = get_str("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
         self.embedding_dimension = get_int("EMBEDDING_DIMENSION", 384)
+        # torch intra-op threads per process; 0 = CPU count / WORKERS
+        self.torch_num_threads = get_int("TORCH_NUM_THREADS", 0)
+        # Shared embedding sidecar for multi-worker serving: "auto" (when
+        # WORKERS > 1), "true" or "false". Workers connect to
+        # EMBEDDING_SIDECAR_SOCKET when it is set.
+        self.embedding_sidecar = get_str("EMBEDDING_SIDECAR", "auto")
+        self.embedding_sidecar_socket = get_str("EMBEDDING_SIDECAR_SOCKET", "")
+        self.embedding_sidecar_max_batch = get_int("EMBEDDING_SIDECAR_MAX_BATCH", 64)
+        self.embedding_sidecar_batch_wait_ms = get_float(
+            "EMBEDDING_SIDECAR_BATCH_WAIT_MS", 2.0
+        )
+        self.embedding_sidecar_startup_timeout = get_float(
+            "EMBEDDING_SIDECAR_STARTUP_TIMEOUT", 120.0
+        )
+        # "torch" (SentenceTransformer) or "onnx" (onnxruntime export, built on
+        # first use under EMBEDDING_ONNX_DIR and checked against torch vectors)
+        self.embedding_backend = get_str("EMBEDDING_BACKEND", "torch")
+        self.embedding_onnx_quantize = get_bool(
+            "EMBEDDING_ONNX_QUANTIZE", False
+        )  # dynamic int8
+        self.embedding_onnx_dir = get_str("EMBEDDING_ONNX_DIR", "./data/onnx")
+        self.embedding_onnx_min_cosine = get_float("EMBEDDING_ONNX_MIN_COSINE", 0.99)
+        # Bulk embedding: texts are sorted by length and grouped so each batch
+        # pads to at most EMBEDDING_BATCH_TOKENS; 0 = fixed batches of 32
+        self.embedding_batch_tokens = get_int("EMBEDDING_BATCH_TOKENS", 8192)
+        self.embedding_max_batch_size = get_int("EMBEDDING_MAX_BATCH_SIZE", 128)
+        # Recent query embeddings kept in memory (0 disables the cache)
+        self.query_embedding_cache_size = get_int("QUERY_EMBEDDING_CACHE_SIZE", 1024)
         
         # Vector Database Configuration
+        # "chromadb", "numpy" (exact search over memory-mapped segments) or
+        # "snapshot" (serve read-only snapshots published by ingestion)
         self.vector_db_type = get_str("VECTOR_DB_TYPE", "chromadb")
         self.chromadb_path = get_str("CHROMADB_PATH", "./data/chroma_db")
         self.collection_name = get_str("COLLECTION_NAME", "vite_docs")
+        # ChromaDB HNSW parameters, fixed when a collection is created; use
+        # `ai-service index rebuild` to apply new values to an existing index
+        self.hnsw_m = get_int("HNSW_M", 16)
+        self.hnsw_construction_ef = get_int("HNSW_CONSTRUCTION_EF", 100)
+        self.hnsw_search_ef = get_int("HNSW_SEARCH_EF", 10)
+        self.hnsw_batch_size = get_int("HNSW_BATCH_SIZE", 100)
+        self.hnsw_sync_threshold = get_int("HNSW_SYNC_THRESHOLD", 1000)
+        self.numpy_index_path = get_str("NUMPY_INDEX_PATH", "./data/numpy_index")
+        # Segments are merged once there are more than this many
+        self.numpy_max_segments = get_int("NUMPY_MAX_SEGMENTS", 32)
+        # Versioned read-only index snapshots; SNAPSHOT_PATH/CURRENT names the
+        # live one and serving workers re-check it every SNAPSHOT_RELOAD_INTERVAL
+        self.snapshot_path = get_str("SNAPSHOT_PATH", "./data/snapshots")
+        self.snapshot_reload_interval = get_float(
+            "SNAPSHOT_RELOAD_INTERVAL", 5.0
+        )  # 0 = never
+        self.snapshot_keep = get_int("SNAPSHOT_KEEP", 3)
         
         # Conversation store configuration
         self.conversation_store = get_str("CONVERSATION_STORE", "sqlite")
@@ -98,16 +189,62 @@ class SettingsModule:
         self.docs_path = get_str("DOCS_PATH", "../../docs")
         self.chunk_size = get_int("CHUNK_SIZE", 1000)
         self.chunk_overlap = get_int("CHUNK_OVERLAP", 200)
+        # "chars" (CHUNK_SIZE/CHUNK_OVERLAP) or "tokens" (embedding tokenizer budget)
+        self.chunk_unit = get_str("CHUNK_UNIT", "chars")
+        self.chunk_max_tokens = get_int(
+            "CHUNK_MAX_TOKENS", 0
+        )  # 0 = model max_seq_length
+        self.chunk_overlap_tokens = get_int("CHUNK_OVERLAP_TOKENS", 32)
         
         # RAG Configuration
         self.retrieval_top_k = get_int("RETRIEVAL_TOP_K", 5)
         self.similarity_threshold = get_float("SIMILARITY_THRESHOLD", 0.7)
+        # Intent keyword rules (JSON); empty uses ai_service/config/intent_rules.json
+        self.intent_rules_path = get_str("INTENT_RULES_PATH", "")
+        # Candidate pool: requested results x expected chunks per document
+        # (starting value, then learned from searches) with headroom for the
+        # post-filter; widened by RETRIEVAL_WIDEN_FACTOR once when short
+        self.retrieval_chunks_per_document = get_float(
+            "RETRIEVAL_CHUNKS_PER_DOCUMENT", 2.0
+        )
+        self.retrieval_max_candidates = get_int("RETRIEVAL_MAX_CANDIDATES", 100)
+        self.retrieval_widen_factor = get_float("RETRIEVAL_WIDEN_FACTOR", 4.0)
+        # Maximal marginal relevance over the candidate pool instead of one
+        # chunk per document; lambda 1.0 = relevance only, 0.0 = diversity only
+        self.retrieval_mmr = get_bool("RETRIEVAL_MMR", False)
+        self.retrieval_mmr_lambda = get_float("RETRIEVAL_MMR_LAMBDA", 0.7)
+        # Per-intent overrides, e.g. {"comparison": 0.5}
+        self.retrieval_mmr_intent_lambdas = {
+            intent: float(value)
+            for intent, value in get_dict("RETRIEVAL_MMR_INTENT_LAMBDAS", {}).items()
+        }
+        # Optional cross-encoder rerank of the candidate pool. The model is
+        # local ("torch" or "onnx" export); set HF_HUB_OFFLINE=1 to use only the
+        # cached copy. Past RERANK_BUDGET_MS the heuristic order is kept.
+        self.rerank_enabled = get_bool("RERANK_ENABLED", False)
+        self.rerank_model = get_str(
+            "RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"
+        )
+        self.rerank_backend = get_str("RERANK_BACKEND", "torch")
+        self.rerank_budget_ms = get_float("RERANK_BUDGET_MS", 150.0)
+        self.rerank_max_candidates = get_int("RERANK_MAX_CANDIDATES", 20)
+        self.rerank_batch_size = get_int("RERANK_BATCH_SIZE", 16)
+        self.rerank_max_length = get_int("RERANK_MAX_LENGTH", 256)
+        self.rerank_cache_size = get_int("RERANK_CACHE_SIZE", 4096)
+
+        # Prompt token budgets (counted with tiktoken when installed)
+        self.prompt_context_max_tokens = get_int("PROMPT_CONTEXT_MAX_TOKENS", 3000)
+        self.prompt_history_max_tokens = get_int("PROMPT_HISTORY_MAX_TOKENS", 1000)
+        # Older turns are truncated to this many tokens; the latest turn is kept whole
+        self.history_message_max_tokens = get_int("HISTORY_MESSAGE_MAX_TOKENS", 300)
         
         # API Configuration
         self.cors_origins = get_list(
             "CORS_ORIGINS",
             ["http://localhost:5173", "http://localhost:4173", "http://localhost:3001"],
         )
+        # Most queries accepted by one POST /api/vector-search/batch request
+        self.vector_search_batch_max = get_int("VECTOR_SEARCH_BATCH_MAX", 32)
         
         # Security
         self.api_key_header = get_str("API_KEY_HEADER", "X-API-Key")
@@ -122,12 +259,37 @@ class SettingsModule:
             "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>"
         )
         
+        # Admission control for LLM-backed chat requests (per worker process)
+        self.llm_max_concurrency = get_int("LLM_MAX_CONCURRENCY", 32)  # 0 = unlimited
+        self.admission_queue_size = get_int("ADMISSION_QUEUE_SIZE", 64)
+        self.admission_queue_timeout = get_float("ADMISSION_QUEUE_TIMEOUT", 10.0)
+        self.admission_rate = get_float(
+            "ADMISSION_RATE", 0.0
+        )  # requests/s, 0 = unlimited
+        self.admission_burst = get_float(
+            "ADMISSION_BURST", 0.0
+        )  # 0 = one second of rate
+
+        # /api/chat/stream framing: "ndjson" or "sse" (clients may also ask via
+        # ?format= or Accept: text/event-stream); token events are coalesced
+        # and flushed every STREAM_FLUSH_INTERVAL_MS or STREAM_FLUSH_BYTES
+        self.stream_format = get_str("STREAM_FORMAT", "ndjson")
+        self.stream_flush_interval_ms = get_int(
+            "STREAM_FLUSH_INTERVAL_MS", 20
+        )  # 0 = per token
+        self.stream_flush_bytes = get_int("STREAM_FLUSH_BYTES", 4096)  # 0 = time only
+
+        # Health checks (background monitor; probes read the cached result)
+        self.health_check_interval = get_float("HEALTH_CHECK_INTERVAL", 60.0)
+        self.health_check_timeout = get_float("HEALTH_CHECK_TIMEOUT", 10.0)
+        self.health_check_llm = get_bool("HEALTH_CHECK_LLM", True)
+
         # Performance
         self.cache_ttl = get_int("CACHE_TTL", 3600)
         self.max_concurrent_requests = get_int("MAX_CONCURRENT_REQUESTS", 10)
     
     def get_llm_config(self) -> dict:
-        if not self.api_key:
+        if not self.api_key and not self.llm_providers:
             raise ValueError("API_KEY is required in .env file")
         
         return {
@@ -138,6 +300,45 @@ class SettingsModule:
             "base_url": self.base_url or None,  # Use OpenAI default if not specified
         }
 
+    def get_llm_providers(self) -> List[dict]:
+        """Normalized LLM provider endpoints for the provider router.
+
+        Entries in ``LLM_PROVIDERS`` may be objects or plain base URLs and
+        inherit API_KEY and MODEL when they don't set their own.
+        """
+        if not self.llm_providers:
+            if not self.api_key:
+                raise ValueError("API_KEY is required in .env file")
+            return [
+                {
+                    "name": "default",
+                    "base_url": self.base_url or None,
+                    "api_key": self.api_key,
+                    "model": None,
+                    "weight": 1.0,
+                }
+            ]
+
+        providers = []
+        for index, entry in enumerate(self.llm_providers):
+            if isinstance(entry, str):
+                entry = {"base_url": entry}
+            api_key = entry.get("api_key") or self.api_key
+            if not api_key:
+                raise ValueError(
+                    f"LLM provider #{index} has no api_key and API_KEY is not set"
+                )
+            providers.append(
+                {
+                    "name": entry.get("name") or f"provider-{index}",
+                    "base_url": entry.get("base_url") or None,
+                    "api_key": api_key,
+                    "model": entry.get("model") or None,
+                    "weight": float(entry.get("weight", 1.0)),
+                }
+            )
+        return providers
+
 
 # Global settings instance
 settings = SettingsModule()
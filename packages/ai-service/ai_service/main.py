@@ -1,15 +1,27 @@
 """
 FastAPI application entry point.
 Creates the application instance using the application factory.
+
+``app`` is built on first access rather than at import time, so importing
+this module (e.g. from the CLI) does not load the ML and database stacks.
 """
 
-import uvicorn
+import subprocess
+from typing import Any
+
 from loguru import logger
 
-from ai_service.app import create_app
 from ai_service.config.settings import settings
 
-app = create_app()
+
+def __getattr__(name: str) -> Any:
+    if name == "app":
+        from ai_service.app import create_app
+
+        application = create_app()
+        globals()["app"] = application
+        return application
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def setup_logging():
@@ -36,6 +48,14 @@ def setup_logging():
 
 def main():
     """Main entry point for the application."""
+    import uvicorn
+
+    from ai_service.services.embedding_sidecar import (
+        default_socket_path,
+        sidecar_enabled,
+        spawn_sidecar,
+    )
+
     setup_logging()
 
     logger.info(f"Starting AI service on {settings.host}:{settings.port}")
@@ -44,15 +64,29 @@ def main():
     )
     logger.info(f"Embedding Model: {settings.embedding_model}")
 
-    uvicorn.run(
-        "ai_service.main:app",
-        host=settings.host,
-        port=settings.port,
-        reload=settings.reload,
-        workers=settings.workers,
-        log_level=str(settings.log_level).lower(),
-        access_log=settings.access_log,
-    )
+    sidecar = None
+    if sidecar_enabled() and not settings.embedding_sidecar_socket:
+        # uvicorn spawns workers as fresh interpreters, so a model loaded here
+        # would not be shared; a sidecar process serves all of them instead
+        sidecar = spawn_sidecar(default_socket_path())
+
+    try:
+        uvicorn.run(
+            "ai_service.main:app",
+            host=settings.host,
+            port=settings.port,
+            reload=settings.reload,
+            workers=settings.workers,
+            log_level=str(settings.log_level).lower(),
+            access_log=settings.access_log,
+        )
+    finally:
+        if sidecar is not None:
+            sidecar.terminate()
+            try:
+                sidecar.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                sidecar.kill()
 
 
 if __name__ == "__main__":
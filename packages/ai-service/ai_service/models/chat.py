@@ -119,6 +119,31 @@ class VectorSearchResponse(BaseModel):
     took_ms: int = Field(..., description="Elapsed time in ms")
 
 
+class VectorSearchBatchRequest(BaseModel):
+    queries: List[str] = Field(..., min_length=1, description="Query texts")
+    top_k: int = Field(default=3, ge=1, le=10)
+
+
+class VectorSearchBatchResult(BaseModel):
+    query: str = Field(..., description="Query text")
+    sources: List[SourceReference] = Field(default_factory=list)
+    timings_ms: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Stages run for this query alone (post_filter, rerank, ...)",
+    )
+
+
+class VectorSearchBatchResponse(BaseModel):
+    results: List[VectorSearchBatchResult] = Field(
+        default_factory=list, description="One result per query, in request order"
+    )
+    timings_ms: Dict[str, float] = Field(
+        default_factory=dict,
+        description="Stages shared by the batch (embed, query)",
+    )
+    took_ms: int = Field(..., description="Elapsed time in ms")
+
+
 class HealthResponse(BaseModel):
     """Health check response model."""
     
@@ -128,6 +153,12 @@ class HealthResponse(BaseModel):
     vector_db_status: str = Field(..., description="Vector database status")
     llm_status: str = Field(..., description="LLM service status")
     documents_indexed: int = Field(..., description="Number of indexed documents")
+    checked_at: Optional[datetime] = Field(
+        None, description="When dependencies were last checked"
+    )
+    age_seconds: Optional[float] = Field(
+        None, description="Age of the cached check result"
+    )
 
 
 class ErrorResponse(BaseModel):
@@ -36,6 +36,9 @@ class DocumentChunk(BaseModel):
     heading_level: Optional[int] = Field(default=None, description="Heading level (1-6)")
     metadata: DocumentMetadata = Field(..., description="Document metadata")
     word_count: int = Field(..., description="Number of words in chunk")
+    token_count: Optional[int] = Field(
+        default=None, description="Prompt tokens in chunk content"
+    )
     created_at: datetime = Field(default_factory=datetime.now)
     
     @property
@@ -107,6 +110,9 @@ class IngestionResult(BaseModel):
     chunks_created: int = Field(..., description="Number of chunks created")
     vectors_stored: int = Field(..., description="Number of vectors stored")
     processing_time_seconds: float = Field(..., description="Total processing time")
+    embedding_tokens_per_second: float = Field(
+        default=0.0, description="Embedding throughput in estimated tokens per second"
+    )
     errors: List[str] = Field(default=[], description="Processing errors")
     skipped_files: List[str] = Field(default=[], description="Skipped files")
     
@@ -0,0 +1,189 @@
+"""
+Admission control for LLM-backed requests.
+A token bucket bounds the request rate and a priority-aware concurrency
+limiter bounds in-flight generations; excess requests wait in a bounded
+queue or are rejected quickly with a Retry-After hint.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from ai_service.config.settings import settings
+from ai_service.utils.metrics import (
+    ADMISSION_DECISIONS,
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_WAIT,
+)
+
+# Lower value = served first when a slot frees up. Streaming requests come
+# from the interactive UI, so they go ahead of blocking /chat calls.
+PRIORITIES: Dict[str, int] = {"stream": 0, "chat": 1}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted."""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_take(self) -> bool:
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return True
+        return False
+
+    def time_until_token(self) -> float:
+        self._refill()
+        if self.tokens >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class AdmissionTicket:
+    """Held while an admitted request runs; release exactly once."""
+
+    def __init__(self, controller: "AdmissionController"):
+        self._controller = controller
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._controller._release()
+
+    async def __aenter__(self) -> "AdmissionTicket":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.release()
+
+
+class AdmissionController:
+    """Rate and concurrency limiter with a bounded priority wait queue."""
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        queue_timeout: Optional[float] = None,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+    ):
+        self.max_concurrency = (
+            max_concurrency
+            if max_concurrency is not None
+            else settings.llm_max_concurrency
+        )
+        self.queue_size = (
+            queue_size if queue_size is not None else settings.admission_queue_size
+        )
+        self.queue_timeout = (
+            queue_timeout
+            if queue_timeout is not None
+            else settings.admission_queue_timeout
+        )
+        rate = rate if rate is not None else settings.admission_rate
+        burst = burst if burst is not None else settings.admission_burst
+        self.bucket: Optional[TokenBucket] = (
+            TokenBucket(rate, burst or rate) if rate > 0 else None
+        )
+
+        self.in_flight = 0
+        self.waiting = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+        ADMISSION_IN_FLIGHT.set_function(lambda: self.in_flight)
+        ADMISSION_QUEUE_DEPTH.set_function(lambda: self.waiting)
+
+    async def acquire(self, kind: str = "chat") -> AdmissionTicket:
+        """Admit a request of ``kind`` ("stream" or "chat") or raise.
+
+        Raises:
+            AdmissionRejected: 429 when the rate limit is exceeded, 503 when
+                the wait queue is full or the queue timeout expires.
+        """
+        if self.bucket is not None and not self.bucket.try_take():
+            ADMISSION_DECISIONS.labels(kind, "rejected_rate").inc()
+            raise AdmissionRejected(
+                429, "Rate limit exceeded", self.bucket.time_until_token()
+            )
+
+        if self.max_concurrency <= 0 or (
+            self.in_flight < self.max_concurrency and not self.waiting
+        ):
+            self.in_flight += 1
+            ADMISSION_DECISIONS.labels(kind, "admitted").inc()
+            return AdmissionTicket(self)
+
+        if self.waiting >= self.queue_size:
+            ADMISSION_DECISIONS.labels(kind, "rejected_queue_full").inc()
+            raise AdmissionRejected(503, "Server is busy", self.queue_timeout)
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._waiters,
+            (PRIORITIES.get(kind, len(PRIORITIES)), next(self._sequence), future),
+        )
+        self.waiting += 1
+        start = time.perf_counter()
+        try:
+            # The slot is handed over by _release(); in_flight already counts us
+            await asyncio.wait_for(future, self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_DECISIONS.labels(kind, "rejected_timeout").inc()
+            raise AdmissionRejected(
+                503, "Timed out waiting for capacity", self.queue_timeout
+            )
+        except asyncio.CancelledError:
+            # Granted at the same moment the caller went away: give it back
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+        finally:
+            self.waiting -= 1
+            ADMISSION_WAIT.labels(kind).observe(time.perf_counter() - start)
+
+        ADMISSION_DECISIONS.labels(kind, "admitted_after_wait").inc()
+        return AdmissionTicket(self)
+
+    def _release(self) -> None:
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # Hand the slot straight to the next waiter
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+
+
+# Global admission controller for chat generation
+admission_controller = AdmissionController()
@@ -4,13 +4,173 @@ Uses sentence-transformers with caching and batch processing.
 """
 
 import asyncio
-from typing import List, Union, Optional
+import os
+import time
+from collections import OrderedDict
 from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Union
+
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from loguru import logger
 
 from ai_service.config.settings import settings
+from ai_service.utils.metrics import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    EMBEDDING_SECONDS,
+    EMBEDDING_TOKENS,
+)
+from ai_service.utils.tokens import count_tokens
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+
+def torch_thread_count() -> int:
+    """Intra-op threads per process: TORCH_NUM_THREADS, else CPUs / WORKERS."""
+    if settings.torch_num_threads > 0:
+        return settings.torch_num_threads
+    return max(1, (os.cpu_count() or 1) // max(1, settings.workers))
+
+
+def load_sentence_transformer(
+    model_name: str, num_threads: Optional[int] = None
+) -> "SentenceTransformer":
+    """Load a SentenceTransformer with torch's thread pool sized for this process.
+
+    Without a limit every worker starts one thread per core, and N workers
+    oversubscribe the CPU N times over.
+    """
+    # Deferred: importing sentence_transformers pulls in torch
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    torch.set_num_threads(num_threads or torch_thread_count())
+    return SentenceTransformer(model_name)
+
+
+def load_embedding_model(model_name: str, num_threads: Optional[int] = None) -> Any:
+    """Load ``model_name`` with the backend selected by EMBEDDING_BACKEND.
+
+    The ONNX backend falls back to torch if the export, the runtime or the
+    agreement check against torch fails, so a bad export degrades speed
+    rather than availability.
+    """
+    backend = settings.embedding_backend.lower()
+    if backend == "onnx":
+        try:
+            from ai_service.services.embedding_onnx import load_onnx_model
+
+            return load_onnx_model(
+                model_name, num_threads=num_threads or torch_thread_count()
+            )
+        except Exception as e:
+            logger.warning(f"ONNX embedding backend unavailable, using torch: {e}")
+    elif backend != "torch":
+        logger.warning(
+            f"Unknown EMBEDDING_BACKEND {settings.embedding_backend!r}, using torch"
+        )
+    return load_sentence_transformer(model_name, num_threads)
+
+
+def plan_batches(
+    lengths: Sequence[int], token_budget: int, max_batch_size: int
+) -> List[List[int]]:
+    """Group text indices into length-sorted batches within a padded-token budget.
+
+    A batch is padded to its longest member, so its cost is ``len(batch) *
+    max(length)``. Sorting by length keeps similar texts together: short
+    texts share large batches and long texts get small ones. Every text is
+    placed, even one longer than the budget on its own.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    batches: List[List[int]] = []
+    current: List[int] = []
+    for index in order:
+        # Ascending order: the text being added is the batch's longest
+        padded = (len(current) + 1) * lengths[index]
+        if current and (padded > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+        current.append(index)
+    if current:
+        batches.append(current)
+    return batches
+
+
+def token_lengths(model: Any, texts: Sequence[str]) -> List[int]:
+    """Tokens each text takes in ``model``, special tokens included.
+
+    Counted with the model's own tokenizer and truncated to its
+    ``max_seq_length``, as ``encode`` does. Models without a local tokenizer
+    (the sidecar client) fall back to the ``count_tokens`` estimate.
+    """
+    max_length = getattr(model, "max_seq_length", None) or 512
+    try:
+        tokenizer = model.tokenizer
+    except (AttributeError, RuntimeError):
+        tokenizer = None
+    if tokenizer is None:
+        # +2 for the [CLS]/[SEP] special tokens
+        return [min(count_tokens(text), max_length) + 2 for text in texts]
+    input_ids = tokenizer(list(texts), truncation=True, max_length=max_length)[
+        "input_ids"
+    ]
+    return [len(ids) for ids in input_ids]
+
+
+def encode_bucketed(
+    model: Any,
+    texts: List[str],
+    token_budget: Optional[int] = None,
+    max_batch_size: Optional[int] = None,
+    usage: Optional[Dict[str, float]] = None,
+) -> np.ndarray:
+    """Encode ``texts`` in length-bucketed batches, returned in input order.
+
+    Token lengths come from ``token_lengths`` (the model's tokenizer, capped
+    at its ``max_seq_length`` since longer inputs are truncated anyway).
+    ``usage`` accumulates ``tokens`` and ``seconds`` for tokens/s reporting.
+    """
+    token_budget = (
+        settings.embedding_batch_tokens if token_budget is None else token_budget
+    )
+    max_batch_size = max_batch_size or settings.embedding_max_batch_size
+    lengths = token_lengths(model, texts)
+
+    start = time.perf_counter()
+    if token_budget <= 0:
+        vectors = np.asarray(
+            model.encode(texts, convert_to_numpy=True, batch_size=32), dtype=np.float32
+        ).reshape(len(texts), -1)
+    else:
+        vectors = None
+        for batch in plan_batches(lengths, token_budget, max_batch_size):
+            encoded = np.asarray(
+                model.encode(
+                    [texts[i] for i in batch],
+                    convert_to_numpy=True,
+                    batch_size=len(batch),
+                ),
+                dtype=np.float32,
+            ).reshape(len(batch), -1)
+            if vectors is None:
+                vectors = np.empty((len(texts), encoded.shape[1]), dtype=np.float32)
+            vectors[batch] = encoded
+    elapsed = time.perf_counter() - start
+
+    tokens = sum(lengths)
+    EMBEDDING_TOKENS.inc(tokens)
+    EMBEDDING_SECONDS.inc(elapsed)
+    if usage is not None:
+        usage["tokens"] = usage.get("tokens", 0) + tokens
+        usage["seconds"] = usage.get("seconds", 0.0) + elapsed
+    if len(texts) > 1:
+        logger.debug(
+            f"Embedded {len(texts)} texts ({tokens} tokens) in {elapsed:.3f}s, "
+            f"{tokens / max(elapsed, 1e-9):.0f} tokens/s"
+        )
+    return vectors
 
 
 class EmbeddingService:
@@ -18,8 +178,12 @@ class EmbeddingService:
 
     def __init__(self, model_name: Optional[str] = None):
         self.model_name = model_name or settings.embedding_model
-        self.model: Optional[SentenceTransformer] = None
+        # A local SentenceTransformer or OnnxEmbeddingModel, or a
+        # SidecarEmbeddingModel client
+        self.model: Optional[Any] = None
         self._lock = asyncio.Lock()
+        # Read-only embedding rows of recent queries, least recently used first
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
 
     async def initialize(self) -> None:
         """Initialize the embedding model."""
@@ -42,84 +206,140 @@ class EmbeddingService:
                 f"Embedding model loaded successfully. Dimension: {self.get_dimension()}"
             )
 
-    def _load_model(self, model_name: str) -> SentenceTransformer:
-        """Load the sentence transformer model."""
-        return SentenceTransformer(model_name)
+    def _load_model(self, model_name: str) -> Any:
+        """Load the embedding model, or connect to the sidecar.
 
-    async def embed_text(self, text: str) -> List[float]:
+        With ``EMBEDDING_SIDECAR_SOCKET`` set, embeddings for the configured
+        model come from the shared sidecar process and no model is loaded in
+        this process.
         """
-        Generate embedding for a single text.
+        if settings.embedding_sidecar_socket and model_name == settings.embedding_model:
+            from ai_service.services.embedding_sidecar import SidecarEmbeddingModel
+
+            logger.info(
+                f"Using embedding sidecar at {settings.embedding_sidecar_socket}"
+            )
+            return SidecarEmbeddingModel(settings.embedding_sidecar_socket)
+        return load_embedding_model(model_name)
+
+    async def embed_texts(
+        self, texts: List[str], usage: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
+        """
+        Embed texts as one array, the form the vector store consumes.
 
         Args:
-            text: Input text to embed
+            texts: Input texts to embed
+            usage: Optional dict accumulating embedded "tokens" and "seconds"
 
         Returns:
-            Embedding vector as list of floats
+            C-contiguous float32 array of shape ``(len(texts), dimension)``
+            with L2-normalized rows; empty texts get all-zero rows
         """
-        if not text.strip():
-            return [0.0] * self.get_dimension()
+        if not texts:
+            return np.zeros((0, self.get_dimension()), dtype=np.float32)
 
         await self.initialize()
 
-        # Run embedding in thread pool
-        loop = asyncio.get_event_loop()
-        embedding = await loop.run_in_executor(None, self._generate_embedding, text)
+        # Only embed non-empty texts; the rest stay zero
+        indices = [i for i, text in enumerate(texts) if text.strip()]
+        result = np.zeros((len(texts), self.get_dimension()), dtype=np.float32)
+        if not indices:
+            return result
 
-        return embedding.tolist()
+        loop = asyncio.get_event_loop()
+        embeddings = await loop.run_in_executor(
+            None, self._generate_batch_embeddings, [texts[i] for i in indices], usage
+        )
+        if len(indices) == len(texts):
+            return embeddings
+        result[indices] = embeddings
+        return result
 
-    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+    async def embed_queries(self, queries: List[str]) -> np.ndarray:
         """
-        Generate embeddings for multiple texts efficiently.
+        Embed search queries, reusing the embeddings of recent queries.
 
         Args:
-            texts: List of input texts to embed
+            queries: Query texts
 
         Returns:
-            List of embedding vectors
+            Array in the ``embed_texts`` form, one row per query
         """
-        if not texts:
-            return []
-
-        await self.initialize()
+        if not queries or settings.query_embedding_cache_size <= 0:
+            return await self.embed_texts(queries)
+
+        rows: Dict[str, np.ndarray] = {}
+        for query in queries:
+            if query in rows:
+                continue
+            cached = self._query_cache.get(query)
+            if cached is not None:
+                self._query_cache.move_to_end(query)
+                rows[query] = cached
+        missing = list(dict.fromkeys(q for q in queries if q not in rows))
+        CACHE_HITS.labels("query_embedding").inc(len(queries) - len(missing))
+        CACHE_MISSES.labels("query_embedding").inc(len(missing))
+
+        if missing:
+            embeddings = await self.embed_texts(missing)
+            for query, row in zip(missing, embeddings):
+                # Shared between callers, so it must not be modified in place
+                row = row.copy()
+                row.flags.writeable = False
+                rows[query] = self._query_cache[query] = row
+            while len(self._query_cache) > settings.query_embedding_cache_size:
+                self._query_cache.popitem(last=False)
+
+        return np.stack([rows[query] for query in queries])
 
-        # Filter out empty texts but keep track of indices
-        non_empty_texts = []
-        text_indices = []
+    async def embed_text(self, text: str) -> List[float]:
+        """
+        Generate embedding for a single text.
 
-        for i, text in enumerate(texts):
-            if text.strip():
-                non_empty_texts.append(text)
-                text_indices.append(i)
+        Args:
+            text: Input text to embed
 
-        if not non_empty_texts:
-            return [[0.0] * self.get_dimension()] * len(texts)
+        Returns:
+            Embedding vector as list of floats
+        """
+        return (await self.embed_texts([text]))[0].tolist()
 
-        # Generate embeddings for non-empty texts
-        loop = asyncio.get_event_loop()
-        embeddings = await loop.run_in_executor(
-            None, self._generate_batch_embeddings, non_empty_texts
-        )
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """
+        Generate embeddings for multiple texts efficiently.
 
-        # Reconstruct full results with zeros for empty texts
-        result = []
-        embedding_idx = 0
+        Args:
+            texts: List of input texts to embed
 
-        for i, text in enumerate(texts):
-            if text.strip():
-                result.append(embeddings[embedding_idx].tolist())
-                embedding_idx += 1
-            else:
-                result.append([0.0] * self.get_dimension())
+        Returns:
+            List of embedding vectors
+        """
+        return (await self.embed_texts(texts)).tolist()
 
-        return result
+    @staticmethod
+    def _as_unit_rows(vectors: Any) -> np.ndarray:
+        """Return ``vectors`` as a contiguous float32 2-D array of unit rows."""
+        array = np.asarray(vectors, dtype=np.float32)
+        if array.ndim == 1:
+            array = array.reshape(1, -1)
+        norms = np.linalg.norm(array, axis=1, keepdims=True)
+        return np.ascontiguousarray(array / np.maximum(norms, 1e-12))
 
     def _generate_embedding(self, text: str) -> np.ndarray:
         """Generate embedding for single text."""
-        return self.model.encode(text, convert_to_numpy=True)
+        return self._as_unit_rows(self.model.encode(text, convert_to_numpy=True))[0]
 
-    def _generate_batch_embeddings(self, texts: List[str]) -> np.ndarray:
+    def _generate_batch_embeddings(
+        self, texts: List[str], usage: Optional[Dict[str, float]] = None
+    ) -> np.ndarray:
         """Generate embeddings for batch of texts."""
-        return self.model.encode(texts, convert_to_numpy=True, batch_size=32)
+        from ai_service.services.embedding_sidecar import SidecarEmbeddingModel
+
+        if isinstance(self.model, SidecarEmbeddingModel):
+            # The sidecar buckets the whole request itself
+            return self._as_unit_rows(self.model.encode(texts, convert_to_numpy=True))
+        return self._as_unit_rows(encode_bucketed(self.model, texts, usage=usage))
 
     def get_dimension(self) -> int:
         """Get the embedding dimension."""
@@ -127,6 +347,18 @@ class EmbeddingService:
             return settings.embedding_dimension
         return self.model.get_sentence_embedding_dimension()
 
+    def get_tokenizer(self):
+        """Get the model's tokenizer (requires the model to be loaded)."""
+        if self.model is None:
+            raise RuntimeError("Model not initialized")
+        return self.model.tokenizer
+
+    def get_max_seq_length(self) -> int:
+        """Get the number of word-pieces the model embeds before truncating."""
+        if self.model is None:
+            raise RuntimeError("Model not initialized")
+        return self.model.max_seq_length
+
     def get_model_info(self) -> dict:
         """Get information about the embedding model."""
         return {
@@ -135,6 +367,7 @@ class EmbeddingService:
             "max_seq_length": getattr(self.model, "max_seq_length", None)
             if self.model
             else None,
+            "backend": getattr(self.model, "backend", "torch") if self.model else None,
             "is_loaded": self.model is not None,
         }
 
@@ -149,26 +382,24 @@ class EmbeddingService:
         Returns:
             Cosine similarity score between 0 and 1
         """
-        embeddings = await self.embed_batch([text1, text2])
-
-        # Convert to numpy arrays
-        emb1 = np.array(embeddings[0])
-        emb2 = np.array(embeddings[1])
+        embeddings = await self.embed_texts([text1, text2])
 
-        # Compute cosine similarity
-        similarity = np.dot(emb1, emb2) / (np.linalg.norm(emb1) * np.linalg.norm(emb2))
+        # Rows are unit length, so the dot product is the cosine similarity
+        similarity = np.dot(embeddings[0], embeddings[1])
 
         # Ensure similarity is between 0 and 1
         return max(0.0, min(1.0, float(similarity)))
 
     @lru_cache(maxsize=1000)
-    def _cached_embed_text_sync(self, text: str) -> tuple:
+    def _cached_embed_text_sync(self, text: str) -> np.ndarray:
         """Cached synchronous embedding for frequently used texts."""
         if self.model is None:
             raise RuntimeError("Model not initialized")
 
         embedding = self._generate_embedding(text)
-        return tuple(embedding.tolist())
+        # Shared between callers, so it must not be modified in place
+        embedding.flags.writeable = False
+        return embedding
 
     async def embed_with_cache(self, text: str) -> List[float]:
         """
@@ -184,8 +415,8 @@ class EmbeddingService:
 
         # Use cached version for better performance
         try:
-            embedding_tuple = self._cached_embed_text_sync(text)
-            return list(embedding_tuple)
+            embedding = self._cached_embed_text_sync(text)
+            return embedding.tolist()
         except Exception as e:
             logger.warning(f"Cache failed, falling back to regular embedding: {e}")
             return await self.embed_text(text)
@@ -0,0 +1,301 @@
+"""
+ONNX Runtime embedding backend.
+Exports the configured SentenceTransformer to ONNX once (optionally with
+dynamic int8 quantization) and runs it with onnxruntime, tokenizing with the
+Rust ``tokenizers`` library directly and pooling in numpy. Torch is only
+needed for the one-time export.
+
+The export directory also stores reference embeddings computed by the torch
+model; every load checks the ONNX model against them, so a bad export or
+an over-aggressive quantization is caught without loading torch again.
+"""
+
+import inspect
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from loguru import logger
+
+from ai_service.config.settings import settings
+
+CONFIG_FILE = "embedding_onnx.json"
+REFERENCE_FILE = "reference.npz"
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model_int8.onnx"
+
+# Texts embedded by both backends to check agreement
+VERIFY_TEXTS = [
+    "如何配置开发服务器代理？",
+    "How do I set up a proxy for the Vite dev server?",
+    "vite.config.ts 怎么写？",
+    "What is hot module replacement?",
+    "Vite 的构建产物如何做代码分割",
+    "Configure resolve.alias in vite.config.js",
+]
+
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def export_dir_for(model_name: str) -> Path:
+    """Directory holding the ONNX export of ``model_name``."""
+    safe_name = re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_")
+    return Path(settings.embedding_onnx_dir) / safe_name
+
+
+def _pooling_config(model: Any) -> Dict[str, Any]:
+    """Describe the pooling/normalization modules after the transformer."""
+    pooling = "mean"
+    normalize = False
+    for module in list(model)[1:]:
+        kind = type(module).__name__
+        if kind == "Pooling":
+            # sentence-transformers 2.x exposes get_pooling_mode_str(), later
+            # releases a plain pooling_mode attribute
+            if hasattr(module, "get_pooling_mode_str"):
+                pooling = module.get_pooling_mode_str()
+            else:
+                pooling = str(getattr(module, "pooling_mode", "mean"))
+            if pooling not in ("mean", "cls", "max"):
+                raise ValueError(f"Unsupported pooling mode for ONNX: {pooling}")
+        elif kind == "Normalize":
+            normalize = True
+        else:
+            raise ValueError(f"Unsupported SentenceTransformer module for ONNX: {kind}")
+    return {"pooling": pooling, "normalize": normalize}
+
+
+def export_onnx_model(model_name: str, output_dir: Path, quantize: bool) -> Path:
+    """Export ``model_name`` to ``output_dir`` and return the model file."""
+    import torch
+
+    from ai_service.services.embedding import load_sentence_transformer
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    st_model = load_sentence_transformer(model_name)
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+
+    sample = tokenizer(
+        VERIFY_TEXTS[:2], padding=True, truncation=True, return_tensors="pt"
+    )
+    input_names = [name for name in _INPUT_NAMES if name in sample]
+
+    class _Encoder(torch.nn.Module):
+        def __init__(self, model: Any):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs: Any) -> Any:
+            return self.model(**dict(zip(input_names, inputs))).last_hidden_state
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    export_kwargs: Dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Newer torch defaults to the dynamo exporter; keep the TorchScript one
+        export_kwargs["dynamo"] = False
+
+    model_path = output_dir / MODEL_FILE
+    logger.info(f"Exporting {model_name} to ONNX at {model_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            _Encoder(transformer),
+            tuple(sample[name] for name in input_names),
+            str(model_path),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(model_path),
+            str(output_dir / QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8,
+        )
+
+    tokenizer.save_pretrained(str(output_dir))
+    reference = st_model.encode(VERIFY_TEXTS, convert_to_numpy=True)
+    np.savez(
+        output_dir / REFERENCE_FILE, texts=np.array(VERIFY_TEXTS), vectors=reference
+    )
+
+    config = {
+        "model_name": model_name,
+        "inputs": input_names,
+        "dimension": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        **_pooling_config(st_model),
+    }
+    (output_dir / CONFIG_FILE).write_text(
+        json.dumps(config, indent=2), encoding="utf-8"
+    )
+    return output_dir / (QUANTIZED_MODEL_FILE if quantize else MODEL_FILE)
+
+
+class OnnxEmbeddingModel:
+    """onnxruntime model exposing the SentenceTransformer calls we use."""
+
+    backend = "onnx"
+
+    def __init__(
+        self,
+        model_dir: Path,
+        quantized: bool = False,
+        num_threads: Optional[int] = None,
+    ):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_dir = Path(model_dir)
+        self.quantized = quantized
+        self.config = json.loads(
+            (self.model_dir / CONFIG_FILE).read_text(encoding="utf-8")
+        )
+        self.max_seq_length: int = self.config["max_seq_length"]
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        model_file = QUANTIZED_MODEL_FILE if quantized else MODEL_FILE
+        self.session = onnxruntime.InferenceSession(
+            str(self.model_dir / model_file),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+
+        # Fast path: the Rust tokenizer batches, truncates and pads by itself
+        self._fast_tokenizer = Tokenizer.from_file(
+            str(self.model_dir / "tokenizer.json")
+        )
+        self._fast_tokenizer.enable_truncation(self.max_seq_length)
+        self._fast_tokenizer.enable_padding()
+        self._tokenizer: Any = None
+
+    @property
+    def tokenizer(self) -> Any:
+        """transformers tokenizer, for callers such as token-based chunking."""
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir))
+        return self._tokenizer
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.config["dimension"]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self._fast_tokenizer.encode_batch(texts)
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            ),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(
+            None, {name: features[name] for name in self.config["inputs"]}
+        )[0]
+        return pool_embeddings(
+            hidden,
+            features["attention_mask"],
+            pooling=self.config["pooling"],
+            normalize=self.config["normalize"],
+        )
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        convert_to_numpy: bool = True,
+        batch_size: int = 32,
+        **kwargs: Any,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros(
+                (0, self.get_sentence_embedding_dimension()), dtype=np.float32
+            )
+        vectors = np.concatenate(
+            [
+                self._encode_batch(texts[start : start + batch_size])
+                for start in range(0, len(texts), batch_size)
+            ]
+        )
+        return vectors[0] if single else vectors
+
+    def agreement(self) -> float:
+        """Minimum cosine similarity to the torch reference embeddings."""
+        reference = np.load(self.model_dir / REFERENCE_FILE)
+        return float(
+            cosine_similarities(
+                self.encode(list(reference["texts"])), reference["vectors"]
+            ).min()
+        )
+
+
+def pool_embeddings(
+    hidden: np.ndarray,
+    attention_mask: np.ndarray,
+    pooling: str = "mean",
+    normalize: bool = False,
+) -> np.ndarray:
+    """Pool token embeddings ``[batch, seq, dim]`` into sentence embeddings."""
+    if pooling == "cls":
+        pooled = hidden[:, 0]
+    elif pooling == "max":
+        masked = np.where(attention_mask[..., None] > 0, hidden, -np.inf)
+        pooled = masked.max(axis=1)
+    else:
+        mask = attention_mask[..., None].astype(hidden.dtype)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        pooled = pooled / np.clip(
+            np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None
+        )
+    return pooled.astype(np.float32)
+
+
+def cosine_similarities(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity of two ``[n, dim]`` matrices."""
+    a = a / np.clip(np.linalg.norm(a, axis=1, keepdims=True), 1e-12, None)
+    b = b / np.clip(np.linalg.norm(b, axis=1, keepdims=True), 1e-12, None)
+    return (a * b).sum(axis=1)
+
+
+def load_onnx_model(
+    model_name: str,
+    num_threads: Optional[int] = None,
+    quantize: Optional[bool] = None,
+) -> OnnxEmbeddingModel:
+    """Load the ONNX export of ``model_name``, exporting it on first use.
+
+    Raises:
+        RuntimeError: if the ONNX model's embeddings disagree with the torch
+            reference by more than ``EMBEDDING_ONNX_MIN_COSINE`` allows.
+    """
+    quantize = settings.embedding_onnx_quantize if quantize is None else quantize
+    model_dir = export_dir_for(model_name)
+    model_file = model_dir / (QUANTIZED_MODEL_FILE if quantize else MODEL_FILE)
+    if not (model_file.exists() and (model_dir / CONFIG_FILE).exists()):
+        export_onnx_model(model_name, model_dir, quantize=quantize)
+
+    model = OnnxEmbeddingModel(model_dir, quantized=quantize, num_threads=num_threads)
+    agreement = model.agreement()
+    if agreement < settings.embedding_onnx_min_cosine:
+        raise RuntimeError(
+            f"ONNX embeddings for {model_name} disagree with torch "
+            f"(min cosine {agreement:.4f} < {settings.embedding_onnx_min_cosine})"
+        )
+    logger.info(
+        f"Loaded ONNX embedding model {model_file} "
+        f"(min cosine vs torch {agreement:.4f})"
+    )
+    return model
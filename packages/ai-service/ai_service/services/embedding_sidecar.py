@@ -0,0 +1,389 @@
+"""
+Embedding sidecar shared by all uvicorn workers.
+One process loads the SentenceTransformer model and serves embeddings over a
+Unix socket, batching concurrent requests from every worker into a single
+``encode`` call. Workers use ``SidecarEmbeddingModel`` in place of a local
+model, so the model and torch state exist once per host instead of once per
+worker.
+
+Wire format: each message is a 4-byte big-endian length followed by the
+payload. Requests are orjson objects (``{"op": "embed", "texts": [...]}`` or
+``{"op": "info"}``). Responses are an orjson header (``{"ok": true,
+"shape": [n, d]}``, ``{"ok": true, "info": {...}}`` or ``{"ok": false,
+"error": "..."}``), followed for embeddings by the float32 matrix bytes.
+"""
+
+import asyncio
+import contextlib
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+import numpy as np
+import orjson
+from loguru import logger
+
+from ai_service.config.settings import settings
+
+_LENGTH = struct.Struct(">I")
+
+
+def default_socket_path() -> str:
+    """Socket path from settings, or a per-server path in the temp directory."""
+    return settings.embedding_sidecar_socket or os.path.join(
+        tempfile.gettempdir(), f"ai-service-embedding-{os.getpid()}.sock"
+    )
+
+
+def sidecar_enabled() -> bool:
+    """Whether ``serve`` should start the sidecar (EMBEDDING_SIDECAR)."""
+    mode = settings.embedding_sidecar.lower()
+    if mode == "auto":
+        # uvicorn ignores WORKERS when reloading, so there is nothing to share
+        return settings.workers > 1 and not settings.reload
+    return mode in ("1", "true", "yes", "on")
+
+
+# --- server ---
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    (length,) = _LENGTH.unpack(await reader.readexactly(_LENGTH.size))
+    return await reader.readexactly(length)
+
+
+def _frame(payload: bytes) -> bytes:
+    return _LENGTH.pack(len(payload)) + payload
+
+
+class EmbeddingSidecar:
+    """Unix-socket embedding server with cross-connection micro-batching."""
+
+    def __init__(
+        self,
+        socket_path: str,
+        model_name: Optional[str] = None,
+        max_batch: Optional[int] = None,
+        batch_wait: Optional[float] = None,
+        num_threads: Optional[int] = None,
+        model: Any = None,
+    ):
+        self.socket_path = socket_path
+        self.model_name = model_name or settings.embedding_model
+        self.max_batch = (
+            max_batch if max_batch is not None else settings.embedding_sidecar_max_batch
+        )
+        self.batch_wait = (
+            batch_wait
+            if batch_wait is not None
+            else settings.embedding_sidecar_batch_wait_ms / 1000
+        )
+        self.num_threads = num_threads
+        self.model = model
+        self._queue: "asyncio.Queue[Tuple[List[str], asyncio.Future]]" = asyncio.Queue()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._writers: Set[asyncio.StreamWriter] = set()
+
+    async def start(self) -> None:
+        """Load the model (unless injected) and start listening."""
+        if self.model is None:
+            from ai_service.services.embedding import load_embedding_model
+
+            loop = asyncio.get_running_loop()
+            self.model = await loop.run_in_executor(
+                None, load_embedding_model, self.model_name, self.num_threads
+            )
+
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=self.socket_path
+        )
+        self._batcher = asyncio.create_task(self._batch_loop())
+        logger.info(
+            f"Embedding sidecar serving {self.model_name} on {self.socket_path}"
+        )
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._writers):
+                writer.close()
+                with contextlib.suppress(Exception):
+                    await writer.wait_closed()
+            await self._server.wait_closed()
+            self._server = None
+        if self._batcher is not None:
+            self._batcher.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._batcher
+            self._batcher = None
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(self.socket_path)
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.stop()
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "model_name": self.model_name,
+            "dimension": self.model.get_sentence_embedding_dimension(),
+            "max_seq_length": getattr(self.model, "max_seq_length", None),
+            "backend": getattr(self.model, "backend", "torch"),
+            "tokenizer_path": self._tokenizer_path(),
+        }
+
+    def _tokenizer_path(self) -> str:
+        """Where clients on this host load the model's tokenizer from."""
+        model_dir = getattr(self.model, "model_dir", None)
+        if model_dir is not None:
+            return str(model_dir)
+        tokenizer = getattr(self.model, "tokenizer", None)
+        return getattr(tokenizer, "name_or_path", None) or self.model_name
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Queue ``texts`` for the next batch and wait for their vectors."""
+        if not texts:
+            return np.zeros(
+                (0, self.model.get_sentence_embedding_dimension()), dtype=np.float32
+            )
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((texts, future))
+        return await future
+
+    async def _batch_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            total = len(batch[0][0])
+            deadline = loop.time() + self.batch_wait
+            while total < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                batch.append(item)
+                total += len(item[0])
+
+            texts = [text for item_texts, _ in batch for text in item_texts]
+            try:
+                vectors = await loop.run_in_executor(None, self._encode, texts)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+
+            offset = 0
+            for item_texts, future in batch:
+                if not future.done():
+                    future.set_result(vectors[offset : offset + len(item_texts)])
+                offset += len(item_texts)
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        from ai_service.services.embedding import encode_bucketed
+
+        return encode_bucketed(self.model, texts, max_batch_size=self.max_batch)
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                try:
+                    request = orjson.loads(await _read_frame(reader))
+                except asyncio.IncompleteReadError:
+                    break
+
+                try:
+                    if request.get("op") == "info":
+                        writer.write(
+                            _frame(orjson.dumps({"ok": True, "info": self.info()}))
+                        )
+                    else:
+                        vectors = await self.embed(list(request.get("texts") or []))
+                        header = {"ok": True, "shape": list(vectors.shape)}
+                        writer.write(
+                            _frame(orjson.dumps(header)) + _frame(vectors.tobytes())
+                        )
+                except Exception as exc:
+                    logger.error(f"Embedding sidecar request failed: {exc}")
+                    writer.write(_frame(orjson.dumps({"ok": False, "error": str(exc)})))
+                await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+
+def run_sidecar(
+    socket_path: Optional[str] = None, num_threads: Optional[int] = None
+) -> None:
+    """Run the embedding sidecar until interrupted.
+
+    The sidecar is the only process running the model, so torch may use
+    every core unless TORCH_NUM_THREADS says otherwise.
+    """
+    sidecar = EmbeddingSidecar(
+        socket_path or default_socket_path(),
+        num_threads=num_threads or settings.torch_num_threads or os.cpu_count(),
+    )
+    with contextlib.suppress(KeyboardInterrupt):
+        asyncio.run(sidecar.serve_forever())
+
+
+def spawn_sidecar(socket_path: str) -> subprocess.Popen:
+    """Start the sidecar as a child process and point workers at it.
+
+    ``EMBEDDING_SIDECAR_SOCKET`` is exported so uvicorn workers, which are
+    spawned as fresh interpreters, pick the socket up from their settings.
+    """
+    os.environ["EMBEDDING_SIDECAR_SOCKET"] = socket_path
+    settings.embedding_sidecar_socket = socket_path
+    logger.info(f"Starting embedding sidecar on {socket_path}")
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "ai_service",
+            "embedding-sidecar",
+            "--socket",
+            socket_path,
+        ]
+    )
+
+
+# --- client ---
+
+
+class SidecarEmbeddingModel:
+    """Client for the sidecar exposing the SentenceTransformer calls we use.
+
+    ``encode`` is synchronous like the local model, since EmbeddingService
+    runs it in the default executor; each executor thread keeps its own
+    connection.
+    """
+
+    def __init__(self, socket_path: str, connect_timeout: Optional[float] = None):
+        self.socket_path = socket_path
+        self._local = threading.local()
+        timeout = (
+            connect_timeout
+            if connect_timeout is not None
+            else settings.embedding_sidecar_startup_timeout
+        )
+
+        # The sidecar may still be loading its model when workers start
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                header, _ = self._request({"op": "info"})
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise
+                time.sleep(0.25)
+
+        info = header["info"]
+        self.model_name: str = info["model_name"]
+        self.max_seq_length: Optional[int] = info.get("max_seq_length")
+        self._dimension: int = info["dimension"]
+        self.backend: str = info.get("backend", "torch")
+        self._tokenizer_path: str = info.get("tokenizer_path") or self.model_name
+        self._tokenizer: Any = None
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except OSError:
+                sock.close()
+                raise
+            self._local.sock = sock
+        return sock
+
+    def _drop_connection(self) -> None:
+        sock = getattr(self._local, "sock", None)
+        self._local.sock = None
+        if sock is not None:
+            sock.close()
+
+    @staticmethod
+    def _recv_exact(sock: socket.socket, size: int) -> bytes:
+        buffer = bytearray()
+        while len(buffer) < size:
+            chunk = sock.recv(size - len(buffer))
+            if not chunk:
+                raise ConnectionError("Embedding sidecar closed the connection")
+            buffer.extend(chunk)
+        return bytes(buffer)
+
+    def _recv_frame(self, sock: socket.socket) -> bytes:
+        (length,) = _LENGTH.unpack(self._recv_exact(sock, _LENGTH.size))
+        return self._recv_exact(sock, length)
+
+    def _request(
+        self, payload: Dict[str, Any]
+    ) -> Tuple[Dict[str, Any], Optional[bytes]]:
+        # One retry covers a connection the sidecar dropped (e.g. restarted)
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                sock.sendall(_frame(orjson.dumps(payload)))
+                header = orjson.loads(self._recv_frame(sock))
+                body = (
+                    self._recv_frame(sock)
+                    if header.get("ok") and "shape" in header
+                    else None
+                )
+                break
+            except OSError:
+                self._drop_connection()
+                if attempt:
+                    raise
+        if not header.get("ok"):
+            raise RuntimeError(f"Embedding sidecar error: {header.get('error')}")
+        return header, body
+
+    def encode(
+        self,
+        sentences: Union[str, List[str]],
+        convert_to_numpy: bool = True,
+        batch_size: int = 32,
+        **kwargs: Any,
+    ) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        header, body = self._request({"op": "embed", "texts": texts})
+        vectors = np.frombuffer(body or b"", dtype=np.float32).reshape(header["shape"])
+        return vectors[0] if single else vectors
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    @property
+    def tokenizer(self) -> Any:
+        """The sidecar model's tokenizer, loaded in this process on first use."""
+        if self._tokenizer is None:
+            from transformers import AutoTokenizer
+
+            self._tokenizer = AutoTokenizer.from_pretrained(self._tokenizer_path)
+        return self._tokenizer
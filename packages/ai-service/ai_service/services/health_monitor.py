@@ -0,0 +1,174 @@
+"""
+Background health monitor.
+Refreshes dependency status on an interval so health probes read a cached
+result instead of calling the LLM provider and vector store on every request.
+"""
+
+import asyncio
+import contextlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from loguru import logger
+
+from ai_service.config.settings import settings
+from ai_service.services.embedding import embedding_service
+from ai_service.services.llm import llm_service
+from ai_service.services.vector_store import vector_store
+
+
+@dataclass
+class HealthSnapshot:
+    """Result of one health refresh."""
+
+    vector_db_status: str
+    llm_status: str
+    embedding_status: str
+    documents_indexed: int
+    checked_at: datetime
+    checked_monotonic: float
+    details: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def age_seconds(self) -> float:
+        """Seconds since the snapshot was taken."""
+        return max(0.0, time.monotonic() - self.checked_monotonic)
+
+    @property
+    def ready(self) -> bool:
+        """Whether the service can answer requests from its own dependencies.
+
+        The LLM provider is reported but not required: a provider outage
+        affects every pod alike, and taking them all out of rotation would
+        only turn errors into connection failures.
+        """
+        return self.vector_db_status == "healthy" and self.embedding_status == "healthy"
+
+    @property
+    def status(self) -> str:
+        if not self.ready:
+            return "unhealthy"
+        return "healthy" if self.llm_status in ("healthy", "unknown") else "degraded"
+
+
+class HealthMonitor:
+    """Periodically checks dependencies and caches the result."""
+
+    def __init__(
+        self,
+        interval: Optional[float] = None,
+        timeout: Optional[float] = None,
+        check_llm: Optional[bool] = None,
+    ):
+        self.interval = (
+            interval if interval is not None else settings.health_check_interval
+        )
+        self.timeout = timeout if timeout is not None else settings.health_check_timeout
+        self.check_llm = (
+            check_llm if check_llm is not None else settings.health_check_llm
+        )
+        self._snapshot: Optional[HealthSnapshot] = None
+        self._refresh_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Take an initial snapshot and start the background refresh loop."""
+        if self._task is not None:
+            return
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background refresh loop."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except (
+                Exception
+            ) as exc:  # pragma: no cover - refresh handles its own errors
+                logger.warning(f"Health refresh failed: {exc}")
+
+    async def get_snapshot(self) -> HealthSnapshot:
+        """Return the cached snapshot, refreshing it if missing or stale.
+
+        The background loop normally keeps the snapshot fresh; the fallback
+        covers the monitor not running (e.g. in tests) or a stalled loop.
+        """
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.age_seconds > self.interval * 2:
+            snapshot = await self.refresh(max_age=self.interval)
+        return snapshot
+
+    async def refresh(self, max_age: Optional[float] = None) -> HealthSnapshot:
+        """Run all checks and store the result.
+
+        Concurrent callers share one refresh; with ``max_age`` set, a snapshot
+        refreshed by another caller within that window is returned as-is.
+        """
+        async with self._refresh_lock:
+            if (
+                max_age is not None
+                and self._snapshot is not None
+                and self._snapshot.age_seconds <= max_age
+            ):
+                return self._snapshot
+
+            (
+                vector_status,
+                documents_indexed,
+                vector_detail,
+            ) = await self._check_vector_store()
+            llm_status, llm_detail = await self._check_llm()
+            embedding_status = (
+                "healthy" if embedding_service.model is not None else "loading"
+            )
+
+            self._snapshot = HealthSnapshot(
+                vector_db_status=vector_status,
+                llm_status=llm_status,
+                embedding_status=embedding_status,
+                documents_indexed=documents_indexed,
+                checked_at=datetime.now(),
+                checked_monotonic=time.monotonic(),
+                details={"vector_store": vector_detail, "llm_service": llm_detail},
+            )
+            return self._snapshot
+
+    async def _check_vector_store(self):
+        try:
+            count = await asyncio.wait_for(vector_store.count_documents(), self.timeout)
+            return "healthy", count, {"total_documents": count}
+        except Exception as exc:
+            logger.warning(f"Vector store health check failed: {exc}")
+            return "unhealthy", 0, {"error": str(exc) or exc.__class__.__name__}
+
+    async def _check_llm(self):
+        if not self.check_llm:
+            return "unknown", {
+                "status": "unknown",
+                "detail": "LLM health check disabled",
+            }
+        try:
+            result = await asyncio.wait_for(llm_service.check_health(), self.timeout)
+        except Exception as exc:
+            result = {
+                "status": "unhealthy",
+                "error": str(exc) or exc.__class__.__name__,
+            }
+        status = "healthy" if result.get("status") == "healthy" else "unhealthy"
+        return status, result
+
+
+# Global health monitor instance
+health_monitor = HealthMonitor()
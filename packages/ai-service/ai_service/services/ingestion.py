@@ -10,19 +10,20 @@ Design goals:
 from __future__ import annotations
 
 import asyncio
+import hashlib
 import time
+from dataclasses import dataclass, replace
 from pathlib import Path
-from typing import List, Optional, Tuple
-from dataclasses import dataclass
-import hashlib
+from typing import Dict, List, Optional, Tuple
+
 from loguru import logger
 
 from ai_service.config.settings import settings
-from ai_service.models.document import ProcessedDocument, IngestionResult, DocumentChunk
+from ai_service.models.document import DocumentChunk, IngestionResult, ProcessedDocument
+from ai_service.services.embedding import EmbeddingService, embedding_service
+from ai_service.services.vector_store import VectorStoreService, writable_vector_store
+from ai_service.utils.chunking import ChunkingConfig, MarkdownChunker, default_chunker
 from ai_service.utils.preprocessing import default_preprocessor
-from ai_service.utils.chunking import default_chunker, ChunkingConfig
-from ai_service.services.vector_store import vector_store, VectorStoreService
-from ai_service.services.embedding import embedding_service, EmbeddingService
 
 
 def compute_file_hash(
@@ -39,11 +40,14 @@ def compute_file_hash(
     hasher.update(str(chunking_config.max_chunk_size).encode("utf-8"))
     hasher.update(str(chunking_config.chunk_overlap).encode("utf-8"))
     hasher.update(str(chunking_config.respect_headings).encode("utf-8"))
+    hasher.update(chunking_config.size_unit.encode("utf-8"))
     hasher.update(embedding_model_name.encode("utf-8"))
     return hasher.hexdigest()
 
 
-def _process_file_to_document(file_path: Path) -> ProcessedDocument:
+def _process_file_to_document(
+    file_path: Path, chunker: MarkdownChunker = default_chunker
+) -> ProcessedDocument:
     """Convert a markdown file into a ProcessedDocument with chunks."""
     logger.debug(f"Processing file: {file_path}")
 
@@ -51,7 +55,7 @@ def _process_file_to_document(file_path: Path) -> ProcessedDocument:
 
     chunks: List[DocumentChunk] = []
     if metadata.published:
-        chunks = default_chunker.chunk_document(
+        chunks = chunker.chunk_document(
             content=content,
             document_path=str(file_path),
             metadata=metadata,
@@ -80,11 +84,23 @@ class DocumentIngester:
     ) -> None:
         self.docs_path = Path(docs_path or settings.docs_path)
         self.embedding = embedding or embedding_service
-        self.vector = vector or vector_store
-        self.chunking_config = chunking_config or ChunkingConfig(
-            max_chunk_size=settings.chunk_size,
-            chunk_overlap=settings.chunk_overlap,
-        )
+        self.vector = vector or writable_vector_store()
+        if chunking_config is None:
+            if settings.chunk_unit == "tokens":
+                # max_chunk_size 0 is resolved to the model's max_seq_length
+                # in prepare()
+                chunking_config = ChunkingConfig(
+                    max_chunk_size=settings.chunk_max_tokens,
+                    chunk_overlap=settings.chunk_overlap_tokens,
+                    size_unit="tokens",
+                )
+            else:
+                chunking_config = ChunkingConfig(
+                    max_chunk_size=settings.chunk_size,
+                    chunk_overlap=settings.chunk_overlap,
+                )
+        self.chunking_config = chunking_config
+        self.chunker: MarkdownChunker = default_chunker
         # Execution controls resolved from settings only
         self.file_paths: Optional[List[str]] = None
         self.include_patterns: Optional[List[str]] = None
@@ -102,11 +118,34 @@ class DocumentIngester:
         await self.vector.initialize()
         logger.info("Services initialized")
 
+        self.chunker = self._build_chunker()
+
         files = self._find_markdown_files(self.include_patterns, self.exclude_patterns)
 
         logger.info(f"Prepared {len(files)} markdown files for ingestion")
         return DocumentIngester.IngestionPlan(docs_path=self.docs_path, files=files)
 
+    def _build_chunker(self) -> MarkdownChunker:
+        """Create the chunker for this run.
+
+        In token mode it is sized to the embedding model.
+        """
+        if self.chunking_config.size_unit != "tokens":
+            return MarkdownChunker(self.chunking_config)
+
+        if self.chunking_config.max_chunk_size <= 0:
+            self.chunking_config = replace(
+                self.chunking_config,
+                max_chunk_size=self.embedding.get_max_seq_length(),
+            )
+        logger.info(
+            f"Chunking by tokens: {self.chunking_config.max_chunk_size} tokens "
+            f"per chunk, {self.chunking_config.chunk_overlap} overlap"
+        )
+        return MarkdownChunker(
+            self.chunking_config, tokenizer=self.embedding.get_tokenizer()
+        )
+
     def _find_markdown_files(
         self,
         include_patterns: Optional[List[str]] = None,
@@ -155,6 +194,8 @@ class DocumentIngester:
             "files_skipped": 0,
             "chunks_created": 0,
             "vectors_stored": 0,
+            "embedding_tokens": 0,
+            "embedding_seconds": 0.0,
             "errors": [],
         }
 
@@ -173,13 +214,37 @@ class DocumentIngester:
             stats["files_skipped"] += batch_stats["files_skipped"]
             stats["chunks_created"] += batch_stats["chunks_created"]
             stats["vectors_stored"] += batch_stats["vectors_stored"]
+            stats["embedding_tokens"] += batch_stats["embedding_tokens"]
+            stats["embedding_seconds"] += batch_stats["embedding_seconds"]
             stats["errors"].extend(batch_stats["errors"])
 
+        if stats["vectors_stored"]:
+            await self.vector.optimize()
+        if settings.vector_db_type == "snapshot":
+            await self._publish_snapshot(changed=bool(stats["vectors_stored"]))
+
         processing_time = time.time() - start_time
         logger.info(f"Document ingestion completed in {processing_time:.2f} seconds")
+        if stats["embedding_seconds"] > 0:
+            logger.info(
+                f"Embedded {stats['embedding_tokens']} tokens in "
+                f"{stats['embedding_seconds']:.2f}s "
+                f"({stats['embedding_tokens'] / stats['embedding_seconds']:.0f} "
+                f"tokens/s)"
+            )
 
         return self._create_result(start_time, stats)
 
+    async def _publish_snapshot(self, changed: bool) -> None:
+        """Publish the index for snapshot-serving workers if it changed."""
+        from ai_service.services.snapshot_store import current_version, publish_snapshot
+
+        root = Path(settings.snapshot_path)
+        if changed or current_version(root) is None:
+            await publish_snapshot(self.vector, root)
+        else:
+            logger.info("Index unchanged, keeping the current snapshot")
+
     def _create_result(self, start_time: float, stats: dict) -> IngestionResult:
         """Create ingestion result from local aggregation statistics."""
         processing_time = time.time() - start_time
@@ -188,6 +253,11 @@ class DocumentIngester:
             chunks_created=stats["chunks_created"],
             vectors_stored=stats["vectors_stored"],
             processing_time_seconds=processing_time,
+            embedding_tokens_per_second=(
+                stats["embedding_tokens"] / stats["embedding_seconds"]
+                if stats.get("embedding_seconds")
+                else 0.0
+            ),
             errors=stats["errors"],
             skipped_files=[f"Skipped {stats['files_skipped']} files"],
         )
@@ -198,7 +268,7 @@ class DocumentIngester:
         Returns an aggregation dict for this batch.
         """
         tasks = [
-            asyncio.to_thread(_process_file_to_document, file_path)
+            asyncio.to_thread(_process_file_to_document, file_path, self.chunker)
             for file_path in files
         ]
         processed_docs = await asyncio.gather(*tasks, return_exceptions=True)
@@ -208,9 +278,12 @@ class DocumentIngester:
             "files_skipped": 0,
             "chunks_created": 0,
             "vectors_stored": 0,
+            "embedding_tokens": 0,
+            "embedding_seconds": 0.0,
             "errors": [],
         }
 
+        pending: List[Tuple[ProcessedDocument, str]] = []
         for i, result in enumerate(processed_docs):
             file_path = str(files[i])
             if isinstance(result, Exception):
@@ -231,14 +304,40 @@ class DocumentIngester:
                 self.chunking_config,
                 self.embedding.model_name,
             )
+            # Unchanged files are skipped before embedding anything
+            if await self.vector.get_document_hash(result.document_path) == file_hash:
+                logger.info(f"No changes detected for {result.document_path}, skipping")
+                stats["files_skipped"] += 1
+                continue
+            pending.append((result, file_hash))
+
+        if not pending:
+            return stats
+
+        # Embed the whole batch at once so length bucketing spans documents
+        usage: Dict[str, float] = {}
+        embeddings = await self.embedding.embed_texts(
+            [chunk.content for document, _ in pending for chunk in document.chunks],
+            usage=usage,
+        )
+        stats["embedding_tokens"] = usage.get("tokens", 0)
+        stats["embedding_seconds"] = usage.get("seconds", 0.0)
+
+        offset = 0
+        for document, file_hash in pending:
+            count = len(document.chunks)
             added = await self.vector.upsert_documents(
-                result.document_path, result.chunks, file_hash
+                document.document_path,
+                document.chunks,
+                file_hash,
+                embeddings=embeddings[offset : offset + count],
             )
+            offset += count
             if added == 0:
                 stats["files_skipped"] += 1
             else:
                 stats["files_processed"] += 1
-                stats["chunks_created"] += len(result.chunks)
+                stats["chunks_created"] += count
                 stats["vectors_stored"] += added
 
         return stats
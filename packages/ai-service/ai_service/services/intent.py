@@ -0,0 +1,79 @@
+"""
+Query intent rules.
+Keyword rules are data (``config/intent_rules.json`` by default); matchers
+for them are compiled once, so adding keywords does not add per-request scans.
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, FrozenSet, List, Mapping, Optional, Union
+
+from ai_service.utils.keyword_matcher import KeywordMatcher
+
+DEFAULT_RULES_PATH = (
+    Path(__file__).resolve().parents[1] / "config" / "intent_rules.json"
+)
+
+GENERAL_INTENT = "general"
+
+
+class IntentRules:
+    """Compiled intent rules.
+
+    ``intents`` maps intent name -> query keywords, in priority order: when a
+    query matches several intents the first one wins. ``content`` maps
+    keyword classes used to score retrieved chunks (e.g. ``release_terms``).
+    """
+
+    def __init__(
+        self,
+        intents: Mapping[str, List[str]],
+        content: Optional[Mapping[str, List[str]]] = None,
+    ):
+        self.intents = tuple(intents)
+        self.query_matcher = KeywordMatcher(intents)
+        self.content_matcher = KeywordMatcher(content or {})
+
+    def classify(self, query: str) -> str:
+        """Return the highest-priority intent matched by ``query``."""
+        matched = self.query_matcher.match_classes(query)
+        return next(
+            (intent for intent in self.intents if intent in matched), GENERAL_INTENT
+        )
+
+    def content_matches(self, text: str) -> Dict[str, FrozenSet[str]]:
+        """Return content keyword class -> keywords found in ``text``."""
+        return self.content_matcher.match_classes(text)
+
+
+def _keyword_table(
+    rules: Mapping, key: str, source: Union[str, Path]
+) -> Dict[str, List[str]]:
+    table = rules.get(key, {})
+    if not isinstance(table, dict) or not all(
+        isinstance(keywords, list) and all(isinstance(k, str) for k in keywords)
+        for keywords in table.values()
+    ):
+        raise ValueError(f"{source}: '{key}' must map names to lists of keywords")
+    return table
+
+
+def load_intent_rules(path: Optional[Union[str, Path]] = None) -> IntentRules:
+    """Load and compile intent rules from a JSON file.
+
+    Raises:
+        OSError: If the file cannot be read.
+        ValueError: If it is not valid JSON or not shaped like the default rules.
+    """
+    source = Path(path) if path else DEFAULT_RULES_PATH
+    try:
+        rules = json.loads(source.read_text(encoding="utf-8"))
+    except json.JSONDecodeError as e:
+        raise ValueError(f"{source}: invalid JSON: {e}") from e
+    if not isinstance(rules, dict):
+        raise ValueError(f"{source}: expected a JSON object")
+
+    return IntentRules(
+        _keyword_table(rules, "intents", source),
+        _keyword_table(rules, "content", source),
+    )
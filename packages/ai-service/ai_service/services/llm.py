@@ -1,12 +1,16 @@
 import asyncio
-import contextlib
 import inspect
-from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional
+import time
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, List, Optional, Tuple
+
 import openai
 from loguru import logger
 
 from ai_service.config.settings import settings
-
+from ai_service.services.llm_http import build_http_client, build_timeout
+from ai_service.services.llm_router import ProviderEndpoint, ProviderRouter
+from ai_service.utils.metrics import LLM_COMPLETION_TOKENS, LLM_PROMPT_TOKENS
+from ai_service.utils.timing import record_stage, stage_timer
 
 StreamCallback = Callable[[str], Optional[Awaitable[None]]]
 
@@ -16,17 +20,25 @@ class LLMService:
 
     def __init__(self):
         self.openai_client: Optional[openai.AsyncOpenAI] = None
+        self.router: Optional[ProviderRouter] = None
         self._initialized = False
 
+    def _get_router(self) -> ProviderRouter:
+        """Provider router built by ``initialize``."""
+        if self.router is None:
+            raise RuntimeError("LLM client not initialized")
+        return self.router
+
     async def initialize(self) -> None:
         """Initialize LLM client using settings-provided configuration."""
         if self._initialized:
             return
 
         try:
-            config = settings.get_llm_config()
+            # Raises ValueError when the primary provider has no API key
+            settings.get_llm_config()
             logger.info("Initializing LLM service with unified configuration")
-            await self._initialize_client(config)
+            await self._initialize_client()
             logger.info("LLM service initialized successfully")
         except ValueError as e:
             # API key not configured - service will start but LLM calls will fail
@@ -35,32 +47,61 @@ class LLMService:
 
         self._initialized = True
 
-    async def _initialize_client(self, config: Dict[str, Any]) -> None:
-        """Initialize OpenAI-compatible client with unified configuration."""
-        api_key = config.get("api_key")
-        base_url = config.get("base_url")
+    async def _initialize_client(self) -> None:
+        """Initialize OpenAI-compatible clients for every configured provider."""
+        endpoints = []
+        for provider in settings.get_llm_providers():
+            # Each endpoint gets its own tuned HTTP pool; retries are handled
+            # by the provider router, so the SDK's own retries are disabled
+            client_kwargs = {
+                "api_key": provider["api_key"],
+                "http_client": build_http_client(provider["name"]),
+                "timeout": build_timeout(),
+                "max_retries": 0,
+            }
+            if provider["base_url"]:
+                client_kwargs["base_url"] = provider["base_url"]
+
+            endpoints.append(
+                ProviderEndpoint(
+                    name=provider["name"],
+                    client=openai.AsyncOpenAI(**client_kwargs),
+                    model=provider["model"],
+                    weight=provider["weight"],
+                )
+            )
 
-        if not api_key:
-            raise ValueError("API key is required but not provided")
+        self.router = ProviderRouter.from_settings(endpoints)
+        self.openai_client = self.router.primary.client
 
-        # Set up client with generic configuration
-        client_kwargs = {"api_key": api_key}
-        if base_url:
-            client_kwargs["base_url"] = base_url
+        # Open connections (DNS, TCP and TLS) before the first user request
+        await self._prewarm_connections(settings.llm_prewarm_connections)
 
-        self.openai_client = openai.AsyncOpenAI(**client_kwargs)
+    async def _prewarm_connections(self, count: int) -> None:
+        """Open ``count`` connections per provider with cheap ``GET /models`` calls.
 
-        # Test the connection with a simple call
-        try:
-            test_response = await self.openai_client.chat.completions.create(
-                model=config.get("model"),
-                messages=[{"role": "user", "content": "test"}],
-                max_tokens=1,
+        This replaces a test completion: it verifies reachability and
+        credentials without spending tokens. Providers without a models
+        endpoint still leave the kept-alive connection in the pool.
+        """
+        if self.router is None or count <= 0:
+            return
+
+        results = await asyncio.gather(
+            *(
+                endpoint.client.models.list()
+                for endpoint in self.router.endpoints
+                for _ in range(count)
+            ),
+            return_exceptions=True,
+        )
+        errors = [r for r in results if isinstance(r, Exception)]
+        if errors:
+            logger.warning(
+                f"Could not verify LLM connection (this may be normal): {errors[0]}"
             )
-            logger.info("LLM connection successful")
-        except Exception as e:
-            logger.warning(f"Could not verify LLM connection (this may be normal): {e}")
-            # Don't raise exception as some providers may have limitations on test calls
+        else:
+            logger.info(f"LLM connection successful ({count} connections pre-warmed)")
 
     async def generate_response(
         self,
@@ -69,6 +110,7 @@ class LLMService:
         temperature: Optional[float] = None,
         stream: bool = False,
         on_token: Optional[StreamCallback] = None,
+        usage: Optional[Dict[str, int]] = None,
     ) -> str:
         """Generate a response using the configured LLM.
 
@@ -78,60 +120,84 @@ class LLMService:
             temperature: Sampling temperature.
             stream: Whether to stream the response from the provider.
             on_token: Optional callback invoked with each streamed token.
+            usage: Optional dict filled with the provider-reported token
+                usage ("prompt_tokens", "completion_tokens", "total_tokens",
+                "cached_tokens").
 
         Returns:
             Generated response text.
         """
-        await self.initialize()
-
-        if not self.openai_client:
-            raise RuntimeError(
-                "LLM service not available. Please configure API_KEY in .env file."
-            )
-
-        config = settings.get_llm_config()
-        resolved_max_tokens = max_tokens or config["max_tokens"]
-        resolved_temperature = temperature or config["temperature"]
-        model = config["model"]
+        model, resolved_max_tokens, resolved_temperature = await self._resolve_request(
+            max_tokens, temperature
+        )
 
         try:
-            if stream:
-                return await self._generate_response_stream(
+            with stage_timer(None, "llm_total"):
+                if stream:
+                    collected_parts: List[str] = []
+                    async for token in self._generate_response_stream(
+                        messages=messages,
+                        model=model,
+                        max_tokens=resolved_max_tokens,
+                        temperature=resolved_temperature,
+                        usage=usage,
+                    ):
+                        collected_parts.append(token)
+                        if on_token:
+                            await self._emit_stream_token(on_token, token)
+                    return "".join(collected_parts)
+
+                return await self._generate_response_text(
                     messages=messages,
                     model=model,
                     max_tokens=resolved_max_tokens,
                     temperature=resolved_temperature,
-                    on_token=on_token,
+                    usage=usage,
                 )
-
-            return await self._generate_response_text(
-                messages=messages,
-                model=model,
-                max_tokens=resolved_max_tokens,
-                temperature=resolved_temperature,
-            )
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
             raise
 
+    async def _resolve_request(
+        self, max_tokens: Optional[int], temperature: Optional[float]
+    ) -> Tuple[str, int, float]:
+        """Initialize the client and resolve model, max_tokens and temperature."""
+        await self.initialize()
+
+        if not self.openai_client:
+            raise RuntimeError(
+                "LLM service not available. Please configure API_KEY in .env file."
+            )
+
+        config = settings.get_llm_config()
+        return (
+            config["model"],
+            max_tokens or config["max_tokens"],
+            temperature or config["temperature"],
+        )
+
     async def _generate_response_text(
         self,
         messages: List[Dict[str, str]],
         model: str,
         max_tokens: int,
         temperature: float,
+        usage: Optional[Dict[str, int]] = None,
     ) -> str:
         """Generate a complete response using the OpenAI-compatible API."""
         if not self.openai_client:
             raise RuntimeError("LLM client not initialized")
 
         try:
-            response = await self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
+            response = await self._get_router().complete(
+                {
+                    "model": model,
+                    "messages": messages,
+                    "max_tokens": max_tokens,
+                    "temperature": temperature,
+                }
             )
+            self._record_usage(usage, getattr(response, "usage", None))
             return response.choices[0].message.content
 
         except openai.APIError as e:
@@ -148,25 +214,30 @@ class LLMService:
         model: str,
         max_tokens: int,
         temperature: float,
-        on_token: Optional[StreamCallback] = None,
-    ) -> str:
-        """Stream response from the provider while building the full message."""
+        usage: Optional[Dict[str, int]] = None,
+    ) -> AsyncGenerator[str, None]:
+        """Yield content tokens streamed from the provider."""
 
         if not self.openai_client:
             raise RuntimeError("LLM client not initialized")
 
+        start = time.perf_counter()
+        first_token = True
         try:
-            response = await self.openai_client.chat.completions.create(
-                model=model,
-                messages=messages,
-                max_tokens=max_tokens,
-                temperature=temperature,
-                stream=True,
-            )
-
-            collected_parts: List[str] = []
-
-            async for chunk in response:
+            # Hedging, retries and the first-byte timeout are applied by the
+            # router before the first token reaches us
+            request: Dict[str, Any] = {
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+            }
+            if settings.llm_stream_usage:
+                request["stream_options"] = {"include_usage": True}
+
+            async for chunk in self._get_router().stream(request):
+                # Providers that report usage on streams send it on the last chunk
+                self._record_usage(usage, getattr(chunk, "usage", None))
                 if not chunk.choices:
                     continue
 
@@ -178,13 +249,17 @@ class LLMService:
                 if not token:
                     continue
 
-                collected_parts.append(token)
-
-                if on_token:
-                    await self._emit_stream_token(on_token, token)
-
-            return "".join(collected_parts)
+                if first_token:
+                    first_token = False
+                    record_stage("llm_ttft", time.perf_counter() - start)
+                yield token
 
+        except asyncio.TimeoutError:
+            logger.error(
+                f"LLM stream produced no data within {settings.llm_first_byte_timeout}s"
+                " (first-byte timeout)"
+            )
+            raise
         except openai.APIError as e:
             logger.error(f"LLM API error (streaming): {e}")
             raise
@@ -192,6 +267,34 @@ class LLMService:
             logger.error(f"Unexpected error in LLM streaming: {e}")
             raise
 
+    @staticmethod
+    def _record_usage(target: Optional[Dict[str, int]], reported: Any) -> None:
+        """Record provider-reported token usage and copy it into ``target``.
+
+        ``cached_tokens`` is the part of the prompt served from the
+        provider's prompt cache (``prompt_tokens_details.cached_tokens``).
+        """
+        if reported is None:
+            return
+        values: Dict[str, int] = {}
+        for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            value = getattr(reported, key, None)
+            if isinstance(value, int):
+                values[key] = value
+        if "prompt_tokens" not in values:
+            return
+        details = getattr(reported, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None)
+        values["cached_tokens"] = cached if isinstance(cached, int) else 0
+
+        LLM_PROMPT_TOKENS.labels("cached").inc(values["cached_tokens"])
+        LLM_PROMPT_TOKENS.labels("uncached").inc(
+            max(0, values["prompt_tokens"] - values["cached_tokens"])
+        )
+        LLM_COMPLETION_TOKENS.inc(values.get("completion_tokens", 0))
+        if target is not None:
+            target.update(values)
+
     @staticmethod
     async def _emit_stream_token(callback: StreamCallback, token: str) -> None:
         try:
@@ -203,7 +306,11 @@ class LLMService:
             raise
 
     async def check_health(self) -> Dict[str, Any]:
-        """Check the health of the LLM service."""
+        """Check the health of the LLM service.
+
+        Probes with ``GET /models`` (as the connection pre-warm does) rather
+        than a test completion, so periodic checks do not spend tokens.
+        """
         try:
             await self.initialize()
 
@@ -213,12 +320,7 @@ class LLMService:
             config = settings.get_llm_config()
 
             try:
-                # Simple test call
-                response = await self.openai_client.chat.completions.create(
-                    model=config["model"],
-                    messages=[{"role": "user", "content": "Hello"}],
-                    max_tokens=5,
-                )
+                await self.openai_client.models.list()
                 return {"status": "healthy", "model": config["model"]}
             except Exception as e:
                 return {
@@ -231,54 +333,39 @@ class LLMService:
             return {"status": "error", "error": str(e)}
 
     async def close(self) -> None:
-        """Close all connections."""
-        # OpenAI client doesn't need explicit closing
-        pass
+        """Close the provider client and its connection pool."""
+        router = self.router
+        self.router = None
+        self.openai_client = None
+        self._initialized = False
+        if router is not None:
+            await router.aclose()
 
     async def stream_response(
         self,
         messages: List[Dict[str, str]],
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
+        usage: Optional[Dict[str, int]] = None,
     ) -> AsyncGenerator[str, None]:
-        """Yield response chunks from the configured LLM."""
-        queue: asyncio.Queue[Any] = asyncio.Queue()
-        sentinel = object()
-
-        async def on_token(token: str) -> None:
-            await queue.put(token)
+        """Yield response chunks from the configured LLM.
 
-        async def produce() -> None:
-            try:
-                await self.generate_response(
-                    messages=messages,
-                    max_tokens=max_tokens,
-                    temperature=temperature,
-                    stream=True,
-                    on_token=on_token,
-                )
-            except Exception as exc:  # pragma: no cover - forwarded via queue
-                await queue.put(exc)
-            finally:
-                await queue.put(sentinel)
-
-        producer_task = asyncio.create_task(produce())
+        ``usage`` is filled once the stream completes, if the provider
+        reports token usage.
+        """
+        model, resolved_max_tokens, resolved_temperature = await self._resolve_request(
+            max_tokens, temperature
+        )
 
-        try:
-            while True:
-                item = await queue.get()
-                if item is sentinel:
-                    break
-                if isinstance(item, Exception):
-                    raise item
-                yield item  # type: ignore[misc]
-        finally:
-            if not producer_task.done():
-                producer_task.cancel()
-                with contextlib.suppress(asyncio.CancelledError):
-                    await producer_task
-            else:
-                await producer_task
+        with stage_timer(None, "llm_total"):
+            async for token in self._generate_response_stream(
+                messages=messages,
+                model=model,
+                max_tokens=resolved_max_tokens,
+                temperature=resolved_temperature,
+                usage=usage,
+            ):
+                yield token
 
 
 # Global LLM service instance
@@ -0,0 +1,125 @@
+"""
+Shared HTTP client for the LLM provider.
+Builds a tuned, instrumented ``httpx.AsyncClient`` for ``openai.AsyncOpenAI``.
+"""
+
+from typing import Optional
+
+import httpx
+from loguru import logger
+
+from ai_service.config.settings import settings
+from ai_service.utils.metrics import LLM_HTTP_CONNECTIONS, LLM_HTTP_IN_FLIGHT
+
+
+def http2_available() -> bool:
+    """Whether the optional ``h2`` package needed for HTTP/2 is installed."""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class _TrackedStream(httpx.AsyncByteStream):
+    """Response body wrapper that marks the request finished once closed."""
+
+    def __init__(
+        self, stream: httpx.AsyncByteStream, transport: "InstrumentedTransport"
+    ):
+        self._stream = stream
+        self._transport = transport
+        self._closed = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._transport._finish()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Transport wrapper tracking in-flight requests and pool connections."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+        self.in_flight = 0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.in_flight += 1
+        try:
+            response = await self._transport.handle_async_request(request)
+        except BaseException:
+            self._finish()
+            raise
+        response.stream = _TrackedStream(response.stream, self)
+        return response
+
+    def _finish(self) -> None:
+        self.in_flight -= 1
+
+    def connection_counts(self) -> dict:
+        """Count pooled connections by state (best effort, httpcore internals)."""
+        pool = getattr(self._transport, "_pool", None)
+        connections = list(getattr(pool, "connections", []) or [])
+        idle = sum(1 for conn in connections if conn.is_idle())
+        return {"active": len(connections) - idle, "idle": idle}
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def build_timeout() -> httpx.Timeout:
+    """Connect/read/pool timeouts from settings.
+
+    ``read`` bounds the gap between received bytes, so it also bounds
+    inter-token stalls on streams. The first-byte deadline is enforced by the
+    LLM service, since httpx has no notion of it.
+    """
+    return httpx.Timeout(
+        connect=settings.llm_connect_timeout,
+        read=settings.llm_read_timeout,
+        write=settings.llm_connect_timeout,
+        pool=settings.llm_pool_timeout,
+    )
+
+
+def build_http_client(
+    provider: str = "default", transport: Optional[httpx.AsyncBaseTransport] = None
+) -> httpx.AsyncClient:
+    """Create the shared HTTP client used by one LLM provider endpoint.
+
+    Pool size and keep-alive come from settings. HTTP/2 is enabled when
+    ``LLM_HTTP2`` is set and ``h2`` is installed; otherwise HTTP/1.1 is used.
+    """
+    http2 = settings.llm_http2
+    if http2 and not http2_available():
+        logger.warning("LLM_HTTP2 is enabled but 'h2' is not installed; using HTTP/1.1")
+        http2 = False
+
+    limits = httpx.Limits(
+        max_connections=settings.llm_max_connections,
+        max_keepalive_connections=settings.llm_max_keepalive_connections,
+        keepalive_expiry=settings.llm_keepalive_expiry,
+    )
+    instrumented = InstrumentedTransport(
+        transport or httpx.AsyncHTTPTransport(limits=limits, http2=http2)
+    )
+
+    LLM_HTTP_IN_FLIGHT.labels(provider).set_function(lambda: instrumented.in_flight)
+    for state in ("active", "idle"):
+        LLM_HTTP_CONNECTIONS.labels(provider, state).set_function(
+            lambda state=state: instrumented.connection_counts()[state]
+        )
+
+    return httpx.AsyncClient(
+        transport=instrumented,
+        timeout=build_timeout(),
+        follow_redirects=True,
+    )
@@ -0,0 +1,429 @@
+"""
+Provider routing for OpenAI-compatible LLM endpoints.
+Weighted endpoint selection, latency-based request hedging, retries with
+jittered backoff and a circuit breaker per endpoint.
+"""
+
+import asyncio
+import contextlib
+import inspect
+import random
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Sequence, Set
+
+import openai
+from loguru import logger
+
+from ai_service.config.settings import settings
+from ai_service.utils.metrics import (
+    LLM_ATTEMPTS,
+    LLM_CIRCUIT_OPEN,
+    LLM_HEDGES,
+    LLM_RETRIES,
+)
+
+# Errors worth another attempt: rate limits, 5xx, connection problems and
+# first-byte timeouts. Anything else (bad request, auth) fails immediately.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    asyncio.TimeoutError,
+)
+
+# Recent latency samples kept per endpoint for the hedge deadline
+LATENCY_WINDOW = 200
+# Samples required before the percentile replaces the default hedge delay
+MIN_LATENCY_SAMPLES = 20
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether ``exc`` is a transient upstream failure."""
+    return isinstance(exc, RETRYABLE_ERRORS)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a ``Retry-After`` header, if any."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+async def _close(resource: Any) -> None:
+    """Best-effort close of a provider stream or client."""
+    close = getattr(resource, "close", None) or getattr(resource, "aclose", None)
+    if close is None:
+        return
+    with contextlib.suppress(Exception):
+        result = close()
+        if inspect.isawaitable(result):
+            await result
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    Opens after ``failure_threshold`` consecutive failures. After ``cooldown``
+    seconds it lets a single trial request through (half-open); success
+    closes it, failure re-opens it for another cooldown.
+    """
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.cooldown:
+            return "open"
+        return "half_open"
+
+    def available(self) -> bool:
+        """Whether a request may be sent now (without reserving the trial)."""
+        state = self.state
+        return state == "closed" or (state == "half_open" and not self._trial_in_flight)
+
+    def begin(self) -> None:
+        """Mark a request as started; reserves the trial slot when half-open."""
+        if self.state == "half_open":
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        was_trial = self._trial_in_flight
+        self._trial_in_flight = False
+        self.failures += 1
+        if was_trial or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+    def record_cancelled(self) -> None:
+        """Release the trial slot without judging the endpoint."""
+        self._trial_in_flight = False
+
+
+@dataclass
+class ProviderEndpoint:
+    """One OpenAI-compatible endpoint the router can send requests to."""
+
+    name: str
+    client: Any
+    model: Optional[str] = None
+    weight: float = 1.0
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    # Time to first token ("stream") or to the full response ("complete")
+    latencies: Dict[str, Deque[float]] = field(
+        default_factory=lambda: {
+            "stream": deque(maxlen=LATENCY_WINDOW),
+            "complete": deque(maxlen=LATENCY_WINDOW),
+        }
+    )
+
+    def latency_percentile(self, kind: str, q: float) -> Optional[float]:
+        """``q``-quantile of recent latencies, or None with too few samples."""
+        samples = self.latencies[kind]
+        if len(samples) < MIN_LATENCY_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+
+@dataclass
+class _StreamStart:
+    """A stream that has produced its first content chunk."""
+
+    endpoint: ProviderEndpoint
+    stream: Any
+    iterator: Any
+    buffered: List[Any]
+
+
+def _has_content(chunk: Any) -> bool:
+    choices = getattr(chunk, "choices", None)
+    if not choices:
+        return False
+    delta = getattr(choices[0], "delta", None)
+    return bool(getattr(delta, "content", None))
+
+
+class ProviderRouter:
+    """Routes chat completions across weighted provider endpoints.
+
+    Each call picks an endpoint by weight among those whose circuit is not
+    open. If no response (or, for streams, no first token) arrives within the
+    endpoint's latency percentile, a hedge request goes to another endpoint
+    (or the same one when it is the only one); the first to answer wins and
+    the other is cancelled. Retryable failures are retried with full-jitter
+    exponential backoff, honouring ``Retry-After``.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[ProviderEndpoint],
+        *,
+        hedge: bool = True,
+        hedge_percentile: float = 0.95,
+        hedge_min_delay: float = 0.25,
+        hedge_default_delay: float = 2.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.25,
+        backoff_max: float = 4.0,
+        first_byte_timeout: Optional[float] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        if not endpoints:
+            raise ValueError("At least one LLM endpoint is required")
+        self.endpoints = list(endpoints)
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_default_delay = hedge_default_delay
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.first_byte_timeout = first_byte_timeout or None
+        self._rng = rng or random.Random()
+
+        for endpoint in self.endpoints:
+            LLM_CIRCUIT_OPEN.labels(endpoint.name).set_function(
+                lambda breaker=endpoint.breaker: 1 if breaker.state == "open" else 0
+            )
+
+    @classmethod
+    def from_settings(cls, endpoints: Sequence[ProviderEndpoint]) -> "ProviderRouter":
+        """Create a router configured from the ``LLM_*`` settings."""
+        for endpoint in endpoints:
+            endpoint.breaker = CircuitBreaker(
+                settings.llm_breaker_failure_threshold, settings.llm_breaker_cooldown
+            )
+        return cls(
+            endpoints,
+            hedge=settings.llm_hedge_enabled,
+            hedge_percentile=settings.llm_hedge_percentile,
+            hedge_min_delay=settings.llm_hedge_min_delay,
+            hedge_default_delay=settings.llm_hedge_default_delay,
+            max_retries=settings.llm_max_retries,
+            backoff_base=settings.llm_retry_backoff_base,
+            backoff_max=settings.llm_retry_backoff_max,
+            first_byte_timeout=settings.llm_first_byte_timeout,
+        )
+
+    @property
+    def primary(self) -> ProviderEndpoint:
+        return self.endpoints[0]
+
+    # --- selection and timing ---
+    def _pick(self, exclude: Set[str]) -> Optional[ProviderEndpoint]:
+        candidates = [
+            e for e in self.endpoints if e.name not in exclude and e.weight > 0
+        ]
+        if not candidates:
+            return None
+        available = [e for e in candidates if e.breaker.available()]
+        # With every circuit open, still try rather than fail outright
+        pool = available or candidates
+        return self._rng.choices(pool, weights=[e.weight for e in pool])[0]
+
+    def hedge_delay(self, endpoint: ProviderEndpoint, kind: str) -> float:
+        """Seconds to wait for ``endpoint`` before sending a hedge request."""
+        observed = endpoint.latency_percentile(kind, self.hedge_percentile)
+        if observed is None:
+            return self.hedge_default_delay
+        return max(self.hedge_min_delay, observed)
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        ceiling = min(self.backoff_max, self.backoff_base * (2**attempt))
+        delay = self._rng.uniform(0, ceiling)
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    # --- single attempts ---
+    async def _attempt(
+        self, endpoint: ProviderEndpoint, kind: str, request: Dict[str, Any]
+    ) -> Any:
+        """Send one request to ``endpoint`` and wait for its first response."""
+        payload = dict(request)
+        if endpoint.model:
+            payload["model"] = endpoint.model
+        endpoint.breaker.begin()
+        start = time.perf_counter()
+        try:
+            if kind == "stream":
+                result = await asyncio.wait_for(
+                    self._open_stream(endpoint, payload), self.first_byte_timeout
+                )
+            else:
+                result = await endpoint.client.chat.completions.create(**payload)
+        except asyncio.CancelledError:
+            self._record_censored(endpoint, kind, time.perf_counter() - start)
+            endpoint.breaker.record_cancelled()
+            LLM_ATTEMPTS.labels(endpoint.name, "cancelled").inc()
+            raise
+        except Exception as exc:
+            if isinstance(exc, asyncio.TimeoutError):
+                self._record_censored(endpoint, kind, time.perf_counter() - start)
+            if is_retryable(exc):
+                endpoint.breaker.record_failure()
+            else:
+                endpoint.breaker.record_cancelled()
+            LLM_ATTEMPTS.labels(endpoint.name, "error").inc()
+            logger.warning(f"LLM attempt on '{endpoint.name}' failed: {exc!r}")
+            raise
+
+        endpoint.latencies[kind].append(time.perf_counter() - start)
+        endpoint.breaker.record_success()
+        LLM_ATTEMPTS.labels(endpoint.name, "success").inc()
+        return result
+
+    def _record_censored(
+        self, endpoint: ProviderEndpoint, kind: str, elapsed: float
+    ) -> None:
+        """Record an attempt that was cancelled or timed out before answering.
+
+        Its latency is at least ``elapsed``. Dropping such attempts keeps only
+        the fast answers and drags the percentile (and so the hedge deadline)
+        down; once past the current deadline, ``elapsed`` is kept as a
+        conservative sample of the tail.
+        """
+        if elapsed >= self.hedge_delay(endpoint, kind):
+            endpoint.latencies[kind].append(elapsed)
+
+    async def _open_stream(
+        self, endpoint: ProviderEndpoint, payload: Dict[str, Any]
+    ) -> _StreamStart:
+        """Open a stream and read up to (and including) the first content chunk."""
+        stream = await endpoint.client.chat.completions.create(**payload, stream=True)
+        try:
+            iterator = stream.__aiter__()
+            buffered: List[Any] = []
+            while True:
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                buffered.append(chunk)
+                if _has_content(chunk):
+                    break
+            return _StreamStart(endpoint, stream, iterator, buffered)
+        except BaseException:
+            await _close(stream)
+            raise
+
+    # --- hedged race and retries ---
+    async def _race(self, kind: str, request: Dict[str, Any]) -> Any:
+        """Run one hedged round; returns the first successful attempt."""
+        primary = self._pick(set()) or self.primary
+        tasks: Dict[asyncio.Task, ProviderEndpoint] = {
+            asyncio.create_task(self._attempt(primary, kind, request)): primary
+        }
+        pending: Set[asyncio.Task] = set(tasks)
+        hedge_deadline = self.hedge_delay(primary, kind) if self.hedge else None
+        last_error: Optional[BaseException] = None
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, timeout=hedge_deadline, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # No answer within the deadline: hedge once
+                    hedge_deadline = None
+                    used = {endpoint.name for endpoint in tasks.values()}
+                    target = self._pick(used) or primary
+                    LLM_HEDGES.labels(target.name).inc()
+                    task = asyncio.create_task(self._attempt(target, kind, request))
+                    tasks[task] = target
+                    pending.add(task)
+                    continue
+
+                winner = None
+                for task in done:
+                    exc = task.exception()
+                    if exc is None:
+                        if winner is None:
+                            winner = task.result()
+                        elif kind == "stream":
+                            await _close(task.result().stream)
+                    else:
+                        last_error = exc
+                        if not is_retryable(exc):
+                            raise exc
+                if winner is not None:
+                    return winner
+                # A failed attempt no longer needs a hedge of its own
+                hedge_deadline = None
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in pending:
+                with contextlib.suppress(BaseException):
+                    result = await task
+                    if kind == "stream":
+                        await _close(result.stream)
+
+        raise last_error
+
+    async def _run(self, kind: str, request: Dict[str, Any]) -> Any:
+        attempt = 0
+        while True:
+            try:
+                return await self._race(kind, request)
+            except Exception as exc:
+                if not is_retryable(exc) or attempt >= self.max_retries:
+                    raise
+                delay = self._backoff(attempt, exc)
+                attempt += 1
+                LLM_RETRIES.inc()
+                logger.info(
+                    f"Retrying LLM request in {delay:.2f}s (attempt {attempt + 1})"
+                )
+                await asyncio.sleep(delay)
+
+    async def complete(self, request: Dict[str, Any]) -> Any:
+        """Non-streaming chat completion; returns the provider response."""
+        return await self._run("complete", request)
+
+    async def stream(self, request: Dict[str, Any]) -> AsyncIterator[Any]:
+        """Streaming chat completion yielding provider chunks.
+
+        Hedging and retries happen before the first content chunk is yielded,
+        so callers never see output from two attempts. Errors after that point
+        are raised to the caller.
+        """
+        start = await self._run("stream", request)
+        try:
+            for chunk in start.buffered:
+                yield chunk
+            while True:
+                try:
+                    chunk = await start.iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                yield chunk
+        except Exception as exc:
+            if is_retryable(exc):
+                start.endpoint.breaker.record_failure()
+            raise
+        finally:
+            await _close(start.stream)
+
+    async def aclose(self) -> None:
+        """Close every endpoint client."""
+        for endpoint in self.endpoints:
+            await _close(endpoint.client)
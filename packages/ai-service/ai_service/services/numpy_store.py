@@ -0,0 +1,485 @@
+"""
+Exact-search vector store over memory-mapped NumPy segments.
+
+Layout under ``NUMPY_INDEX_PATH/<COLLECTION_NAME>``::
+
+    manifest.json           active segments and deleted ids
+    seg-<id>/vectors.npy    float32 [rows, dim] unit-length embeddings
+    seg-<id>/records.json   ids, documents and flat metadata of the rows
+
+Segments are immutable. Adds write a new segment, deletes record the
+removed ids in the manifest, and compaction merges the live rows into a
+single segment. Every change becomes visible by renaming a new manifest into
+place, so readers and crashes never see a half-written index.
+
+Search is a matrix-vector product over all rows (one memory-mapped matrix
+after compaction) plus ``argpartition``; metadata filters become boolean
+masks that are cached per index version.
+"""
+
+import asyncio
+import operator
+import os
+import shutil
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import orjson
+from loguru import logger
+
+from ai_service.config.settings import settings
+from ai_service.services.vector_store import VectorStoreService
+
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+RECORDS_FILE = "records.json"
+
+# Compact once this fraction of rows is deleted
+_MAX_DELETED_FRACTION = 0.25
+
+_COMPARISONS: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+
+
+@dataclass
+class Segment:
+    name: str
+    vectors: np.ndarray
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+
+
+def read_segment(directory: Path) -> Segment:
+    """Open a segment, memory-mapping its vectors read-only."""
+    records = orjson.loads((directory / RECORDS_FILE).read_bytes())
+    return Segment(
+        name=directory.name,
+        vectors=np.load(directory / VECTORS_FILE, mmap_mode="r"),
+        ids=records["ids"],
+        documents=records["documents"],
+        metadatas=records["metadatas"],
+    )
+
+
+def write_segment(
+    directory: Path,
+    vectors: np.ndarray,
+    ids: List[str],
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+    extra_files: Optional[Dict[str, bytes]] = None,
+) -> None:
+    """Write a segment into a staging directory and rename it into place."""
+    staging = directory.parent / f".{directory.name}.tmp"
+    staging.mkdir(parents=True)
+    np.save(staging / VECTORS_FILE, np.ascontiguousarray(vectors, dtype=np.float32))
+    (staging / RECORDS_FILE).write_bytes(
+        orjson.dumps({"ids": ids, "documents": documents, "metadatas": metadatas})
+    )
+    for name, content in (extra_files or {}).items():
+        (staging / name).write_bytes(content)
+    os.rename(staging, directory)
+
+
+@dataclass
+class IndexState:
+    """One immutable version of the index; writes replace it wholesale."""
+
+    segments: List[str]
+    deleted: Set[str]
+    # One matrix per segment; after compaction a single memory-mapped one
+    blocks: List[np.ndarray]
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    live: np.ndarray
+    path_rows: Dict[str, List[int]]
+    masks: Dict[Tuple[str, str, str], np.ndarray] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, segments: List[Segment], deleted: Set[str]) -> "IndexState":
+        ids = [i for segment in segments for i in segment.ids]
+        metadatas = [m for segment in segments for m in segment.metadatas]
+        live = np.fromiter((i not in deleted for i in ids), dtype=bool, count=len(ids))
+        path_rows: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            if live[row]:
+                path_rows.setdefault(metadata.get("document_path", ""), []).append(row)
+        return cls(
+            segments=[segment.name for segment in segments],
+            deleted=set(deleted),
+            blocks=[segment.vectors for segment in segments],
+            ids=ids,
+            documents=[d for segment in segments for d in segment.documents],
+            metadatas=metadatas,
+            live=live,
+            path_rows=path_rows,
+        )
+
+    @property
+    def live_count(self) -> int:
+        return len(self.ids) - len(self.deleted)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Cosine similarity of every row (live or not) to the unit ``query``.
+
+        ``query`` may also be a (dim x n) matrix of queries, giving one
+        column of similarities per query.
+        """
+        if not self.blocks:
+            return np.zeros(0, dtype=np.float32)
+        if len(self.blocks) == 1:
+            return self.blocks[0] @ query
+        return np.concatenate([block @ query for block in self.blocks])
+
+    def vectors(self, rows: np.ndarray) -> np.ndarray:
+        """Rows of the concatenated matrix."""
+        if len(self.blocks) == 1:
+            return self.blocks[0][rows]
+        # Gather from each block rather than copying the whole matrix
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = np.cumsum([0] + [len(block) for block in self.blocks])
+        which = np.searchsorted(starts, rows, side="right") - 1
+        out = np.empty((len(rows), self.blocks[0].shape[1]), dtype=np.float32)
+        for b in np.unique(which):
+            selected = which == b
+            out[selected] = self.blocks[b][rows[selected] - starts[b]]
+        return out
+
+    def search(
+        self,
+        query: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]] = None,
+        scores: Optional[np.ndarray] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Top ``n_results`` live rows matching ``where`` as (rows, scores).
+
+        ``scores`` are the precomputed similarities of every row to ``query``.
+        """
+        mask = self.live if not where else self.live & self.filter_mask(where)
+        # Scoring every row and masking afterwards beats gathering the subset
+        if scores is None:
+            scores = self.scores(query)
+        candidates = None
+        if not mask.all():
+            candidates = np.flatnonzero(mask)
+            scores = scores[candidates]
+
+        k = min(n_results, len(scores))
+        if k == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(k)
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows = top if candidates is None else candidates[top]
+        return rows, scores[top]
+
+    def query_records(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[np.ndarray]] = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[float]]:
+        """``VectorStoreService._query`` result for the first query row."""
+        rows, scores = self.search(query_embeddings[0], n_results, where)
+        if embeddings is not None and len(rows):
+            embeddings.extend(self.vectors(rows))
+        return (
+            [self.documents[r] for r in rows],
+            [self.metadatas[r] for r in rows],
+            scores.tolist(),
+        )
+
+    def query_records_batch(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[List[np.ndarray]]] = None,
+    ) -> List[Tuple[List[str], List[Dict[str, Any]], List[float]]]:
+        """``VectorStoreService._query_batch`` result.
+
+        Every query row is scored in one matrix product.
+        """
+        all_scores = self.scores(np.asarray(query_embeddings, dtype=np.float32).T)
+        batch = []
+        for i, query in enumerate(query_embeddings):
+            # An empty index scores to a flat empty array
+            column = all_scores[:, i] if all_scores.ndim == 2 else all_scores
+            rows, scores = self.search(query, n_results, where, scores=column)
+            if embeddings is not None and len(rows):
+                embeddings[i].extend(self.vectors(rows))
+            batch.append(
+                (
+                    [self.documents[r] for r in rows],
+                    [self.metadatas[r] for r in rows],
+                    scores.tolist(),
+                )
+            )
+        return batch
+
+    def live_records(
+        self,
+    ) -> Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]:
+        """All live rows as (ids, vectors, documents, metadatas)."""
+        rows = np.flatnonzero(self.live)
+        if not self.blocks:
+            return [], np.zeros((0, 0), dtype=np.float32), [], []
+        return (
+            [self.ids[r] for r in rows],
+            self.vectors(rows),
+            [self.documents[r] for r in rows],
+            [self.metadatas[r] for r in rows],
+        )
+
+    def filter_mask(self, where: Dict[str, Any]) -> np.ndarray:
+        """Boolean row mask for a ChromaDB-style ``where`` filter."""
+        masks = []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                parts = [self.filter_mask(part) for part in condition]
+                combine = np.logical_and if key == "$and" else np.logical_or
+                masks.append(
+                    combine.reduce(parts) if parts else np.ones(len(self.ids), bool)
+                )
+                continue
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for op, value in condition.items():
+                masks.append(self._leaf_mask(key, op, value))
+        return np.logical_and.reduce(masks) if masks else np.ones(len(self.ids), bool)
+
+    def _leaf_mask(self, key: str, op: str, value: Any) -> np.ndarray:
+        cache_key = (key, op, orjson.dumps(value).decode())
+        mask = self.masks.get(cache_key)
+        if mask is None:
+            if op not in _COMPARISONS:
+                raise ValueError(f"Unsupported filter operator: {op}")
+            compare = _COMPARISONS[op]
+            missing = object()
+
+            def matches(metadata: Dict[str, Any]) -> bool:
+                field_value = metadata.get(key, missing)
+                if field_value is missing:
+                    return op in ("$ne", "$nin")
+                try:
+                    return compare(field_value, value)
+                except TypeError:
+                    return False
+
+            mask = np.fromiter(
+                (matches(m) for m in self.metadatas),
+                dtype=bool,
+                count=len(self.metadatas),
+            )
+            self.masks[cache_key] = mask
+        return mask
+
+
+class NumpyVectorStore(VectorStoreService):
+    """Exact cosine search over memory-mapped float32 segments."""
+
+    def __init__(self, index_path: Optional[str] = None):
+        super().__init__()
+        self.index_path = (
+            Path(index_path or settings.numpy_index_path) / settings.collection_name
+        )
+        self._state: Optional[IndexState] = None
+        self._segments: Dict[str, Segment] = {}
+        self._write_lock = asyncio.Lock()
+
+    async def initialize(self) -> None:
+        """Load the manifest and memory-map its segments."""
+        if self._state is not None:
+            return
+
+        async with self._lock:
+            if self._state is not None:
+                return
+            logger.info(f"Initializing NumPy vector store at {self.index_path}...")
+            self.index_path.mkdir(parents=True, exist_ok=True)
+            self._state = await asyncio.to_thread(self._load)
+            logger.info(
+                f"Vector store initialized. Documents: {self._state.live_count}"
+            )
+
+    # --- storage ---
+
+    def _load(self) -> IndexState:
+        manifest_path = self.index_path / MANIFEST_FILE
+        manifest: Dict[str, Any] = {"segments": [], "deleted": []}
+        if manifest_path.exists():
+            manifest = orjson.loads(manifest_path.read_bytes())
+        self._segments = {
+            name: self._read_segment(name) for name in manifest["segments"]
+        }
+        return IndexState.build(list(self._segments.values()), set(manifest["deleted"]))
+
+    def _read_segment(self, name: str) -> Segment:
+        return read_segment(self.index_path / name)
+
+    def _write_segment(
+        self,
+        vectors: np.ndarray,
+        ids: List[str],
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+    ) -> Segment:
+        name = f"seg-{uuid.uuid4().hex}"
+        write_segment(self.index_path / name, vectors, ids, documents, metadatas)
+        return self._read_segment(name)
+
+    def _write_manifest(self, segments: List[str], deleted: Set[str]) -> None:
+        manifest_path = self.index_path / MANIFEST_FILE
+        staging = manifest_path.with_suffix(".json.tmp")
+        with open(staging, "wb") as f:
+            f.write(orjson.dumps({"segments": segments, "deleted": sorted(deleted)}))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(staging, manifest_path)
+
+    def _commit(self, segments: List[Segment], deleted: Set[str]) -> None:
+        """Publish a new index version and drop segments it no longer uses."""
+        self._write_manifest([segment.name for segment in segments], deleted)
+        previous = set(self._segments)
+        self._segments = {segment.name: segment for segment in segments}
+        self._state = IndexState.build(segments, deleted)
+        for name in previous - set(self._segments):
+            # Other processes may still map these files; unlinking is safe on POSIX
+            shutil.rmtree(self.index_path / name, ignore_errors=True)
+
+    def _compact(self) -> None:
+        state = self._state
+        if len(state.segments) <= 1 and not state.deleted:
+            return
+        ids, vectors, documents, metadatas = state.live_records()
+        segments = []
+        if ids:
+            segments.append(self._write_segment(vectors, ids, documents, metadatas))
+        logger.info(f"Compacted {len(state.segments)} segments into {len(segments)}")
+        self._commit(segments, set())
+
+    def _maybe_compact(self) -> None:
+        state = self._state
+        if len(state.segments) > settings.numpy_max_segments or (
+            state.deleted
+            and len(state.deleted) > _MAX_DELETED_FRACTION * len(state.ids)
+        ):
+            self._compact()
+
+    # --- VectorStoreService primitives ---
+
+    async def _write(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict[str, Any]],
+        documents: List[str],
+    ) -> None:
+        def write() -> None:
+            segment = self._write_segment(embeddings, ids, documents, metadatas)
+            self._commit(
+                [self._segments[name] for name in self._state.segments] + [segment],
+                self._state.deleted,
+            )
+            self._maybe_compact()
+
+        async with self._write_lock:
+            await asyncio.to_thread(write)
+
+    async def _query(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[np.ndarray]] = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[float]]:
+        return self._state.query_records(query_embeddings, n_results, where, embeddings)
+
+    async def _query_batch(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[List[np.ndarray]]] = None,
+    ) -> List[Tuple[List[str], List[Dict[str, Any]], List[float]]]:
+        return self._state.query_records_batch(
+            query_embeddings, n_results, where, embeddings
+        )
+
+    async def export_records(
+        self,
+    ) -> Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]:
+        await self.initialize()
+        return self._state.live_records()
+
+    async def _sample_metadatas(self, limit: int) -> List[Dict[str, Any]]:
+        state = self._state
+        return [state.metadatas[r] for r in np.flatnonzero(state.live)[:limit]]
+
+    async def count_documents(self) -> int:
+        await self.initialize()
+        return self._state.live_count
+
+    async def get_document_hash(self, document_path: str) -> Optional[str]:
+        await self.initialize()
+        rows = self._state.path_rows.get(document_path)
+        return self._state.metadatas[rows[0]].get("file_hash") if rows else None
+
+    async def list_document_paths(self) -> List[str]:
+        await self.initialize()
+        return sorted(path for path in self._state.path_rows if path)
+
+    async def delete_documents(self, document_path: str) -> int:
+        await self.initialize()
+
+        def delete() -> int:
+            state = self._state
+            rows = state.path_rows.get(document_path) or []
+            if rows:
+                self._commit(
+                    [self._segments[name] for name in state.segments],
+                    state.deleted | {state.ids[r] for r in rows},
+                )
+                self._maybe_compact()
+            return len(rows)
+
+        try:
+            async with self._write_lock:
+                deleted_count = await asyncio.to_thread(delete)
+            if deleted_count:
+                logger.info(f"Deleted {deleted_count} chunks from {document_path}")
+            return deleted_count
+        except Exception as e:
+            logger.error(f"Failed to delete documents: {e}")
+            return 0
+
+    async def clear_collection(self) -> bool:
+        await self.initialize()
+        try:
+            async with self._write_lock:
+                await asyncio.to_thread(self._commit, [], set())
+            logger.info("Cleared all documents from vector store")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to clear collection: {e}")
+            return False
+
+    async def optimize(self) -> None:
+        """Merge all segments into one, dropping deleted rows."""
+        await self.initialize()
+        async with self._write_lock:
+            await asyncio.to_thread(self._compact)
@@ -3,24 +3,53 @@ RAG (Retrieval-Augmented Generation) pipeline service.
 Combine vector search, context building, and LLM generation into a cohesive flow.
 """
 
-from typing import List, Dict, Any, Tuple, Optional, AsyncGenerator
+import asyncio
+import math
 import time
+from typing import Any, AsyncGenerator, Dict, List, Optional, Tuple
+
+import numpy as np
 from loguru import logger
 
 from ai_service.config.settings import settings
 from ai_service.models.chat import (
+    ChatMessage,
     ChatRequest,
     ChatResponse,
-    ChatMessage,
     SourceReference,
 )
-from ai_service.services.conversation_store import conversation_store
 from ai_service.models.document import DocumentChunk
-from ai_service.services.vector_store import vector_store
+from ai_service.services.conversation_store import conversation_store
+from ai_service.services.embedding import embedding_service
+from ai_service.services.intent import load_intent_rules
 from ai_service.services.llm import llm_service
+from ai_service.services.reranker import reranker_service
+from ai_service.services.vector_store import VectorStoreService, vector_store
+from ai_service.utils.metrics import (
+    NO_CONTEXT_ANSWERS,
+    QUERY_INTENTS,
+    RETRIEVAL_REQUERIES,
+)
+from ai_service.utils.mmr import maximal_marginal_relevance
+from ai_service.utils.timing import stage_timer
+from ai_service.utils.tokens import count_tokens, truncate_to_tokens
+
+# The latest exchange (user + assistant) is kept whole; older turns may be truncated
+HISTORY_RECENT_MESSAGES = 2
+# Per-message framing tokens added by chat formats (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Weight of the latest search in the running chunks-per-document estimate
+DUPLICATE_RATE_SMOOTHING = 0.1
+# Extra candidates for chunks the post-filter drops (release notes, penalties)
+CANDIDATE_HEADROOM = 1.5
+# Retrieval returns at most this many chunks, whatever top_k asks for
+MAX_RETRIEVED_CHUNKS = 3
 
-# Limit how many history messages are included to avoid excessive context
-HISTORY_MAX_MESSAGES = 5
+# Static instructions; kept free of per-request data so the prompt prefix is
+# identical across requests and can be served from the provider's prompt cache
+SYSTEM_PROMPT = "你是 Vite 专家助手。基于提供的文档回答问题，用中文回复，简洁准确。"
+CONTEXT_PROMPT = "文档内容：\n{context}"
 
 
 class RAGPipeline:
@@ -33,14 +62,16 @@ class RAGPipeline:
     4) Persist conversation messages (best-effort)
     """
 
-    def __init__(self):
-        self.system_prompt_template = """你是 Vite 专家助手。基于提供的文档回答问题，用中文回复，简洁准确。
-
-文档内容：
-{context}
-
-对话历史：
-{history}"""
+    def __init__(self, vector: Optional[VectorStoreService] = None):
+        self.system_prompt = SYSTEM_PROMPT
+        self.vector = vector or vector_store
+        # Running estimate of how many retrieved chunks share a document
+        self._chunks_per_document = max(1.0, settings.retrieval_chunks_per_document)
+        try:
+            self.intent_rules = load_intent_rules(settings.intent_rules_path)
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load intent rules, using the built-in ones: {e}")
+            self.intent_rules = load_intent_rules()
 
     async def process_chat_request(self, request: ChatRequest) -> ChatResponse:
         """Process a chat request through the complete RAG pipeline.
@@ -65,43 +96,39 @@ class RAGPipeline:
                 return self._create_no_context_response(request, start_time)
 
             # Step 2: Build context and conversation history
-            context = self._build_context(relevant_chunks)
-
             # Prefer persisted history when conversation_id is provided
-            (
-                persisted_messages,
-                active_conversation_id,
-            ) = await self._load_conversation_context(request.conversation_id)
-
-            effective_history = (
-                persisted_messages if persisted_messages else (request.history or [])
-            )
-            history = self._build_history(effective_history)
-
-            # Step 3: Create system prompt
-            system_prompt = self.system_prompt_template.format(
-                context=context, history=history
-            )
-
-            # Step 4: Prepare messages for LLM
-            messages = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": request.question},
-            ]
+            with stage_timer(None, "history_load"):
+                (
+                    persisted_messages,
+                    active_conversation_id,
+                ) = await self._load_conversation_context(request.conversation_id)
+
+            # Step 3: Prepare messages for LLM
+            with stage_timer(None, "prompt_build"):
+                effective_history = (
+                    persisted_messages
+                    if persisted_messages
+                    else (request.history or [])
+                )
+                messages = self._build_messages(
+                    request.question, relevant_chunks, effective_history
+                )
 
-            # Step 5: Generate response
+            # Step 4: Generate response
+            usage: Dict[str, int] = {}
             answer = await llm_service.generate_response(
                 messages=messages,
                 max_tokens=request.max_tokens,
                 temperature=request.temperature,
+                usage=usage,
             )
 
-            # Step 6: Create source references
+            # Step 5: Create source references
             sources = []
             if request.include_sources:
                 sources = self._create_source_references(relevant_chunks)
 
-            # Step 7: Calculate response metrics
+            # Step 6: Calculate response metrics
             response_time_ms = int((time.time() - start_time) * 1000)
             confidence_score = self._calculate_confidence_score(relevant_chunks, answer)
 
@@ -109,28 +136,31 @@ class RAGPipeline:
                 f"Generated response in {response_time_ms}ms with {len(sources)} sources"
             )
 
-            # Step 8: Persist conversation
+            # Step 7: Persist conversation
             conversation_id = active_conversation_id
             try:
-                conversation_id = await self._ensure_conversation_exists(
-                    conversation_id, request.question
-                )
-                # append user question and assistant answer
-                await conversation_store.append_message(
-                    conversation_id,
-                    role="user",
-                    content=request.question,
-                )
-                await conversation_store.append_message(
-                    conversation_id,
-                    role="assistant",
-                    content=answer,
-                    metadata={
-                        "sources": [s.model_dump() for s in sources] if sources else [],
-                    }
-                    if sources
-                    else None,
-                )
+                with stage_timer(None, "persistence"):
+                    conversation_id = await self._ensure_conversation_exists(
+                        conversation_id, request.question
+                    )
+                    # append user question and assistant answer
+                    await conversation_store.append_message(
+                        conversation_id,
+                        role="user",
+                        content=request.question,
+                    )
+                    await conversation_store.append_message(
+                        conversation_id,
+                        role="assistant",
+                        content=answer,
+                        metadata={
+                            "sources": [s.model_dump() for s in sources]
+                            if sources
+                            else [],
+                        }
+                        if sources
+                        else None,
+                    )
             except Exception as exc:
                 # Persistence errors should not break chat; continue without raising
                 logger.warning(
@@ -144,7 +174,7 @@ class RAGPipeline:
                 sources=sources,
                 confidence_score=confidence_score,
                 response_time_ms=response_time_ms,
-                tokens_used=None,
+                tokens_used=self._count_tokens_used(messages, answer, usage),
                 conversation_id=conversation_id,
             )
 
@@ -177,26 +207,21 @@ class RAGPipeline:
                 yield payload
                 return
 
-            context = self._build_context(relevant_chunks)
-
-            (
-                persisted_messages,
-                active_conversation_id,
-            ) = await self._load_conversation_context(request.conversation_id)
-
-            effective_history = (
-                persisted_messages if persisted_messages else (request.history or [])
-            )
-            history = self._build_history(effective_history)
-
-            system_prompt = self.system_prompt_template.format(
-                context=context, history=history
-            )
-
-            messages_payload = [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": request.question},
-            ]
+            with stage_timer(None, "history_load"):
+                (
+                    persisted_messages,
+                    active_conversation_id,
+                ) = await self._load_conversation_context(request.conversation_id)
+
+            with stage_timer(None, "prompt_build"):
+                effective_history = (
+                    persisted_messages
+                    if persisted_messages
+                    else (request.history or [])
+                )
+                messages_payload = self._build_messages(
+                    request.question, relevant_chunks, effective_history
+                )
 
             sources: List[SourceReference] = []
             if request.include_sources:
@@ -210,10 +235,12 @@ class RAGPipeline:
             yield {"type": "stage", "stage": "generate"}
 
             token_buffer: List[str] = []
+            usage: Dict[str, int] = {}
             async for token in llm_service.stream_response(
                 messages=messages_payload,
                 max_tokens=request.max_tokens,
                 temperature=request.temperature,
+                usage=usage,
             ):
                 if not token:
                     continue
@@ -234,30 +261,29 @@ class RAGPipeline:
                 sources=final_sources,
                 confidence_score=confidence_score,
                 response_time_ms=response_time_ms,
-                tokens_used=None,
+                tokens_used=self._count_tokens_used(messages_payload, answer, usage),
                 conversation_id=active_conversation_id,
             )
 
             conversation_id = active_conversation_id
             try:
-                conversation_id = await self._ensure_conversation_exists(
-                    conversation_id, request.question
-                )
-                await conversation_store.append_message(
-                    conversation_id,
-                    role="user",
-                    content=request.question,
-                )
-                await conversation_store.append_message(
-                    conversation_id,
-                    role="assistant",
-                    content=answer,
-                    metadata={
-                        "sources": [s.model_dump() for s in final_sources]
-                    }
-                    if final_sources
-                    else None,
-                )
+                with stage_timer(None, "persistence"):
+                    conversation_id = await self._ensure_conversation_exists(
+                        conversation_id, request.question
+                    )
+                    await conversation_store.append_message(
+                        conversation_id,
+                        role="user",
+                        content=request.question,
+                    )
+                    await conversation_store.append_message(
+                        conversation_id,
+                        role="assistant",
+                        content=answer,
+                        metadata={"sources": [s.model_dump() for s in final_sources]}
+                        if final_sources
+                        else None,
+                    )
                 final_response.conversation_id = conversation_id
             except Exception as exc:
                 logger.warning(
@@ -282,6 +308,7 @@ class RAGPipeline:
         self, query: str,
         *,
         top_k: int = 3,
+        timings: Optional[Dict[str, float]] = None,
     ) -> List[Tuple[DocumentChunk, float]]:
         """Retrieve relevant document chunks for a query with intent-aware filtering.
 
@@ -289,101 +316,401 @@ class RAGPipeline:
         1) Analyze query intent to guide filtering strategy
         2) Perform semantic search in the vector store
         3) Apply a second-pass filter and scoring boost based on intent
+        4) Optionally reorder with the cross-encoder reranker (RERANK_ENABLED)
 
         Args:
             query: Raw user query text
+            top_k: Maximum number of chunks to return (capped at MAX_RETRIEVED_CHUNKS)
+            timings: Optional dict accumulating per-stage seconds
+                ("embed", "query", "rerank", "post_filter")
 
         Returns:
             List of tuples where each item contains a `DocumentChunk` and its similarity score.
         """
-        similarity_threshold = settings.similarity_threshold
-        max_results = max(1, min(top_k, 3))
+        max_results = max(1, min(top_k, MAX_RETRIEVED_CHUNKS))
 
         try:
             # Analyze query intent to tailor post-filtering strategy
             query_intent = self._analyze_query_intent(query)
-            # Skip metadata pre-filtering for now; handle uniformly in post-filter stage
-            metadata_filter = None
+            QUERY_INTENTS.labels(query_intent).inc()
+            # Stored embeddings of the candidates, for MMR selection
+            candidate_embeddings: Optional[Dict[str, np.ndarray]] = (
+                {} if settings.retrieval_mmr else None
+            )
 
             # Execute semantic search and gather a candidate pool
-            combined_results: List[Tuple[DocumentChunk, float]] = await vector_store.search_similar(
+            with stage_timer(timings, "embed"):
+                query_embeddings = await embedding_service.embed_queries([query])
+            pool_size = self._candidate_pool_size(max_results)
+            candidates = await self.vector.search_similar(
                 query=query,
-                similarity_threshold=similarity_threshold,
-                metadata_filter=metadata_filter,
+                top_k=pool_size,
+                n_candidates=pool_size,
+                similarity_threshold=settings.similarity_threshold,
+                timings=timings,
+                query_embeddings=query_embeddings,
+                embeddings=candidate_embeddings,
             )
 
-            filtered_results = self._post_filter_results(
-                combined_results,
-                query_intent=query_intent,
+            return await self._select_documents(
+                query,
+                query_intent,
+                candidates,
                 max_results=max_results,
+                pool_size=pool_size,
+                query_embeddings=query_embeddings,
+                candidate_embeddings=candidate_embeddings,
+                timings=timings,
             )
 
-            if len(filtered_results) < max_results:
-                for variant in self._expand_query_variants(query, query_intent):
-                    variant_results = await vector_store.search_similar(
-                        query=variant,
-                        similarity_threshold=similarity_threshold,
-                        metadata_filter=metadata_filter,
-                    )
-                    combined_results.extend(variant_results)
-                    filtered_results = self._post_filter_results(
-                        combined_results,
-                        query_intent=query_intent,
-                        max_results=max_results,
-                        prefer_diverse=True,
-                    )
-                    if len(filtered_results) >= max_results:
-                        break
+        except Exception as e:
+            logger.error(f"Document retrieval failed: {e}")
+            return []
 
-            # only return up to max_results
-            final_results = filtered_results[:max_results]
+    async def _retrieve_documents_batch(
+        self,
+        queries: List[str],
+        *,
+        top_k: int = 3,
+        timings: Optional[Dict[str, float]] = None,
+        query_timings: Optional[List[Dict[str, float]]] = None,
+    ) -> List[List[Tuple[DocumentChunk, float]]]:
+        """``_retrieve_documents`` for several queries, sharing the index work.
 
-            logger.info(
-                f"Query intent: {query_intent}, Retrieved {len(final_results)}/{len(combined_results)} relevant chunks"
-            )
-            return final_results
+        All queries are embedded in one call and searched with one index
+        query; post-filtering (and any widening, query variants or rerank)
+        then runs for each query, concurrently.
 
-        except Exception as e:
-            logger.error(f"Document retrieval failed: {e}")
+        Args:
+            queries: Raw user query texts
+            top_k: Maximum number of chunks to return per query (capped at
+                MAX_RETRIEVED_CHUNKS)
+            timings: Optional dict accumulating the shared "embed" and
+                "query" seconds of the batch
+            query_timings: Optional list with one dict per query accumulating
+                the seconds spent on that query alone
+
+        Returns:
+            One list of (chunk, score) tuples per query, in the order of ``queries``.
+        """
+        if not queries:
             return []
+        max_results = max(1, min(top_k, MAX_RETRIEVED_CHUNKS))
 
-    def _build_context(self, relevant_chunks: List[Tuple[DocumentChunk, float]]) -> str:
-        """Build context string from relevant document chunks."""
+        try:
+            query_intents = [self._analyze_query_intent(query) for query in queries]
+            for query_intent in query_intents:
+                QUERY_INTENTS.labels(query_intent).inc()
+            candidate_embeddings: List[Optional[Dict[str, np.ndarray]]] = [
+                {} if settings.retrieval_mmr else None for _ in queries
+            ]
+
+            with stage_timer(timings, "embed"):
+                query_embeddings = await embedding_service.embed_queries(queries)
+            pool_size = self._candidate_pool_size(max_results)
+            batch = await self.vector.search_similar_batch(
+                query_embeddings,
+                top_k=pool_size,
+                n_candidates=pool_size,
+                similarity_threshold=settings.similarity_threshold,
+                timings=timings,
+                embeddings=candidate_embeddings if settings.retrieval_mmr else None,
+            )
+        except Exception as e:
+            logger.error(f"Batch document retrieval failed: {e}")
+            return [[] for _ in queries]
+
+        async def select(i: int) -> List[Tuple[DocumentChunk, float]]:
+            try:
+                return await self._select_documents(
+                    queries[i],
+                    query_intents[i],
+                    batch[i],
+                    max_results=max_results,
+                    pool_size=pool_size,
+                    query_embeddings=query_embeddings[i : i + 1],
+                    candidate_embeddings=candidate_embeddings[i],
+                    timings=query_timings[i] if query_timings is not None else None,
+                )
+            except Exception as e:
+                logger.error(f"Document retrieval failed: {e}")
+                return []
+
+        # Widening searches and reranking await I/O; run the queries concurrently
+        return list(await asyncio.gather(*(select(i) for i in range(len(queries)))))
+
+    async def _select_documents(
+        self,
+        query: str,
+        query_intent: str,
+        candidates: List[Tuple[DocumentChunk, float]],
+        *,
+        max_results: int,
+        pool_size: int,
+        query_embeddings: np.ndarray,
+        candidate_embeddings: Optional[Dict[str, np.ndarray]],
+        timings: Optional[Dict[str, float]],
+    ) -> List[Tuple[DocumentChunk, float]]:
+        """Post-filter the first ``pool_size`` candidates of a query.
+
+        Searches again, widening the pool or trying query variants, when too
+        few documents survive, then reranks when RERANK_ENABLED.
+        """
+        # Skip metadata pre-filtering for now; handle uniformly in post-filter stage
+        metadata_filter = None
+
+        async def search(
+            text: str, pool_size: int, query_embeddings: Optional[np.ndarray] = None
+        ) -> List[Tuple[DocumentChunk, float]]:
+            return await self.vector.search_similar(
+                query=text,
+                top_k=pool_size,
+                n_candidates=pool_size,
+                similarity_threshold=settings.similarity_threshold,
+                metadata_filter=metadata_filter,
+                timings=timings,
+                query_embeddings=query_embeddings,
+                embeddings=candidate_embeddings,
+            )
+
+        def post_filter(
+            prefer_diverse: bool = False,
+            rerank_scores: Optional[Dict[str, float]] = None,
+        ) -> List[Tuple[DocumentChunk, float]]:
+            with stage_timer(timings, "post_filter"):
+                return self._post_filter_results(
+                    combined_results,
+                    query_intent=query_intent,
+                    max_results=max_results,
+                    prefer_diverse=prefer_diverse,
+                    embeddings=candidate_embeddings,
+                    rerank_scores=rerank_scores,
+                )
+
+        combined_results = list(candidates)
+        self._observe_duplicate_rate(combined_results)
+        filtered_results = post_filter()
+
+        # Results come back best first, so a pool cut short by the threshold
+        # has nothing more to give; a full one is widened once
+        widened_size = min(
+            math.ceil(pool_size * settings.retrieval_widen_factor),
+            settings.retrieval_max_candidates,
+        )
+        if (
+            len(filtered_results) < max_results
+            and len(combined_results) >= pool_size
+            and widened_size > pool_size
+        ):
+            RETRIEVAL_REQUERIES.labels("widen").inc()
+            combined_results = await search(query, widened_size, query_embeddings)
+            filtered_results = post_filter()
+
+        prefer_diverse = False
+        if len(filtered_results) < max_results:
+            prefer_diverse = True
+            for variant in self._expand_query_variants(query, query_intent):
+                RETRIEVAL_REQUERIES.labels("variant").inc()
+                combined_results.extend(await search(variant, pool_size))
+                filtered_results = post_filter(prefer_diverse=True)
+                if len(filtered_results) >= max_results:
+                    break
+
+        if settings.rerank_enabled and combined_results:
+            with stage_timer(timings, "rerank"):
+                rerank_scores = await reranker_service.rerank_scores(
+                    query, self._rerank_candidates(combined_results)
+                )
+            # None (model not ready or over budget) keeps the heuristic order
+            if rerank_scores:
+                filtered_results = post_filter(prefer_diverse, rerank_scores)
+
+        # only return up to max_results
+        final_results = filtered_results[:max_results]
+
+        logger.info(
+            f"Query intent: {query_intent}, "
+            f"Retrieved {len(final_results)}/{len(combined_results)} relevant chunks"
+        )
+        return final_results
+
+    def _rerank_candidates(
+        self, results: List[Tuple[DocumentChunk, float]]
+    ) -> List[DocumentChunk]:
+        """The RERANK_MAX_CANDIDATES most similar distinct chunks."""
+        best: Dict[str, Tuple[DocumentChunk, float]] = {}
+        for chunk, score in results:
+            if chunk.chunk_id not in best or score > best[chunk.chunk_id][1]:
+                best[chunk.chunk_id] = (chunk, score)
+        ranked = sorted(best.values(), key=lambda item: item[1], reverse=True)
+        return [chunk for chunk, _ in ranked[: settings.rerank_max_candidates]]
+
+    def _candidate_pool_size(self, max_results: int) -> int:
+        """Candidates to fetch so ``max_results`` distinct documents survive.
+
+        Sized from the running chunks-per-document estimate, so enough
+        candidates remain after post-filtering.
+        """
+        size = math.ceil(max_results * self._chunks_per_document * CANDIDATE_HEADROOM)
+        return max(max_results, min(size, settings.retrieval_max_candidates))
+
+    def _observe_duplicate_rate(
+        self, results: List[Tuple[DocumentChunk, float]]
+    ) -> None:
+        """Fold the chunks-per-document ratio of a search into the running estimate."""
+        documents = {chunk.document_path for chunk, _ in results}
+        if not documents:
+            return
+        observed = len(results) / len(documents)
+        self._chunks_per_document += DUPLICATE_RATE_SMOOTHING * (
+            observed - self._chunks_per_document
+        )
+
+    def _build_messages(
+        self,
+        question: str,
+        relevant_chunks: List[Tuple[DocumentChunk, float]],
+        history: List[ChatMessage],
+    ) -> List[Dict[str, str]]:
+        """Assemble the chat messages, most stable content first.
+
+        The static instructions form the prefix shared by every request,
+        followed by the retrieved context, the conversation history as
+        individual turns, and finally the question.
+        """
+
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {
+                "role": "system",
+                "content": CONTEXT_PROMPT.format(
+                    context=self._build_context(relevant_chunks)
+                ),
+            },
+            *self._build_history(history),
+            {"role": "user", "content": question},
+        ]
+
+    def _build_context(
+        self,
+        relevant_chunks: List[Tuple[DocumentChunk, float]],
+        max_tokens: Optional[int] = None,
+    ) -> str:
+        """Build context string from relevant document chunks.
+
+        Chunks are admitted by descending score until ``max_tokens``
+        (default ``PROMPT_CONTEXT_MAX_TOKENS``, 0 = unlimited) is used up, so
+        the lowest-scored chunks are dropped first. If even the best chunk
+        does not fit, its content is truncated. Kept chunks are ordered by
+        chunk id, and scores are left out, so the same set of chunks always
+        renders to the same text.
+        """
 
         if not relevant_chunks:
             return "No relevant documentation found."
 
-        context_parts = []
+        budget = (
+            settings.prompt_context_max_tokens if max_tokens is None else max_tokens
+        )
 
-        for i, (chunk, score) in enumerate(relevant_chunks, 1):
-            # Format each chunk with metadata
-            chunk_text = f"""
-Document {i}: {chunk.title}
+        def header(index: int, chunk: DocumentChunk) -> str:
+            return f"""
+Document {index}: {chunk.title}
 {f"Section: {chunk.heading}" if chunk.heading else ""}
 Source: {chunk.relative_path}
-Relevance: {score:.2f}
 
-{chunk.content}
----"""
+""".lstrip()
+
+        ranked = sorted(relevant_chunks, key=lambda item: item[1], reverse=True)
+        selected: Dict[str, Tuple[DocumentChunk, str]] = {}
+        used = 0
+        for chunk, _score in ranked:
+            if chunk.chunk_id in selected:
+                continue
+            content_tokens = (
+                chunk.token_count
+                if chunk.token_count is not None
+                else count_tokens(chunk.content)
+            )
+            # The final index may differ, which changes the header by a token at most
+            overhead = count_tokens(header(len(selected) + 1, chunk) + "\n---\n\n")
+            cost = overhead + content_tokens
+            if budget <= 0 or used + cost <= budget:
+                selected[chunk.chunk_id] = (chunk, chunk.content)
+                used += cost
+            elif not selected:
+                content = truncate_to_tokens(chunk.content, budget - overhead)
+                selected[chunk.chunk_id] = (chunk, content)
+                used = budget
+
+        if len(selected) < len(relevant_chunks):
+            logger.debug(
+                f"Context budget {budget} tokens: "
+                f"kept {len(selected)}/{len(relevant_chunks)} chunks"
+            )
+
+        context_parts = []
+        for index, chunk_id in enumerate(sorted(selected), 1):
+            chunk, content = selected[chunk_id]
+            chunk_text = header(index, chunk) + f"{content}\n---"
             context_parts.append(chunk_text.strip())
 
         return "\n\n".join(context_parts)
 
-    def _build_history(self, history: List[ChatMessage]) -> str:
-        """Build conversation history string for inclusion in the system prompt."""
-
-        if not history:
-            return "No previous conversation."
+    def _build_history(
+        self, history: List[ChatMessage], max_tokens: Optional[int] = None
+    ) -> List[Dict[str, str]]:
+        """Convert conversation history into chat messages within a token budget.
 
-        # Limit history to avoid token overflow
-        recent_history = history[-HISTORY_MAX_MESSAGES:]
+        Walks from the newest message back, keeping the latest exchange whole
+        and truncating older turns to ``HISTORY_MESSAGE_MAX_TOKENS``, until
+        ``max_tokens`` (default ``PROMPT_HISTORY_MAX_TOKENS``, 0 = unlimited)
+        is used up.
+        """
 
-        history_parts = []
-        for msg in recent_history:
-            role_name = "User" if msg.role == "user" else "Assistant"
-            history_parts.append(f"{role_name}: {msg.content}")
+        if not history:
+            return []
 
-        return "\n".join(history_parts)
+        budget = (
+            settings.prompt_history_max_tokens if max_tokens is None else max_tokens
+        )
+        per_message = settings.history_message_max_tokens
+
+        history_messages: List[Dict[str, str]] = []
+        used = 0
+        for age, msg in enumerate(reversed(history)):
+            role = "user" if msg.role == "user" else "assistant"
+            content = msg.content
+            if age >= HISTORY_RECENT_MESSAGES and per_message > 0:
+                content = truncate_to_tokens(content, per_message)
+            cost = count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+            if budget > 0 and used + cost > budget:
+                if not history_messages:
+                    content = truncate_to_tokens(
+                        content, budget - MESSAGE_OVERHEAD_TOKENS
+                    )
+                    if content:
+                        history_messages.append({"role": role, "content": content})
+                break
+            history_messages.append({"role": role, "content": content})
+            used += cost
+
+        history_messages.reverse()
+        return history_messages
+
+    def _count_tokens_used(
+        self, messages: List[Dict[str, str]], answer: str, usage: Dict[str, int]
+    ) -> int:
+        """Total tokens for one generation, as reported by the provider if possible."""
+
+        if usage.get("total_tokens"):
+            return usage["total_tokens"]
+        prompt_tokens = usage.get("prompt_tokens") or sum(
+            count_tokens(message["content"]) + MESSAGE_OVERHEAD_TOKENS
+            for message in messages
+        )
+        completion_tokens = usage.get("completion_tokens") or count_tokens(answer)
+        return prompt_tokens + completion_tokens
 
     def _create_source_references(
         self, relevant_chunks: List[Tuple[DocumentChunk, float]]
@@ -502,6 +829,7 @@ Relevance: {score:.2f}
     ) -> ChatResponse:
         """Create response when no relevant context is found."""
 
+        NO_CONTEXT_ANSWERS.inc()
         response_time_ms = int((time.time() - start_time) * 1000)
 
         if self._is_chinese(request.question):
@@ -531,94 +859,10 @@ Relevance: {score:.2f}
         """Analyze user query to classify intent for downstream filtering.
 
         Returns one of: "configuration", "performance", "comparison",
-        "version_release", "concept_learning", or "general".
+        "version_release", "concept_learning", or "general" with the default
+        rules; the keywords and their priority come from INTENT_RULES_PATH.
         """
-        query_lower = query.lower()
-
-        # 配置相关关键词
-        config_keywords = [
-            "配置",
-            "config",
-            "设置",
-            "setting",
-            "选项",
-            "option",
-            "vite.config",
-            "alias",
-            "别名",
-            "代理",
-            "proxy",
-            "环境变量",
-        ]
-
-        # 版本发布相关关键词
-        version_keywords = [
-            "版本",
-            "version",
-            "发布",
-            "release",
-            "更新",
-            "update",
-            "announcing",
-            "新特性",
-            "feature",
-            "变更",
-            "change",
-        ]
-
-        # 对比/比较相关关键词
-        comparison_keywords = [
-            "对比",
-            "比较",
-            "差异",
-            "区别",
-            "vs",
-            "versus",
-            "差别",
-            "difference",
-        ]
-
-        # 概念学习相关关键词
-        concept_keywords = [
-            "是什么",
-            "什么是",
-            "what is",
-            "如何",
-            "how",
-            "为什么",
-            "why",
-            "原理",
-            "principle",
-            "机制",
-            "mechanism",
-        ]
-
-        # 性能优化相关关键词
-        performance_keywords = [
-            "性能",
-            "performance",
-            "优化",
-            "optimization",
-            "seo",
-            "速度",
-            "speed",
-            "快",
-            "fast",
-        ]
-
-        # 匹配意图 (调整顺序，将更具体的意图放在前面)
-        if any(keyword in query_lower for keyword in config_keywords):
-            return "configuration"
-        elif any(keyword in query_lower for keyword in performance_keywords):
-            return "performance"
-        elif any(keyword in query_lower for keyword in comparison_keywords):
-            return "comparison"
-        elif any(keyword in query_lower for keyword in version_keywords):
-            return "version_release"
-        elif any(keyword in query_lower for keyword in concept_keywords):
-            return "concept_learning"
-        else:
-            return "general"
+        return self.intent_rules.classify(query)
 
     def _post_filter_results(
         self,
@@ -627,8 +871,20 @@ Relevance: {score:.2f}
         query_intent: str,
         max_results: int,
         prefer_diverse: bool = False,
+        embeddings: Optional[Dict[str, np.ndarray]] = None,
+        rerank_scores: Optional[Dict[str, float]] = None,
     ) -> List[Tuple[DocumentChunk, float]]:
-        """Apply a second-pass filter and boost scores according to query intent."""
+        """Apply a second-pass filter and boost scores according to query intent.
+
+        Without ``embeddings`` the best chunk of each document is kept. With
+        them (chunk_id -> stored embedding), every distinct chunk competes and
+        the final ones are chosen by maximal marginal relevance, which keeps
+        good neighbouring chunks of one page but drops near-duplicates.
+
+        ``rerank_scores`` (chunk_id -> cross-encoder score) replace the
+        intent-boosted similarity for ordering; chunks without one rank last.
+        The threshold and release-note rules still use the similarity.
+        """
 
         if not results:
             return results
@@ -648,10 +904,21 @@ Relevance: {score:.2f}
                 or "发布" in title_lower
             )
 
+        def rank_key(entry: Dict[str, Any]) -> Tuple[float, ...]:
+            if rerank_scores is None:
+                return (entry["adjusted"], entry["score"])
+            reranked = entry["chunk"].chunk_id in rerank_scores
+            return (
+                reranked,
+                rerank_scores.get(entry["chunk"].chunk_id, 0.0),
+                entry["adjusted"],
+            )
+
         candidate_map: Dict[str, Dict[str, Any]] = {}
-        qualifying_map: Dict[str, Dict[str, Any]] = {}
 
         for chunk, score in results:
+            if embeddings is not None and chunk.chunk_id not in embeddings:
+                continue
             relevance_boost = self._calculate_intent_relevance_boost(
                 chunk, query_intent
             )
@@ -664,17 +931,17 @@ Relevance: {score:.2f}
                 "is_release": is_release_doc(chunk),
             }
 
-            doc_key = chunk.document_path
-            existing = candidate_map.get(doc_key)
-            if existing is None or adjusted_score > existing["adjusted"]:
-                candidate_map[doc_key] = entry
-
-            if adjusted_score >= settings.similarity_threshold:
-                existing_qual = qualifying_map.get(doc_key)
-                if existing_qual is None or adjusted_score > existing_qual["adjusted"]:
-                    qualifying_map[doc_key] = entry
+            key = chunk.document_path if embeddings is None else chunk.chunk_id
+            existing = candidate_map.get(key)
+            if existing is None or rank_key(entry) > rank_key(existing):
+                candidate_map[key] = entry
 
-        prioritized_entries = list(qualifying_map.values()) or list(candidate_map.values())
+        qualifying = [
+            entry
+            for entry in candidate_map.values()
+            if entry["adjusted"] >= settings.similarity_threshold
+        ]
+        prioritized_entries = qualifying or list(candidate_map.values())
 
         if query_intent != "version_release":
             non_release = [entry for entry in prioritized_entries if not entry["is_release"]]
@@ -685,11 +952,31 @@ Relevance: {score:.2f}
                 if pool_non_release:
                     prioritized_entries = pool_non_release
 
-        prioritized_entries.sort(
-            key=lambda entry: (entry["adjusted"], entry["score"]), reverse=True
-        )
+        prioritized_entries.sort(key=rank_key, reverse=True)
 
-        trimmed = prioritized_entries[:max_results]
+        if embeddings is not None and prioritized_entries:
+            lambda_mult = settings.retrieval_mmr_intent_lambdas.get(
+                query_intent, settings.retrieval_mmr_lambda
+            )
+            selected = maximal_marginal_relevance(
+                [
+                    entry["adjusted"]
+                    if rerank_scores is None
+                    else rerank_scores.get(entry["chunk"].chunk_id, 0.0)
+                    for entry in prioritized_entries
+                ],
+                np.stack(
+                    [
+                        embeddings[entry["chunk"].chunk_id]
+                        for entry in prioritized_entries
+                    ]
+                ),
+                max_results,
+                lambda_mult,
+            )
+            trimmed = [prioritized_entries[i] for i in selected]
+        else:
+            trimmed = prioritized_entries[:max_results]
 
         return [
             (entry["chunk"], max(entry["adjusted"], 0.0))
@@ -762,7 +1049,7 @@ Relevance: {score:.2f}
                 or "配置" in title_lower
             ):
                 boost += 0.28
-            if any(keyword in heading_lower for keyword in ["proxy", "config", "server"]):
+            if "config_heading" in self.intent_rules.content_matches(heading_lower):
                 boost += 0.12
             if "guide" in path_signature and any(
                 token in path_signature for token in ["config", "proxy", "server"]
@@ -777,25 +1064,17 @@ Relevance: {score:.2f}
             if release_signal:
                 boost -= 0.4
 
-            comparison_terms = ["对比", "比较", "差异", "区别", "difference", "vs", "versus"]
-            matches = sum(
-                1 for term in comparison_terms if term in content_lower or term in title_lower
-            )
-            boost += min(matches * 0.05, 0.1)
-
-            release_terms = [
-                "release",
-                "released",
-                "announcing",
-                "changelog",
-                "breaking change",
-                "变更",
-                "发布",
-            ]
-            penalties = sum(
-                1 for term in release_terms if term in content_lower or term in title_lower
-            )
-            boost -= min(penalties * 0.05, 0.15)
+            content_matches = self.intent_rules.content_matches(content_lower)
+            title_matches = self.intent_rules.content_matches(title_lower)
+
+            def matched(keyword_class: str) -> int:
+                return len(
+                    content_matches.get(keyword_class, frozenset())
+                    | title_matches.get(keyword_class, frozenset())
+                )
+
+            boost += min(matched("comparison_terms") * 0.05, 0.1)
+            boost -= min(matched("release_terms") * 0.05, 0.15)
 
         elif query_intent == "version_release":
             if "05-version" in path_signature:
@@ -819,17 +1098,8 @@ Relevance: {score:.2f}
             boost -= 0.2
 
         if query_intent == "configuration":
-            config_content_keywords = [
-                "vite.config",
-                "defineconfig",
-                "plugins",
-                "alias",
-                "proxy",
-                "server.proxy",
-                "https",
-            ]
-            matches = sum(
-                1 for keyword in config_content_keywords if keyword in content_lower
+            matches = len(
+                self.intent_rules.content_matches(content_lower).get("config_terms", ())
             )
             boost += min(matches * 0.06, 0.18)
 
@@ -862,7 +1132,7 @@ Relevance: {score:.2f}
 
         try:
             # Get vector store stats
-            vector_stats = await vector_store.get_collection_stats()
+            vector_stats = await self.vector.get_collection_stats()
 
             # Get LLM health
             llm_health = await llm_service.check_health()
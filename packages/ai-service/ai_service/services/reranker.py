@@ -0,0 +1,371 @@
+"""
+Optional cross-encoder rerank stage.
+
+After vector search, a small local cross-encoder scores (query, chunk) pairs
+and its scores order the candidates instead of the intent heuristics.
+Scores are cached per (query hash, chunk id) and only cache misses are sent
+to the model, in batches. Each request has a latency budget
+(RERANK_BUDGET_MS): when scoring does not finish in time the pipeline keeps
+its heuristic order, and the late scores still fill the cache.
+
+The model runs with sentence-transformers' CrossEncoder or, with
+RERANK_BACKEND=onnx, with onnxruntime from a one-time export that is checked
+against the torch scores, like the ONNX embedding backend.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from loguru import logger
+
+from ai_service.config.settings import settings
+from ai_service.models.document import DocumentChunk
+from ai_service.utils.metrics import (
+    CACHE_HITS,
+    CACHE_MISSES,
+    RERANK_REQUESTS,
+    RERANK_SECONDS,
+)
+
+RERANK_CONFIG_FILE = "rerank_onnx.json"
+RERANK_REFERENCE_FILE = "rerank_reference.npz"
+# Largest score difference to the torch model accepted for an ONNX export
+ONNX_MAX_SCORE_DIFF = 0.01
+
+VERIFY_PAIRS = [
+    ("如何配置开发服务器代理？", "server.proxy 为开发服务器配置自定义代理规则。"),
+    (
+        "How do I set up a proxy for the Vite dev server?",
+        "Configure custom proxy rules for the dev server.",
+    ),
+    ("What is hot module replacement?", "Vite provides an HMR API over native ESM."),
+    ("vite.config.ts 怎么写？", "Vite 会自动解析项目根目录下名为 vite.config.js 的配置文件。"),
+]
+
+_INPUT_NAMES = ("input_ids", "attention_mask", "token_type_ids")
+
+
+def load_cross_encoder(model_name: str, num_threads: Optional[int] = None) -> Any:
+    """Load a sentence-transformers CrossEncoder on CPU."""
+    # Deferred: importing sentence_transformers pulls in torch
+    import torch
+    from sentence_transformers import CrossEncoder
+
+    from ai_service.services.embedding import torch_thread_count
+
+    torch.set_num_threads(num_threads or torch_thread_count())
+    return CrossEncoder(model_name, max_length=settings.rerank_max_length, device="cpu")
+
+
+def export_onnx_reranker(model_name: str, output_dir: Path) -> Path:
+    """Export the cross-encoder ``model_name`` to ``output_dir``."""
+    import torch
+
+    from ai_service.services.embedding_onnx import MODEL_FILE
+
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cross_encoder = load_cross_encoder(model_name)
+    model = cross_encoder.model.eval()
+    tokenizer = cross_encoder.tokenizer
+
+    queries, passages = zip(*VERIFY_PAIRS[:2])
+    sample = tokenizer(
+        list(queries),
+        list(passages),
+        padding=True,
+        truncation=True,
+        return_tensors="pt",
+    )
+    input_names = [name for name in _INPUT_NAMES if name in sample]
+
+    class _Scorer(torch.nn.Module):
+        def __init__(self, model: Any):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *inputs: Any) -> Any:
+            return self.model(**dict(zip(input_names, inputs))).logits
+
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["logits"] = {0: "batch"}
+    export_kwargs: Dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    model_path = output_dir / MODEL_FILE
+    logger.info(f"Exporting reranker {model_name} to ONNX at {model_path}")
+    with torch.no_grad():
+        torch.onnx.export(
+            _Scorer(model),
+            tuple(sample[name] for name in input_names),
+            str(model_path),
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs,
+        )
+
+    tokenizer.save_pretrained(str(output_dir))
+    reference = np.asarray(cross_encoder.predict(VERIFY_PAIRS), dtype=np.float32)
+    np.savez(output_dir / RERANK_REFERENCE_FILE, scores=reference)
+    config = {
+        "model_name": model_name,
+        "inputs": input_names,
+        "max_length": settings.rerank_max_length,
+    }
+    (output_dir / RERANK_CONFIG_FILE).write_text(
+        json.dumps(config, indent=2), encoding="utf-8"
+    )
+    return model_path
+
+
+class OnnxCrossEncoder:
+    """onnxruntime model exposing CrossEncoder.predict."""
+
+    backend = "onnx"
+
+    def __init__(self, model_dir: Path, num_threads: Optional[int] = None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        from ai_service.services.embedding_onnx import MODEL_FILE
+
+        self.model_dir = Path(model_dir)
+        self.config = json.loads(
+            (self.model_dir / RERANK_CONFIG_FILE).read_text(encoding="utf-8")
+        )
+
+        options = onnxruntime.SessionOptions()
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(
+            str(self.model_dir / MODEL_FILE),
+            sess_options=options,
+            providers=["CPUExecutionProvider"],
+        )
+        self._tokenizer = Tokenizer.from_file(str(self.model_dir / "tokenizer.json"))
+        self._tokenizer.enable_truncation(self.config["max_length"])
+        self._tokenizer.enable_padding()
+
+    def _predict_batch(self, pairs: Sequence[Tuple[str, str]]) -> np.ndarray:
+        encodings = self._tokenizer.encode_batch(list(pairs))
+        features = {
+            "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": np.array(
+                [e.attention_mask for e in encodings], dtype=np.int64
+            ),
+            "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        logits = self.session.run(
+            None, {name: features[name] for name in self.config["inputs"]}
+        )[0]
+        # CrossEncoder applies a sigmoid to single-label models
+        return 1.0 / (1.0 + np.exp(-logits[:, 0]))
+
+    def predict(
+        self, pairs: Sequence[Tuple[str, str]], batch_size: int = 32, **kwargs: Any
+    ) -> np.ndarray:
+        if not pairs:
+            return np.zeros(0, dtype=np.float32)
+        return np.concatenate(
+            [
+                self._predict_batch(pairs[start : start + batch_size])
+                for start in range(0, len(pairs), batch_size)
+            ]
+        ).astype(np.float32)
+
+    def agreement(self) -> float:
+        """Largest absolute score difference to the torch reference."""
+        reference = np.load(self.model_dir / RERANK_REFERENCE_FILE)["scores"]
+        return float(np.abs(self.predict(VERIFY_PAIRS) - reference).max())
+
+
+def load_onnx_reranker(
+    model_name: str, num_threads: Optional[int] = None
+) -> OnnxCrossEncoder:
+    """Load the ONNX export of ``model_name``, exporting it on first use.
+
+    Raises:
+        RuntimeError: if the export's scores differ from torch's by more than
+            ``ONNX_MAX_SCORE_DIFF``.
+    """
+    from ai_service.services.embedding_onnx import MODEL_FILE, export_dir_for
+
+    model_dir = export_dir_for(model_name)
+    if not (
+        (model_dir / MODEL_FILE).exists() and (model_dir / RERANK_CONFIG_FILE).exists()
+    ):
+        export_onnx_reranker(model_name, model_dir)
+
+    model = OnnxCrossEncoder(model_dir, num_threads=num_threads)
+    difference = model.agreement()
+    if difference > ONNX_MAX_SCORE_DIFF:
+        raise RuntimeError(
+            f"ONNX reranker scores for {model_name} disagree with torch "
+            f"(max difference {difference:.4f} > {ONNX_MAX_SCORE_DIFF})"
+        )
+    logger.info(
+        f"Loaded ONNX reranker {model_dir} (max difference vs torch {difference:.4f})"
+    )
+    return model
+
+
+def load_reranker_model(model_name: str) -> Any:
+    """Load ``model_name`` with the backend selected by RERANK_BACKEND.
+
+    The ONNX backend falls back to torch if the export or its check fails.
+    """
+    from ai_service.services.embedding import torch_thread_count
+
+    backend = settings.rerank_backend.lower()
+    if backend == "onnx":
+        try:
+            return load_onnx_reranker(model_name, num_threads=torch_thread_count())
+        except Exception as e:
+            logger.warning(f"ONNX reranker backend unavailable, using torch: {e}")
+    elif backend != "torch":
+        logger.warning(
+            f"Unknown RERANK_BACKEND {settings.rerank_backend!r}, using torch"
+        )
+    return load_cross_encoder(model_name)
+
+
+class RerankerService:
+    """Scores (query, chunk) pairs with a cross-encoder under a latency budget."""
+
+    def __init__(self, model_name: Optional[str] = None):
+        self.model_name = model_name or settings.rerank_model
+        self.model: Optional[Any] = None
+        self._lock = asyncio.Lock()
+        self._load_task: Optional[asyncio.Task] = None
+        # (query hash, chunk id) -> score, least recently used first
+        self._cache: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # One scoring call at a time; requests queued past their budget give up
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rerank")
+
+    async def initialize(self) -> None:
+        """Load the cross-encoder; on failure reranking stays disabled."""
+        if self.model is not None:
+            return
+
+        async with self._lock:
+            if self.model is not None:
+                return
+            logger.info(f"Loading reranker model: {self.model_name}")
+            try:
+                self.model = await asyncio.get_running_loop().run_in_executor(
+                    self._executor, load_reranker_model, self.model_name
+                )
+                logger.info("Reranker model loaded successfully")
+            except Exception as e:
+                logger.error(f"Failed to load reranker model {self.model_name}: {e}")
+
+    async def rerank_scores(
+        self,
+        query: str,
+        chunks: Sequence[DocumentChunk],
+        budget_ms: Optional[float] = None,
+    ) -> Optional[Dict[str, float]]:
+        """
+        Cross-encoder scores for ``chunks``, keyed by chunk_id.
+
+        Args:
+            query: User query
+            chunks: Candidate chunks to score
+            budget_ms: Latency budget (defaults to RERANK_BUDGET_MS)
+
+        Returns:
+            Scores for every chunk, or None when the model is not loaded or
+            the budget was exceeded
+        """
+        if self.model is None:
+            # Load in the background (once) and keep the heuristic order meanwhile
+            if self._load_task is None:
+                self._load_task = asyncio.create_task(self.initialize())
+            RERANK_REQUESTS.labels("unavailable").inc()
+            return None
+
+        query_key = hashlib.sha1(query.encode("utf-8")).hexdigest()
+        scores: Dict[str, float] = {}
+        misses: List[DocumentChunk] = []
+        with self._cache_lock:
+            for chunk in chunks:
+                cached = self._cache.get((query_key, chunk.chunk_id))
+                if cached is None:
+                    misses.append(chunk)
+                else:
+                    self._cache.move_to_end((query_key, chunk.chunk_id))
+                    scores[chunk.chunk_id] = cached
+        CACHE_HITS.labels("rerank").inc(len(scores))
+        CACHE_MISSES.labels("rerank").inc(len(misses))
+        if not misses:
+            RERANK_REQUESTS.labels("cached").inc()
+            return scores
+
+        budget_s = (
+            settings.rerank_budget_ms if budget_ms is None else budget_ms
+        ) / 1000
+        start = time.perf_counter()
+        try:
+            scored = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(
+                    self._executor,
+                    self._score,
+                    query_key,
+                    query,
+                    misses,
+                    time.monotonic() + budget_s,
+                ),
+                timeout=budget_s,
+            )
+        except asyncio.TimeoutError:
+            RERANK_REQUESTS.labels("timeout").inc()
+            logger.debug(f"Rerank exceeded its {budget_s * 1000:.0f}ms budget")
+            return None
+        except Exception as e:
+            RERANK_REQUESTS.labels("error").inc()
+            logger.warning(f"Rerank failed, keeping heuristic order: {e}")
+            return None
+        finally:
+            RERANK_SECONDS.observe(time.perf_counter() - start)
+
+        RERANK_REQUESTS.labels("scored").inc()
+        scores.update(scored)
+        return scores
+
+    def _score(
+        self, query_key: str, query: str, chunks: List[DocumentChunk], deadline: float
+    ) -> Dict[str, float]:
+        """Run the model on ``chunks`` and cache the scores (worker thread)."""
+        if time.monotonic() > deadline:
+            # Queued behind other requests until this one gave up
+            return {}
+        predictions = self.model.predict(
+            [(query, chunk.content) for chunk in chunks],
+            batch_size=settings.rerank_batch_size,
+            show_progress_bar=False,
+        )
+        scores = {
+            chunk.chunk_id: float(score) for chunk, score in zip(chunks, predictions)
+        }
+        with self._cache_lock:
+            for chunk_id, score in scores.items():
+                self._cache[(query_key, chunk_id)] = score
+            while len(self._cache) > settings.rerank_cache_size:
+                self._cache.popitem(last=False)
+        return scores
+
+
+# Global reranker instance
+reranker_service = RerankerService()
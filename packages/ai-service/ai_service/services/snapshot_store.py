@@ -0,0 +1,231 @@
+"""
+Read-only, versioned index snapshots.
+
+Ingestion publishes the finished index as an immutable snapshot::
+
+    SNAPSHOT_PATH/<version>/vectors.npy     float32 [rows, dim] unit-length embeddings
+    SNAPSHOT_PATH/<version>/records.json    ids, documents and flat metadata
+    SNAPSHOT_PATH/<version>/snapshot.json   version, model and row count
+    SNAPSHOT_PATH/CURRENT                   name of the live version
+
+Serving workers (VECTOR_DB_TYPE=snapshot) memory-map the vectors read-only,
+so all workers on a host share one copy through the page cache and startup
+builds nothing. Publishing renames the finished snapshot directory into
+place and then atomically replaces CURRENT; workers notice the new version
+within SNAPSHOT_RELOAD_INTERVAL seconds and swap it in between queries.
+"""
+
+import asyncio
+import os
+import shutil
+import time
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import orjson
+from loguru import logger
+
+from ai_service.config.settings import settings
+from ai_service.services.numpy_store import (
+    IndexState,
+    NumpyVectorStore,
+    read_segment,
+    write_segment,
+)
+from ai_service.services.vector_store import VectorStoreService
+
+CURRENT_FILE = "CURRENT"
+SNAPSHOT_META_FILE = "snapshot.json"
+
+
+def current_version(root: Path) -> Optional[str]:
+    """Name of the live snapshot under ``root``, if one was published."""
+    try:
+        return (root / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_snapshot(
+    root: Path,
+    ids: List[str],
+    vectors: np.ndarray,
+    documents: List[str],
+    metadatas: List[Dict[str, Any]],
+) -> str:
+    """Write a new snapshot, make it current and prune old ones; return its version."""
+    root.mkdir(parents=True, exist_ok=True)
+    created_at = datetime.now(timezone.utc)
+    # Timestamp first so versions sort chronologically
+    version = f"{created_at:%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:6]}"
+    meta = {
+        "version": version,
+        "created_at": created_at.isoformat(),
+        "count": len(ids),
+        "dimension": int(vectors.shape[1]) if vectors.ndim == 2 else 0,
+        "embedding_model": settings.embedding_model,
+        "collection_name": settings.collection_name,
+    }
+    write_segment(
+        root / version,
+        vectors,
+        ids,
+        documents,
+        metadatas,
+        extra_files={SNAPSHOT_META_FILE: orjson.dumps(meta)},
+    )
+
+    staging = root / f".{CURRENT_FILE}.tmp"
+    with open(staging, "w", encoding="utf-8") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(staging, root / CURRENT_FILE)
+
+    prune_snapshots(root, settings.snapshot_keep)
+    return version
+
+
+def prune_snapshots(root: Path, keep: int) -> None:
+    """Delete all but the newest ``keep`` snapshots, never the current one.
+
+    Workers that have not switched yet keep reading their mapped files even
+    after the directory is removed.
+    """
+    current = current_version(root)
+    versions = sorted(
+        path.name for path in root.iterdir() if (path / SNAPSHOT_META_FILE).exists()
+    )
+    for version in versions[: -max(1, keep)]:
+        if version != current:
+            shutil.rmtree(root / version, ignore_errors=True)
+
+
+async def publish_snapshot(
+    store: VectorStoreService, root: Optional[Path] = None
+) -> str:
+    """Publish the contents of ``store`` as the current snapshot."""
+    root = Path(root or settings.snapshot_path)
+    ids, vectors, documents, metadatas = await store.export_records()
+    version = await asyncio.to_thread(
+        write_snapshot, root, ids, vectors, documents, metadatas
+    )
+    logger.info(f"Published index snapshot {version} ({len(ids)} chunks) to {root}")
+    return version
+
+
+class SnapshotVectorStore(NumpyVectorStore):
+    """Serves the current snapshot read-only and follows CURRENT."""
+
+    read_only = True
+
+    def __init__(self, root: Optional[str] = None):
+        super().__init__()
+        self.root = Path(root or settings.snapshot_path)
+        self.version: Optional[str] = None
+        self._checked_at = 0.0
+        self._reload_lock = asyncio.Lock()
+
+    async def initialize(self) -> None:
+        """Memory-map the current snapshot (an empty index if none exists yet)."""
+        if self._state is not None:
+            return
+
+        async with self._lock:
+            if self._state is not None:
+                return
+            await self._load(await asyncio.to_thread(current_version, self.root))
+            logger.info(
+                f"Serving index snapshot {self.version or '(none)'} from {self.root}. "
+                f"Documents: {self._state.live_count}"
+            )
+
+    async def _load(self, version: Optional[str]) -> None:
+        if version is None:
+            state = IndexState.build([], set())
+        else:
+            state = await asyncio.to_thread(
+                lambda: IndexState.build([read_segment(self.root / version)], set())
+            )
+        self._state, self.version = state, version
+        self._checked_at = time.monotonic()
+
+    async def refresh(self) -> bool:
+        """Swap in the snapshot named by CURRENT if it changed."""
+        async with self._reload_lock:
+            version = await asyncio.to_thread(current_version, self.root)
+            self._checked_at = time.monotonic()
+            if version is None or version == self.version:
+                return False
+            previous = self.version
+            await self._load(version)
+            logger.info(f"Switched index snapshot {previous} -> {version}")
+            return True
+
+    async def _maybe_refresh(self) -> None:
+        interval = settings.snapshot_reload_interval
+        if (
+            interval <= 0
+            or self._reload_lock.locked()
+            or time.monotonic() - self._checked_at < interval
+        ):
+            return
+        try:
+            await self.refresh()
+        except Exception as e:
+            # Keep serving the snapshot already loaded
+            self._checked_at = time.monotonic()
+            logger.error(f"Failed to load index snapshot: {e}")
+
+    async def _query(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[np.ndarray]] = None,
+    ):
+        await self._maybe_refresh()
+        return await super()._query(query_embeddings, n_results, where, embeddings)
+
+    async def _query_batch(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[List[np.ndarray]]] = None,
+    ):
+        await self._maybe_refresh()
+        return await super()._query_batch(
+            query_embeddings, n_results, where, embeddings
+        )
+
+    async def count_documents(self) -> int:
+        await self.initialize()
+        await self._maybe_refresh()
+        return self._state.live_count
+
+    async def get_collection_stats(self) -> Dict[str, Any]:
+        stats = await super().get_collection_stats()
+        stats["snapshot_version"] = self.version
+        return stats
+
+    # --- writes are done by ingestion, which publishes a new snapshot ---
+
+    async def _write(self, ids, embeddings, metadatas, documents) -> None:
+        raise RuntimeError(
+            "The snapshot vector store is read-only; run ingestion to publish"
+        )
+
+    async def delete_documents(self, document_path: str) -> int:
+        logger.error("Cannot delete from a read-only index snapshot")
+        return 0
+
+    async def clear_collection(self) -> bool:
+        logger.error("Cannot clear a read-only index snapshot")
+        return False
+
+    async def optimize(self) -> None:
+        return None
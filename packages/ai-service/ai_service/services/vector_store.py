@@ -1,27 +1,41 @@
 """
 Vector store service using ChromaDB for document embeddings.
-Provides similarity search and metadata filtering capabilities.
+Provides similarity search and metadata filtering capabilities. Storage
+access goes through a few primitives (``_write``, ``_query``,
+``_sample_metadatas`` and the delete/lookup methods) so other backends,
+selected with VECTOR_DB_TYPE, can subclass the service.
 """
 
 import asyncio
-from typing import List, Dict, Any, Optional, Tuple, Set
-import chromadb
-from chromadb.config import Settings as ChromaSettings
-from loguru import logger
+import os
 import uuid
 from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from loguru import logger
 
 from ai_service.config.settings import settings
 from ai_service.models.document import DocumentChunk, VectorDocument
 from ai_service.services.embedding import embedding_service
+from ai_service.utils.timing import stage_timer
+from ai_service.utils.tokens import count_tokens
+
+if TYPE_CHECKING:
+    import chromadb
 
 
 class VectorStoreService:
     """ChromaDB-based vector store for document embeddings."""
 
+    # Read-only stores (index snapshots) are never written by ingestion
+    read_only = False
+
     def __init__(self):
-        self.client: Optional[chromadb.Client] = None
-        self.collection: Optional[chromadb.Collection] = None
+        self.client: Optional["chromadb.ClientAPI"] = None
+        self.collection: Optional["chromadb.Collection"] = None
+        # chromadb < 0.5 validates embeddings as lists of Python floats
+        self._accepts_ndarray = False
         self._lock = asyncio.Lock()
 
     async def initialize(self) -> None:
@@ -35,6 +49,13 @@ class VectorStoreService:
 
             logger.info("Initializing ChromaDB vector store...")
 
+            # Imported here so importing this module stays cheap
+            import chromadb
+            from chromadb.config import Settings as ChromaSettings
+            from packaging.version import Version
+
+            self._accepts_ndarray = Version(chromadb.__version__) >= Version("0.5.0")
+
             # Create data directory if it doesn't exist
             db_path = Path(settings.chromadb_path)
             db_path.mkdir(parents=True, exist_ok=True)
@@ -48,24 +69,37 @@ class VectorStoreService:
                 ),
             )
 
-            # Get or create collection
+            # Get or create collection (COLLECTION_NAME may point at a rebuilt one)
+            name = active_collection_name()
             try:
-                self.collection = self.client.get_collection(
-                    name=settings.collection_name
-                )
-                logger.info(f"Using existing collection: {settings.collection_name}")
+                self.collection = self.client.get_collection(name=name)
+                logger.info(f"Using existing collection: {name}")
+                stale = {
+                    key: value
+                    for key, value in hnsw_metadata().items()
+                    if (self.collection.metadata or {}).get(key, value) != value
+                }
+                if stale:
+                    logger.warning(
+                        f"Collection {name} was built with different HNSW parameters "
+                        f"than configured ({sorted(stale)}); "
+                        f"run `ai-service index rebuild` to apply them"
+                    )
             except Exception:
                 self.collection = self.client.create_collection(
-                    name=settings.collection_name, metadata={"hnsw:space": "cosine"}
+                    name=name, metadata=hnsw_metadata()
                 )
-                logger.info(f"Created new collection: {settings.collection_name}")
+                logger.info(f"Created new collection: {name}")
 
             # Log collection info
             count = self.collection.count()
             logger.info(f"Vector store initialized. Documents: {count}")
 
     async def add_documents(
-        self, chunks: List[DocumentChunk], file_hash: Optional[str] = None
+        self,
+        chunks: List[DocumentChunk],
+        file_hash: Optional[str] = None,
+        embeddings: Optional[np.ndarray] = None,
     ) -> int:
         """
         Add document chunks to the vector store.
@@ -73,6 +107,7 @@ class VectorStoreService:
         Args:
             chunks: List of document chunks to add
             file_hash: Optional hash of the source file content for deduplication
+            embeddings: Optional precomputed embeddings, one row per chunk
 
         Returns:
             Number of documents successfully added
@@ -84,18 +119,33 @@ class VectorStoreService:
 
         logger.info(f"Adding {len(chunks)} document chunks to vector store...")
 
-        # Extract texts for batch embedding
-        texts = [chunk.content for chunk in chunks]
+        # Generate embeddings (float32, one unit-length row per chunk)
+        if embeddings is None:
+            embeddings = await embedding_service.embed_texts(
+                [chunk.content for chunk in chunks]
+            )
+
+        ids, metadatas, documents = self._prepare_records(chunks, file_hash)
+
+        try:
+            await self._write(ids, embeddings, metadatas, documents)
+
+            logger.info(f"Successfully added {len(chunks)} documents to vector store")
+            return len(chunks)
 
-        # Generate embeddings
-        embeddings = await embedding_service.embed_batch(texts)
+        except Exception as e:
+            logger.error(f"Failed to add documents to vector store: {e}")
+            return 0
 
-        # Prepare data for ChromaDB
+    def _prepare_records(
+        self, chunks: List[DocumentChunk], file_hash: Optional[str]
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[str]]:
+        """Build ids, flat metadata dicts and documents for ``chunks``."""
         ids = []
         metadatas = []
         documents = []
 
-        for i, chunk in enumerate(chunks):
+        for chunk in chunks:
             # Generate unique ID
             doc_id = f"{chunk.chunk_id}_{uuid.uuid4().hex[:8]}"
             ids.append(doc_id)
@@ -109,6 +159,11 @@ class VectorStoreService:
                 "heading": chunk.heading or "",
                 "heading_level": chunk.heading_level or 0,
                 "word_count": chunk.word_count,
+                "token_count": (
+                    chunk.token_count
+                    if chunk.token_count is not None
+                    else count_tokens(chunk.content)
+                ),
                 "author": chunk.metadata.author or "",
                 "date": chunk.metadata.date or "",
                 "published": chunk.metadata.published,
@@ -122,18 +177,22 @@ class VectorStoreService:
             # Document content
             documents.append(chunk.content)
 
-        try:
-            # Add to ChromaDB
-            self.collection.add(
-                ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents
-            )
-
-            logger.info(f"Successfully added {len(chunks)} documents to vector store")
-            return len(chunks)
+        return ids, metadatas, documents
 
-        except Exception as e:
-            logger.error(f"Failed to add documents to vector store: {e}")
-            return 0
+    async def _write(
+        self,
+        ids: List[str],
+        embeddings: np.ndarray,
+        metadatas: List[Dict[str, Any]],
+        documents: List[str],
+    ) -> None:
+        """Store prepared records."""
+        self.collection.add(
+            ids=ids,
+            embeddings=self._chroma_embeddings(embeddings),
+            metadatas=metadatas,
+            documents=documents,
+        )
 
     async def get_document_hash(self, document_path: str) -> Optional[str]:
         """Get stored file hash for a given document path, if any."""
@@ -168,11 +227,16 @@ class VectorStoreService:
             return []
 
     async def upsert_documents(
-        self, document_path: str, chunks: List[DocumentChunk], file_hash: str
+        self,
+        document_path: str,
+        chunks: List[DocumentChunk],
+        file_hash: str,
+        embeddings: Optional[np.ndarray] = None,
     ) -> int:
         """
         Upsert all chunks for a document: if content hash unchanged, skip; otherwise
         delete existing chunks for that path, then add the new ones with file_hash.
+        ``embeddings`` may carry precomputed vectors for ``chunks``.
 
         Returns number of chunks added (0 if skipped).
         """
@@ -189,7 +253,9 @@ class VectorStoreService:
                 logger.info(f"Replaced {deleted_count} old chunks for {document_path}")
 
             # Add new chunks with updated hash
-            return await self.add_documents(chunks, file_hash=file_hash)
+            return await self.add_documents(
+                chunks, file_hash=file_hash, embeddings=embeddings
+            )
         except Exception as e:
             logger.error(f"Upsert failed for {document_path}: {e}")
             return 0
@@ -197,8 +263,13 @@ class VectorStoreService:
     async def search_similar(
         self,
         query: str,
+        top_k: int = 6,
         metadata_filter: Optional[Dict[str, Any]] = None,
         similarity_threshold: float = None,
+        timings: Optional[Dict[str, float]] = None,
+        n_candidates: Optional[int] = None,
+        query_embeddings: Optional[np.ndarray] = None,
+        embeddings: Optional[Dict[str, np.ndarray]] = None,
     ) -> List[Tuple[DocumentChunk, float]]:
         """
         Search for similar documents.
@@ -208,83 +279,236 @@ class VectorStoreService:
             top_k: Number of results to return
             metadata_filter: Optional metadata filter
             similarity_threshold: Minimum similarity score
+            timings: Optional dict accumulating "embed" and "query" seconds
+            n_candidates: Nearest neighbours to fetch before applying the
+                threshold (defaults to ``min(top_k * 2, 100)``)
+            query_embeddings: Precomputed embedding of ``query`` (1 x dim), to
+                search again without re-embedding
+            embeddings: Optional dict receiving the stored embedding of each
+                returned chunk, keyed by chunk_id
 
         Returns:
             List of (document_chunk, similarity_score) tuples
         """
         await self.initialize()
 
-        top_k = 6
-        similarity_threshold = similarity_threshold or settings.similarity_threshold
+        if similarity_threshold is None:
+            similarity_threshold = settings.similarity_threshold
 
         # Generate query embedding
-        query_embedding = await embedding_service.embed_text(query)
-
-        # Prepare ChromaDB filter
-        where_filter = None
-        if metadata_filter:
-            where_filter = metadata_filter
+        if query_embeddings is None:
+            with stage_timer(timings, "embed"):
+                query_embeddings = await embedding_service.embed_queries([query])
 
         try:
-            # Search in ChromaDB
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=min(
-                    top_k * 2, 100
-                ),  # Get more results to filter by threshold
-                where=where_filter,
-                include=["documents", "metadatas", "distances"],
+            with stage_timer(timings, "query"):
+                rows: Optional[List[np.ndarray]] = (
+                    [] if embeddings is not None else None
+                )
+                documents, metadatas, similarities = await self._query(
+                    query_embeddings,
+                    # Get more results to filter by threshold
+                    n_results=n_candidates or min(top_k * 2, 100),
+                    where=metadata_filter or None,
+                    embeddings=rows,
+                )
+
+            similar_chunks = self._to_chunks(
+                documents,
+                metadatas,
+                similarities,
+                top_k=top_k,
+                similarity_threshold=similarity_threshold,
+                rows=rows,
+                embeddings=embeddings,
             )
+            logger.debug(f"Found {len(similar_chunks)} similar documents for query")
+            return similar_chunks
 
-            # Process results
-            similar_chunks = []
+        except Exception as e:
+            logger.error(f"Search failed: {e}")
+            return []
 
-            for i, (doc, metadata, distance) in enumerate(
-                zip(
-                    results["documents"][0],
-                    results["metadatas"][0],
-                    results["distances"][0],
-                )
-            ):
-                # Convert distance to similarity (ChromaDB returns distance, not similarity)
-                similarity = 1.0 - distance
+    async def search_similar_batch(
+        self,
+        query_embeddings: np.ndarray,
+        top_k: int = 6,
+        metadata_filter: Optional[Dict[str, Any]] = None,
+        similarity_threshold: float = None,
+        timings: Optional[Dict[str, float]] = None,
+        n_candidates: Optional[int] = None,
+        embeddings: Optional[List[Dict[str, np.ndarray]]] = None,
+    ) -> List[List[Tuple[DocumentChunk, float]]]:
+        """``search_similar`` for several queries with one index query.
 
-                # Apply similarity threshold
-                if similarity < similarity_threshold:
-                    continue
+        Args:
+            query_embeddings: One embedded query per row
+            embeddings: Optional list with one dict per query, receiving the
+                stored embedding of each returned chunk, keyed by chunk_id
 
-                # Reconstruct DocumentChunk
-                chunk = self._metadata_to_chunk(metadata, doc)
-                similar_chunks.append((chunk, similarity))
+        Other arguments are as for ``search_similar`` and apply to every query.
 
-                # Stop if we have enough results
-                if len(similar_chunks) >= top_k:
-                    break
+        Returns:
+            One list of (document_chunk, similarity_score) tuples per query
+        """
+        await self.initialize()
 
-            logger.debug(f"Found {len(similar_chunks)} similar documents for query")
-            return similar_chunks
+        if similarity_threshold is None:
+            similarity_threshold = settings.similarity_threshold
+
+        try:
+            with stage_timer(timings, "query"):
+                rows: Optional[List[List[np.ndarray]]] = (
+                    [[] for _ in range(len(query_embeddings))]
+                    if embeddings is not None
+                    else None
+                )
+                batch = await self._query_batch(
+                    query_embeddings,
+                    n_results=n_candidates or min(top_k * 2, 100),
+                    where=metadata_filter or None,
+                    embeddings=rows,
+                )
+
+            return [
+                self._to_chunks(
+                    documents,
+                    metadatas,
+                    similarities,
+                    top_k=top_k,
+                    similarity_threshold=similarity_threshold,
+                    rows=rows[i] if rows is not None else None,
+                    embeddings=embeddings[i] if embeddings is not None else None,
+                )
+                for i, (documents, metadatas, similarities) in enumerate(batch)
+            ]
 
         except Exception as e:
-            logger.error(f"Search failed: {e}")
-            return []
+            logger.error(f"Batch search failed: {e}")
+            return [[] for _ in range(len(query_embeddings))]
+
+    def _to_chunks(
+        self,
+        documents: List[str],
+        metadatas: List[Dict[str, Any]],
+        similarities: List[float],
+        *,
+        top_k: int,
+        similarity_threshold: float,
+        rows: Optional[List[np.ndarray]] = None,
+        embeddings: Optional[Dict[str, np.ndarray]] = None,
+    ) -> List[Tuple[DocumentChunk, float]]:
+        """Turn ``_query`` results into chunks.
+
+        Keeps the first ``top_k`` results above the similarity threshold.
+        """
+        similar_chunks = []
+
+        for i, (doc, metadata, similarity) in enumerate(
+            zip(documents, metadatas, similarities)
+        ):
+            # Apply similarity threshold
+            if similarity < similarity_threshold:
+                continue
+
+            # Reconstruct DocumentChunk
+            chunk = self._metadata_to_chunk(metadata, doc)
+            similar_chunks.append((chunk, similarity))
+            if rows is not None and embeddings is not None:
+                embeddings[chunk.chunk_id] = rows[i]
+
+            # Stop if we have enough results
+            if len(similar_chunks) >= top_k:
+                break
+
+        return similar_chunks
+
+    async def _query(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[np.ndarray]] = None,
+    ) -> Tuple[List[str], List[Dict[str, Any]], List[float]]:
+        """Nearest neighbours of the first query row.
+
+        Returns (documents, metadatas, similarities).
+
+        If ``embeddings`` is given it receives the stored embedding of each result.
+        """
+        include = ["documents", "metadatas", "distances"]
+        if embeddings is not None:
+            include.append("embeddings")
+        results = self.collection.query(
+            query_embeddings=self._chroma_embeddings(query_embeddings),
+            n_results=n_results,
+            where=where,
+            include=include,
+        )
+        if embeddings is not None:
+            embeddings.extend(np.asarray(results["embeddings"][0], dtype=np.float32))
+        # ChromaDB returns cosine distance, not similarity
+        similarities = [1.0 - distance for distance in results["distances"][0]]
+        return results["documents"][0], results["metadatas"][0], similarities
+
+    async def _query_batch(
+        self,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        where: Optional[Dict[str, Any]],
+        embeddings: Optional[List[List[np.ndarray]]] = None,
+    ) -> List[Tuple[List[str], List[Dict[str, Any]], List[float]]]:
+        """``_query`` for every query row, in one ``collection.query`` call.
+
+        If ``embeddings`` is given (one list per row) each list receives the
+        stored embeddings of that row's results.
+        """
+        include = ["documents", "metadatas", "distances"]
+        if embeddings is not None:
+            include.append("embeddings")
+        results = self.collection.query(
+            query_embeddings=self._chroma_embeddings(query_embeddings),
+            n_results=n_results,
+            where=where,
+            include=include,
+        )
+        batch = []
+        for i, distances in enumerate(results["distances"]):
+            if embeddings is not None:
+                embeddings[i].extend(
+                    np.asarray(results["embeddings"][i], dtype=np.float32)
+                )
+            batch.append(
+                (
+                    results["documents"][i],
+                    results["metadatas"][i],
+                    [1.0 - distance for distance in distances],
+                )
+            )
+        return batch
+
+    async def count_documents(self) -> int:
+        """Return the number of stored chunks (cheap, used by health checks)."""
+        await self.initialize()
+        return self.collection.count()
 
     async def get_collection_stats(self) -> Dict[str, Any]:
         """Get statistics about the vector collection."""
         await self.initialize()
 
         try:
-            count = self.collection.count()
+            count = await self.count_documents()
 
             # Get sample of metadata to analyze
             if count > 0:
-                sample = self.collection.get(limit=min(100, count))
+                sample = await self._sample_metadatas(min(100, count))
 
                 # Analyze metadata
                 authors = set()
                 titles = set()
                 tags = set()
 
-                for metadata in sample["metadatas"]:
+                for metadata in sample:
                     if metadata.get("author"):
                         authors.add(metadata["author"])
                     if metadata.get("title"):
@@ -314,6 +538,19 @@ class VectorStoreService:
             logger.error(f"Failed to get collection stats: {e}")
             return {"error": str(e)}
 
+    async def export_records(
+        self,
+    ) -> Tuple[List[str], np.ndarray, List[str], List[Dict[str, Any]]]:
+        """All stored chunks as (ids, float32 embeddings, documents, metadatas)."""
+        await self.initialize()
+        results = self.collection.get(include=["embeddings", "documents", "metadatas"])
+        embeddings = np.asarray(results["embeddings"], dtype=np.float32)
+        return results["ids"], embeddings, results["documents"], results["metadatas"]
+
+    async def _sample_metadatas(self, limit: int) -> List[Dict[str, Any]]:
+        """Metadata of up to ``limit`` stored chunks."""
+        return self.collection.get(limit=limit, include=["metadatas"])["metadatas"]
+
     async def delete_documents(self, document_path: str) -> int:
         """
         Delete all chunks from a specific document.
@@ -363,6 +600,70 @@ class VectorStoreService:
             logger.error(f"Failed to clear collection: {e}")
             return False
 
+    async def optimize(self) -> None:
+        """Compact storage after a bulk load (ChromaDB maintains its index itself)."""
+
+    async def rebuild_collection(
+        self, drop_old: bool = False, page_size: int = 1000
+    ) -> Dict[str, Any]:
+        """
+        Copy the index into a new collection built with the configured HNSW
+        parameters, then point COLLECTION_NAME at it.
+
+        Stored embeddings are copied as-is, so nothing is re-embedded. The
+        switch is a single atomic file replace; running servers keep using
+        the previous collection until they restart, so it is only deleted
+        with ``drop_old``.
+
+        Returns:
+            Dict with the previous and new collection names and chunk count
+        """
+        await self.initialize()
+
+        previous = self.collection
+        name = f"{settings.collection_name}-{uuid.uuid4().hex[:8]}"
+        target = self.client.create_collection(name=name, metadata=hnsw_metadata())
+        logger.info(f"Rebuilding {previous.name} into {name} with {hnsw_metadata()}")
+
+        try:
+            offset = 0
+            while True:
+                page = previous.get(
+                    include=["embeddings", "documents", "metadatas"],
+                    limit=page_size,
+                    offset=offset,
+                )
+                if not page["ids"]:
+                    break
+                target.add(
+                    ids=page["ids"],
+                    embeddings=self._chroma_embeddings(
+                        np.asarray(page["embeddings"], dtype=np.float32)
+                    ),
+                    documents=page["documents"],
+                    metadatas=page["metadatas"],
+                )
+                offset += len(page["ids"])
+
+            if target.count() != previous.count():
+                raise RuntimeError(
+                    f"Copied {target.count()} of {previous.count()} chunks into {name}"
+                )
+        except Exception:
+            self.client.delete_collection(name)
+            raise
+
+        _write_collection_alias(name)
+        self.collection = target
+        if drop_old:
+            self.client.delete_collection(previous.name)
+        logger.info(f"Switched {settings.collection_name} to {name} ({offset} chunks)")
+        return {"previous": previous.name, "collection": name, "count": offset}
+
+    def _chroma_embeddings(self, embeddings: np.ndarray) -> Any:
+        """Pass the embedding matrix in the form this chromadb version accepts."""
+        return embeddings if self._accepts_ndarray else embeddings.tolist()
+
     def _metadata_to_chunk(
         self, metadata: Dict[str, Any], content: str
     ) -> DocumentChunk:
@@ -391,8 +692,80 @@ class VectorStoreService:
             heading_level=metadata.get("heading_level") or None,
             metadata=doc_metadata,
             word_count=metadata.get("word_count", len(content.split())),
+            # Missing on indexes built before token counts were stored
+            token_count=metadata.get("token_count"),
         )
 
 
+def hnsw_metadata() -> Dict[str, Any]:
+    """ChromaDB collection metadata carrying the configured HNSW parameters."""
+    return {
+        "hnsw:space": "cosine",
+        "hnsw:M": settings.hnsw_m,
+        "hnsw:construction_ef": settings.hnsw_construction_ef,
+        "hnsw:search_ef": settings.hnsw_search_ef,
+        "hnsw:batch_size": settings.hnsw_batch_size,
+        "hnsw:sync_threshold": settings.hnsw_sync_threshold,
+    }
+
+
+def _collection_alias_path() -> Path:
+    return Path(settings.chromadb_path) / f"{settings.collection_name}.alias"
+
+
+def active_collection_name() -> str:
+    """The ChromaDB collection currently serving COLLECTION_NAME.
+
+    ``index rebuild`` creates a new collection and records its name in an
+    alias file next to the database; without one the names are the same.
+    """
+    try:
+        name = _collection_alias_path().read_text(encoding="utf-8").strip()
+    except FileNotFoundError:
+        name = ""
+    return name or settings.collection_name
+
+
+def _write_collection_alias(name: str) -> None:
+    path = _collection_alias_path()
+    staging = path.with_suffix(".alias.tmp")
+    with open(staging, "w", encoding="utf-8") as f:
+        f.write(name)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(staging, path)
+
+
+def create_vector_store() -> VectorStoreService:
+    """Create the vector store selected by VECTOR_DB_TYPE."""
+    if settings.vector_db_type == "numpy":
+        from ai_service.services.numpy_store import NumpyVectorStore
+
+        return NumpyVectorStore()
+    if settings.vector_db_type == "snapshot":
+        from ai_service.services.snapshot_store import SnapshotVectorStore
+
+        return SnapshotVectorStore()
+    if settings.vector_db_type != "chromadb":
+        raise ValueError(f"Unsupported VECTOR_DB_TYPE: {settings.vector_db_type}")
+    return VectorStoreService()
+
+
 # Global vector store instance
-vector_store = VectorStoreService()
+vector_store = create_vector_store()
+
+
+def writable_vector_store(
+    serving: Optional[VectorStoreService] = None,
+) -> VectorStoreService:
+    """The store ingestion writes to for ``serving`` (the global store by default).
+
+    Snapshot serving is read-only, so ingestion then builds into the NumPy
+    working index (NUMPY_INDEX_PATH) and publishes snapshots from it.
+    """
+    serving = serving or vector_store
+    if not serving.read_only:
+        return serving
+    from ai_service.services.numpy_store import NumpyVectorStore
+
+    return NumpyVectorStore()
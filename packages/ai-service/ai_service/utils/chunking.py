@@ -4,27 +4,40 @@ Respects markdown structure and maintains semantic coherence.
 """
 
 import re
-from typing import List, Tuple, Optional
+from bisect import bisect_left, bisect_right
 from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
 from ai_service.models.document import DocumentChunk, DocumentMetadata
+from ai_service.utils.tokens import count_tokens
 
 
 @dataclass
 class ChunkingConfig:
-    """Configuration for document chunking."""
+    """Configuration for document chunking.
+
+    ``max_chunk_size`` and ``chunk_overlap`` are measured in characters, or in
+    tokenizer tokens when ``size_unit`` is ``"tokens"``. In token mode the
+    size is the model sequence length, special tokens included.
+    ``min_chunk_size`` is always in characters.
+    """
     
     max_chunk_size: int = 1000
     chunk_overlap: int = 200
     respect_headings: bool = True
     min_chunk_size: int = 100
     preserve_code_blocks: bool = True
+    size_unit: str = "chars"
 
 
 class MarkdownChunker:
     """Intelligent markdown chunker that preserves structure."""
     
-    def __init__(self, config: ChunkingConfig = None):
+    def __init__(self, config: ChunkingConfig = None, tokenizer: Any = None):
         self.config = config or ChunkingConfig()
+        self.tokenizer = tokenizer
+        if self.config.size_unit == "tokens" and tokenizer is None:
+            raise ValueError("Token-based chunking requires a tokenizer")
         
         # Regex patterns for markdown structure
         self.heading_pattern = re.compile(r'^(#{1,6})\s+(.+)$', re.MULTILINE)
@@ -125,6 +138,16 @@ class MarkdownChunker:
         start_chunk_index: int
     ) -> List[DocumentChunk]:
         """Chunk a section of content."""
+        if self.config.size_unit == "tokens":
+            return self._chunk_section_by_tokens(
+                content,
+                document_path,
+                metadata,
+                heading,
+                heading_level,
+                start_chunk_index,
+            )
+
         if len(content) <= self.config.max_chunk_size:
             # Section fits in one chunk
             return [self._create_chunk(
@@ -142,12 +165,17 @@ class MarkdownChunker:
         start_pos = 0
         chunk_index = start_chunk_index
         
+        # Locate code blocks once per section instead of once per boundary
+        code_spans = self._find_code_spans(content)
+
         while start_pos < len(content):
             end_pos = min(start_pos + self.config.max_chunk_size, len(content))
             
             # Adjust end position to avoid breaking words/sentences
             if end_pos < len(content):
-                end_pos = self._find_good_break_point(content, start_pos, end_pos)
+                end_pos = self._find_good_break_point(
+                    content, start_pos, end_pos, code_spans
+                )
             
             chunk_content = content[start_pos:end_pos].strip()
             
@@ -174,42 +202,209 @@ class MarkdownChunker:
         
         return chunks
     
-    def _find_good_break_point(self, content: str, start: int, end: int) -> int:
-        """Find a good break point that doesn't split words or code blocks."""
-        
-        # Check if we're inside a code block
-        code_blocks = list(self.code_block_pattern.finditer(content))
-        for match in code_blocks:
-            if match.start() <= start < match.end() or match.start() <= end < match.end():
-                # We're inside or crossing a code block, adjust to include the whole block
-                if start < match.start():
-                    return match.start()
-                else:
-                    return match.end()
+    def _chunk_section_by_tokens(
+        self,
+        content: str,
+        document_path: str,
+        metadata: DocumentMetadata,
+        heading: Optional[str],
+        heading_level: Optional[int],
+        start_chunk_index: int,
+    ) -> List[DocumentChunk]:
+        """Chunk a section so each chunk fits the tokenizer's sequence budget.
+
+        The section is tokenized once; window ends and overlaps are mapped back
+        to character offsets through the token offsets, then snapped to the
+        same break points as character mode.
+        """
+        budget = max(1, self.config.max_chunk_size - self._special_token_count())
+
+        # Every token covers at least one character, so short sections fit
+        # without tokenizing at all.
+        token_starts = None
+        if len(content) > budget:
+            token_starts = self._token_starts(content)
+
+        if token_starts is None or len(token_starts) <= budget:
+            return [
+                self._create_chunk(
+                    content,
+                    document_path,
+                    metadata,
+                    heading,
+                    heading_level,
+                    start_chunk_index,
+                    0,
+                    len(content),
+                )
+            ]
+
+        chunks = []
+        start_pos = 0
+        chunk_index = start_chunk_index
+        code_spans = self._find_code_spans(content)
+        total_tokens = len(token_starts)
+        overlap = max(0, self.config.chunk_overlap)
+
+        while start_pos < len(content):
+            first_token = bisect_left(token_starts, start_pos)
+            limit_token = first_token + budget
+            if limit_token >= total_tokens:
+                end_pos = len(content)
+            else:
+                # Stop right before the first token that would exceed the budget
+                limit_pos = token_starts[limit_token]
+                end_pos = self._find_good_break_point(
+                    content, start_pos, limit_pos, code_spans
+                )
+                if end_pos > limit_pos:
+                    # A code block longer than the budget cannot be kept
+                    # whole: split it at a line or word boundary instead
+                    end_pos = self._find_good_break_point(
+                        content, start_pos, limit_pos, ([], [])
+                    )
+
+            chunk_content = content[start_pos:end_pos].strip()
+
+            # Skip chunks that are too small
+            if (
+                len(chunk_content) < self.config.min_chunk_size
+                and chunk_index > start_chunk_index
+            ):
+                break
+
+            if chunk_content:
+                chunks.append(
+                    self._create_chunk(
+                        chunk_content,
+                        document_path,
+                        metadata,
+                        heading,
+                        heading_level,
+                        chunk_index,
+                        start_pos,
+                        end_pos,
+                    )
+                )
+                chunk_index += 1
+
+            if end_pos >= len(content):
+                break
+
+            # Move start position back by ``overlap`` tokens
+            end_token = bisect_left(token_starts, end_pos)
+            overlap_token = max(first_token + 1, end_token - overlap)
+            overlap_pos = (
+                token_starts[overlap_token] if overlap_token < total_tokens else end_pos
+            )
+            start_pos = max(start_pos + 1, min(overlap_pos, end_pos))
+
+        return chunks
+
+    def _token_starts(self, content: str) -> List[int]:
+        """Return the start character offset of every token in ``content``."""
+        backend = getattr(self.tokenizer, "backend_tokenizer", None)
+        if backend is not None:
+            # Fast path: call the Rust tokenizer directly, skipping the
+            # transformers wrapper and its sequence-length warnings.
+            offsets = backend.encode(content, add_special_tokens=False).offsets
+        else:
+            offsets = self.tokenizer(
+                content,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+            )["offset_mapping"]
+        return [start for start, _ in offsets]
+
+    def _special_token_count(self) -> int:
+        """Number of special tokens the tokenizer adds to a single sequence."""
+        counter = getattr(self.tokenizer, "num_special_tokens_to_add", None)
+        return counter() if counter else 0
+
+    def _find_code_spans(self, content: str) -> Tuple[List[int], List[int]]:
+        """Return sorted start and end offsets of fenced code blocks."""
+        starts = []
+        ends = []
+        for match in self.code_block_pattern.finditer(content):
+            starts.append(match.start())
+            ends.append(match.end())
+        return starts, ends
+
+    def _find_good_break_point(
+        self,
+        content: str,
+        start: int,
+        end: int,
+        code_spans: Optional[Tuple[List[int], List[int]]] = None,
+    ) -> int:
+        """Find a good break point that doesn't split words or code blocks.
+
+        Candidates are searched backwards from ``end`` so the cost depends on
+        the distance to the nearest break rather than on the section length.
+        """
+        if code_spans is None:
+            code_spans = self._find_code_spans(content)
+
+        # Check if we're inside a code block. Blocks never overlap, so a block
+        # containing ``start`` always precedes one containing ``end``.
+        span_starts, span_ends = code_spans
+        idx = bisect_right(span_starts, start) - 1
+        if idx >= 0 and start < span_ends[idx]:
+            # Crossing from inside a block: extend to include the whole block
+            return span_ends[idx]
+        idx = bisect_right(span_starts, end) - 1
+        if idx >= 0 and end < span_ends[idx]:
+            # Block starts after ``start``: break right before it
+            return span_starts[idx]
         
         # Look for paragraph breaks (double newlines)
-        search_area = content[start:end]
-        paragraph_breaks = [m.start() + start for m in re.finditer(r'\n\n', search_area)]
-        if paragraph_breaks:
-            return paragraph_breaks[-1] + 2
+        pos = content.rfind("\n\n", start, end)
+        if pos != -1:
+            # Runs of newlines are consumed in non-overlapping pairs, so align
+            # to the last complete pair counted from the start of the run.
+            run_start = pos
+            while run_start > start and content[run_start - 1] == "\n":
+                run_start -= 1
+            pairs = (pos + 2 - run_start) // 2
+            return run_start + 2 * (pairs - 1) + 2
         
         # Look for sentence endings
-        sentence_endings = [m.start() + start for m in re.finditer(r'[.!?]\s+', search_area)]
-        if sentence_endings:
-            return sentence_endings[-1] + 1
+        pos = self._rfind_sentence_end(content, start, end)
+        if pos != -1:
+            return pos + 1
         
         # Look for line breaks
-        line_breaks = [m.start() + start for m in re.finditer(r'\n', search_area)]
-        if line_breaks:
-            return line_breaks[-1] + 1
+        pos = content.rfind("\n", start, end)
+        if pos != -1:
+            return pos + 1
         
-        # Look for word boundaries
-        word_boundaries = [m.start() + start for m in re.finditer(r'\s+', search_area)]
-        if word_boundaries:
-            return word_boundaries[-1]
+        # Look for word boundaries (start of the last whitespace run)
+        pos = end - 1
+        while pos >= start and not content[pos].isspace():
+            pos -= 1
+        if pos >= start:
+            while pos > start and content[pos - 1].isspace():
+                pos -= 1
+            return pos
         
         # If no good break point found, use original end
         return end
+
+    def _rfind_sentence_end(self, content: str, start: int, end: int) -> int:
+        """Return the last ``[.!?]`` in ``[start, end)`` followed by whitespace."""
+        limit = end - 1  # punctuation needs a following char inside the window
+        while limit > start:
+            pos = max(
+                content.rfind(".", start, limit),
+                content.rfind("!", start, limit),
+                content.rfind("?", start, limit),
+            )
+            if pos == -1:
+                return -1
+            if content[pos + 1].isspace():
+                return pos
+            limit = pos
+        return -1
     
     def _create_chunk(
         self,
@@ -241,7 +436,8 @@ class MarkdownChunker:
             heading=heading,
             heading_level=heading_level,
             metadata=metadata,
-            word_count=word_count
+            word_count=word_count,
+            token_count=count_tokens(content),
         )
 
 
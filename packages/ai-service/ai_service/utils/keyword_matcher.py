@@ -0,0 +1,107 @@
+"""
+Multi-keyword matching.
+Finds every keyword of every keyword class in a text with one regex scan.
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+
+def _trie_pattern(keywords: Iterable[str]) -> str:
+    """Build a regex alternation shaped like a prefix trie.
+
+    Shared prefixes are matched once, so the cost at each text position
+    depends on the keyword length rather than on the number of keywords.
+    Longer continuations are tried first: the group captures the longest
+    keyword starting at a position.
+    """
+    trie: Dict[str, dict] = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def emit(node: Dict[str, dict]) -> str:
+        branches = [
+            re.escape(char) + emit(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Ends a keyword here too: the continuation is optional (greedy)
+            return f"(?:{body})?"
+        return body
+
+    return emit(trie)
+
+
+class KeywordMatcher:
+    """Match lower-cased keywords, grouped into named classes, in one pass.
+
+    ``matches(text)`` returns the same keywords as ``keyword in text.lower()``
+    for each keyword, but scans the text once however many keywords there
+    are. Overlapping keywords are all found: every position where a keyword
+    starts yields the longest keyword there, and shorter keywords that are
+    prefixes of it are implied.
+    """
+
+    def __init__(self, classes: Mapping[str, Iterable[str]]):
+        self.classes: Tuple[str, ...] = tuple(classes)
+        keyword_classes: Dict[str, Set[str]] = {}
+        for name, keywords in classes.items():
+            for keyword in keywords:
+                keyword = keyword.lower()
+                if keyword:
+                    keyword_classes.setdefault(keyword, set()).add(name)
+        self._keyword_classes = {k: frozenset(v) for k, v in keyword_classes.items()}
+        self._prefixes: Dict[str, Tuple[str, ...]] = {
+            keyword: tuple(
+                keyword[:end]
+                for end in range(1, len(keyword) + 1)
+                if keyword[:end] in keyword_classes
+            )
+            for keyword in keyword_classes
+        }
+        self._pattern: Optional[re.Pattern] = (
+            re.compile(_trie_pattern(keyword_classes)) if keyword_classes else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._keyword_classes)
+
+    def keywords(self, name: str) -> List[str]:
+        """Return the keywords of one class."""
+        return [k for k, names in self._keyword_classes.items() if name in names]
+
+    def matches(self, text: str) -> FrozenSet[str]:
+        """Return every keyword contained in ``text`` (case-insensitive)."""
+        if self._pattern is None or not text:
+            return frozenset()
+        text = text.lower()
+        search = self._pattern.search
+        longest: Set[str] = set()
+        # Resume one character after each match start so overlapping
+        # keywords are not skipped; the regex skips non-matching text in C
+        match = search(text)
+        while match is not None:
+            longest.add(match.group())
+            match = search(text, match.start() + 1)
+        found: Set[str] = set()
+        for keyword in longest:
+            found.update(self._prefixes[keyword])
+        return frozenset(found)
+
+    def match_classes(self, text: str) -> Dict[str, FrozenSet[str]]:
+        """Return class name -> keywords of that class found in ``text``.
+
+        Classes without a match are omitted.
+        """
+        grouped: Dict[str, Set[str]] = {}
+        for keyword in self.matches(text):
+            for name in self._keyword_classes[keyword]:
+                grouped.setdefault(name, set()).add(keyword)
+        return {name: frozenset(found) for name, found in grouped.items()}
@@ -0,0 +1,353 @@
+"""
+Minimal in-process metrics with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms keyed by label values. Label
+children are created once and reused, so recording a sample on the hot path is
+a dict lookup plus a couple of integer updates under a lock.
+"""
+
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond stages up to slow LLM calls
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Metric:
+    """Base class handling names, help text and labelled children."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Return the child for the given label values, creating it once."""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} requires labels {self.labelnames}")
+        return self._children[()]
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._render_child(key, child))
+        return lines
+
+    def _render_child(self, key: Tuple[str, ...], child) -> Iterable[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value", "lock", "function")
+
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+        self.function: Optional[Callable[[], float]] = None
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from ``function`` at scrape time."""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default().inc(amount)
+
+    def _render_child(self, key, child: _Value):
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}{labels} {_format_value(child.get())}"
+
+
+class Gauge(Counter):
+    """Value that can go up and down, or be read from a callback."""
+
+    type_name = "gauge"
+
+    def set(self, value: float) -> None:
+        self._default().set(value)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._default().dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self._default().set_function(function)
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum", "lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        # One slot per bucket plus the +Inf overflow
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self.lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram (bucket upper bounds are inclusive)."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self._default().observe(value)
+
+    def _render_child(self, key, child: _HistogramValue):
+        counts, total = child.snapshot()
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            bucket_labels = _format_labels(self.labelnames, key, le)
+            yield f"{self.name}_bucket{bucket_labels} {cumulative}"
+        labels = _format_labels(self.labelnames, key)
+        yield f"{self.name}_sum{labels} {_format_value(total)}"
+        yield f"{self.name}_count{labels} {cumulative}"
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Sequence[str] = ()
+    ) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global registry and service metrics
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "ai_service_stage_duration_seconds",
+    "Duration of RAG pipeline stages (embed, query, rerank, post_filter, history_load, "
+    "prompt_build, llm_ttft, llm_total, persistence).",
+    ["stage"],
+)
+CACHE_HITS = registry.counter(
+    "ai_service_cache_hits_total", "Cache hits by cache name.", ["cache"]
+)
+CACHE_MISSES = registry.counter(
+    "ai_service_cache_misses_total", "Cache misses by cache name.", ["cache"]
+)
+QUERY_INTENTS = registry.counter(
+    "ai_service_query_intent_total", "Classified query intents.", ["intent"]
+)
+RETRIEVAL_REQUERIES = registry.counter(
+    "ai_service_retrieval_requeries_total",
+    "Extra vector searches made when too few documents survived post-filtering.",
+    ["kind"],
+)
+NO_CONTEXT_ANSWERS = registry.counter(
+    "ai_service_no_context_answers_total",
+    "Answers returned without any retrieved context.",
+)
+LLM_HTTP_IN_FLIGHT = registry.gauge(
+    "ai_service_llm_http_requests_in_flight",
+    "LLM provider HTTP requests currently in progress (until the body is closed).",
+    ["provider"],
+)
+LLM_HTTP_CONNECTIONS = registry.gauge(
+    "ai_service_llm_http_connections",
+    "Connections in the LLM provider HTTP pool by state.",
+    ["provider", "state"],
+)
+LLM_ATTEMPTS = registry.counter(
+    "ai_service_llm_attempts_total",
+    "LLM request attempts by provider and outcome (success, error, cancelled).",
+    ["provider", "outcome"],
+)
+LLM_HEDGES = registry.counter(
+    "ai_service_llm_hedges_total",
+    "Hedged LLM requests by the provider the hedge was sent to.",
+    ["provider"],
+)
+LLM_RETRIES = registry.counter(
+    "ai_service_llm_retries_total", "LLM requests retried after a retryable error."
+)
+LLM_CIRCUIT_OPEN = registry.gauge(
+    "ai_service_llm_circuit_open",
+    "Whether the provider circuit breaker is open (1) or not (0).",
+    ["provider"],
+)
+ADMISSION_DECISIONS = registry.counter(
+    "ai_service_admission_decisions_total",
+    "Admission decisions for LLM-backed requests by kind and outcome.",
+    ["kind", "outcome"],
+)
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "ai_service_admission_in_flight", "Admitted LLM-backed requests currently running."
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "ai_service_admission_queue_depth", "Requests waiting for an admission slot."
+)
+ADMISSION_WAIT = registry.histogram(
+    "ai_service_admission_wait_seconds",
+    "Time queued requests waited for an admission slot.",
+    ["kind"],
+)
+LLM_PROMPT_TOKENS = registry.counter(
+    "ai_service_llm_prompt_tokens_total",
+    "Provider-reported prompt tokens, split into prompt-cache hits (cached) "
+    "and the rest (uncached).",
+    ["cache"],
+)
+LLM_COMPLETION_TOKENS = registry.counter(
+    "ai_service_llm_completion_tokens_total", "Provider-reported completion tokens."
+)
+EMBEDDING_TOKENS = registry.counter(
+    "ai_service_embedding_tokens_total",
+    "Tokens embedded by the local model, per its tokenizer.",
+)
+EMBEDDING_SECONDS = registry.counter(
+    "ai_service_embedding_seconds_total",
+    "Time spent in local embedding model calls "
+    "(tokens/s = tokens_total / seconds_total).",
+)
+RERANK_REQUESTS = registry.counter(
+    "ai_service_rerank_total",
+    "Cross-encoder rerank attempts by outcome "
+    "(scored, cached, timeout, unavailable, error).",
+    ["outcome"],
+)
+RERANK_SECONDS = registry.histogram(
+    "ai_service_rerank_model_seconds",
+    "Cross-encoder scoring time per request, including time queued for the model.",
+)
@@ -0,0 +1,43 @@
+"""
+Maximal marginal relevance (MMR) selection.
+Picks results that are relevant to the query but not redundant with each other.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+
+def maximal_marginal_relevance(
+    relevance: Sequence[float],
+    embeddings: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.7,
+) -> List[int]:
+    """Greedily select ``k`` candidate indices by MMR.
+
+    Each step picks the candidate maximising
+    ``lambda_mult * relevance - (1 - lambda_mult) * max similarity to the
+    already selected ones``. ``embeddings`` holds one unit-length row per
+    candidate, so their pairwise similarities are a single matrix product.
+    """
+    relevance = np.asarray(relevance, dtype=np.float32)
+    k = min(k, len(relevance))
+    if k <= 0:
+        return []
+
+    similarity = embeddings @ embeddings.T
+    available = np.ones(len(relevance), dtype=bool)
+    selected = [int(np.argmax(relevance))]
+    available[selected[0]] = False
+    redundancy = similarity[selected[0]].copy()
+
+    while len(selected) < k:
+        scores = lambda_mult * relevance - (1.0 - lambda_mult) * redundancy
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(redundancy, similarity[pick], out=redundancy)
+
+    return selected
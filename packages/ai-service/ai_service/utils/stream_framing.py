@@ -0,0 +1,97 @@
+"""
+Framing and flush coalescing for streamed chat events.
+Events are encoded with orjson as NDJSON lines or Server-Sent Events, and
+consecutive token events are merged so the response is written in fewer,
+larger chunks.
+"""
+
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List
+
+import orjson
+
+Event = Dict[str, Any]
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def encode_ndjson(event: Event) -> bytes:
+    """Encode ``event`` as one NDJSON line."""
+    return orjson.dumps(event) + b"\n"
+
+
+def encode_sse(event: Event) -> bytes:
+    """Encode ``event`` as a Server-Sent Event named after its ``type``."""
+    name = str(event.get("type") or "message").encode()
+    return b"event: " + name + b"\ndata: " + orjson.dumps(event) + b"\n\n"
+
+
+ENCODERS: Dict[str, Callable[[Event], bytes]] = {
+    "ndjson": encode_ndjson,
+    "sse": encode_sse,
+}
+
+
+async def coalesce_events(
+    events: AsyncIterator[Event],
+    encode: Callable[[Event], bytes] = encode_ndjson,
+    flush_interval: float = 0.0,
+    flush_bytes: int = 0,
+) -> AsyncIterator[bytes]:
+    """Encode ``events`` and yield them in coalesced writes.
+
+    Consecutive ``token`` events are merged into one event carrying the
+    joined text. A token is written at once when nothing was written in the
+    last ``flush_interval`` seconds; tokens arriving sooner are held until a
+    later event finds the interval elapsed, ``flush_bytes`` bytes of token
+    text are pending, or any other event (or the end of the stream) arrives.
+    The source is iterated directly, without a task per event, so a pause in
+    it holds at most the tokens received within one interval of a write.
+    With ``flush_interval`` 0 every event is written as soon as it arrives.
+    """
+    try:
+        if flush_interval <= 0:
+            async for event in events:
+                yield encode(event)
+            return
+
+        pending: List[str] = []
+        pending_bytes = 0
+        last_write = float("-inf")
+
+        def flush() -> bytes:
+            nonlocal pending_bytes
+            data = encode({"type": "token", "token": "".join(pending)})
+            pending.clear()
+            pending_bytes = 0
+            return data
+
+        async for event in events:
+            if event.get("type") == "token":
+                token = event.get("token") or ""
+                pending.append(token)
+                pending_bytes += len(token.encode())
+                now = time.monotonic()
+                if now - last_write >= flush_interval or (
+                    flush_bytes and pending_bytes >= flush_bytes
+                ):
+                    last_write = now
+                    yield flush()
+                continue
+
+            last_write = time.monotonic()
+            if pending:
+                yield flush() + encode(event)
+            else:
+                yield encode(event)
+
+        if pending:
+            yield flush()
+    finally:
+        # Close the source promptly when the client goes away
+        aclose = getattr(events, "aclose", None)
+        if aclose is not None:
+            await aclose()
@@ -0,0 +1,34 @@
+"""
+Lightweight stage timing helpers.
+Used to break request latency down into pipeline stages.
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from ai_service.utils.metrics import STAGE_DURATION
+
+
+def record_stage(
+    stage: str, seconds: float, timings: Optional[Dict[str, float]] = None
+) -> None:
+    """Record a stage duration in the stage histogram and optional ``timings``."""
+    STAGE_DURATION.labels(stage).observe(seconds)
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage_timer(timings: Optional[Dict[str, float]], stage: str) -> Iterator[None]:
+    """Time the block as ``stage``.
+
+    The duration always goes to the ``/metrics`` stage histogram and is also
+    accumulated into ``timings[stage]`` when a dict is passed, so callers can
+    thread an optional per-request breakdown through without branching.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start, timings)
@@ -0,0 +1,74 @@
+"""
+Token counting for prompt budgeting.
+Uses tiktoken when it is installed and its encoding is available locally,
+otherwise a character-based estimate.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional
+
+from loguru import logger
+
+from ai_service.config.settings import settings
+
+# Encoding used when tiktoken does not know the configured model
+DEFAULT_ENCODING = "cl100k_base"
+# Rough characters per token for ASCII text in the fallback estimate
+ASCII_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=8)
+def _get_encoding(model: str) -> Optional[Any]:
+    """Load the tiktoken encoding for ``model``, or None if unavailable."""
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as exc:
+        # Encodings are downloaded on first use; offline hosts fall back
+        logger.warning(f"tiktoken encoding unavailable, estimating tokens: {exc}")
+        return None
+
+
+def _char_cost(ch: str) -> float:
+    # CJK and other non-ASCII characters are roughly one token each
+    return 1.0 / ASCII_CHARS_PER_TOKEN if ch.isascii() else 1.0
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens ``text`` takes up in a prompt for ``model``."""
+    if not text:
+        return 0
+    encoding = _get_encoding(model or settings.model)
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return -(-ascii_chars // ASCII_CHARS_PER_TOKEN) + (len(text) - ascii_chars)
+
+
+def truncate_to_tokens(
+    text: str, max_tokens: int, model: Optional[str] = None, marker: str = "…"
+) -> str:
+    """Cut ``text`` to at most ``max_tokens`` tokens, appending ``marker``."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    encoding = _get_encoding(model or settings.model)
+    if encoding is not None:
+        tokens = encoding.encode(text, disallowed_special=())
+        return encoding.decode(tokens[:max_tokens]).rstrip() + marker
+
+    budget = float(max_tokens)
+    for index, ch in enumerate(text):
+        budget -= _char_cost(ch)
+        if budget < 0:
+            return text[:index].rstrip() + marker
+    return text
@@ -12,8 +12,20 @@ echo "Applying conversation store migrations..."
 python -m ai_service migrate
 
 # Run the data ingestion script to refresh the vector database.
-echo "Running data ingestion..."
-python -m ai_service ingest
+# INGEST_ON_START: "true", "false" or "auto" (default). With "auto", workers
+# serving read-only snapshots (VECTOR_DB_TYPE=snapshot) skip ingestion when a
+# snapshot has already been published, so startup only maps it.
+INGEST_ON_START="${INGEST_ON_START:-auto}"
+if [ "$INGEST_ON_START" = "auto" ] && [ "$VECTOR_DB_TYPE" = "snapshot" ] \
+    && [ -f "${SNAPSHOT_PATH:-./data/snapshots}/CURRENT" ]; then
+    INGEST_ON_START=false
+fi
+if [ "$INGEST_ON_START" = "false" ]; then
+    echo "Skipping data ingestion (serving the published index snapshot)..."
+else
+    echo "Running data ingestion..."
+    python -m ai_service ingest
+fi
 
 # Now, execute the main command (passed from Dockerfile's CMD).
 echo "Starting AI service..."
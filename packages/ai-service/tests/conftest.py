@@ -3,18 +3,20 @@ Pytest configuration and fixtures for AI service testing.
 """
 
 import asyncio
-import pytest
 import tempfile
 from pathlib import Path
 from typing import AsyncGenerator
 from unittest.mock import AsyncMock, MagicMock
 
+import numpy as np
+import pytest
+
 from ai_service.config.settings import SettingsModule
-from ai_service.models.document import DocumentMetadata, DocumentChunk
+from ai_service.models.document import DocumentChunk, DocumentMetadata
 from ai_service.services.embedding import EmbeddingService
-from ai_service.services.vector_store import VectorStoreService
 from ai_service.services.llm import LLMService
 from ai_service.services.rag import RAGPipeline
+from ai_service.services.vector_store import VectorStoreService
 
 
 @pytest.fixture(scope="session")
@@ -113,6 +115,9 @@ async def mock_embedding_service():
     service.initialize.return_value = None
     service.embed_text.return_value = [0.1] * 384  # Mock 384-dim embedding
     service.embed_batch.return_value = [[0.1] * 384, [0.2] * 384]
+    service.embed_texts.return_value = np.array(
+        service.embed_batch.return_value, dtype=np.float32
+    )
     service.get_dimension.return_value = 384
     service.compute_similarity.return_value = 0.8
     return service
@@ -249,6 +254,7 @@ def test_docs_directory(test_markdown_content):
 def test_client():
     """Create test client for FastAPI app."""
     from fastapi.testclient import TestClient
+
     # Ensure API endpoints that require API key are accessible in unit tests
     # by clearing API key in the existing settings object
     import ai_service.config.settings as settings_module
@@ -0,0 +1,121 @@
+"""
+Tests for LLM admission control.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai_service.api import chat as chat_api
+from ai_service.models.chat import ChatResponse
+from ai_service.services.admission import AdmissionController, AdmissionRejected
+
+
+@pytest.mark.asyncio
+async def test_concurrency_limit_queues_and_hands_over_slots():
+    controller = AdmissionController(
+        max_concurrency=1, queue_size=4, queue_timeout=1, rate=0
+    )
+    first = await controller.acquire("chat")
+
+    waiter = asyncio.create_task(controller.acquire("chat"))
+    await asyncio.sleep(0)
+    assert controller.waiting == 1 and not waiter.done()
+
+    first.release()
+    second = await waiter
+    assert controller.in_flight == 1
+    second.release()
+    second.release()  # idempotent
+    assert controller.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_streaming_requests_are_served_first():
+    controller = AdmissionController(
+        max_concurrency=1, queue_size=4, queue_timeout=1, rate=0
+    )
+    ticket = await controller.acquire("chat")
+    order = []
+
+    async def wait(kind):
+        admitted = await controller.acquire(kind)
+        order.append(kind)
+        admitted.release()
+
+    tasks = [asyncio.create_task(wait("chat")), asyncio.create_task(wait("stream"))]
+    await asyncio.sleep(0)
+    ticket.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["stream", "chat"]
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_timeout_are_rejected_with_503():
+    controller = AdmissionController(
+        max_concurrency=1, queue_size=1, queue_timeout=0.05, rate=0
+    )
+    await controller.acquire("chat")
+    waiter = asyncio.create_task(controller.acquire("chat"))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejected) as full:
+        await controller.acquire("chat")
+    assert full.value.status_code == 503
+
+    with pytest.raises(AdmissionRejected) as timed_out:
+        await waiter
+    assert timed_out.value.status_code == 503
+    assert controller.waiting == 0 and controller.in_flight == 1
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_rejects_with_429_and_retry_after():
+    controller = AdmissionController(
+        max_concurrency=0, queue_size=0, queue_timeout=1, rate=0.5, burst=1
+    )
+    (await controller.acquire("chat")).release()
+
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.acquire("chat")
+    assert rejected.value.status_code == 429
+    assert rejected.value.headers["Retry-After"] == "2"
+
+
+def test_chat_endpoint_returns_retry_after_when_saturated():
+    app = FastAPI()
+    app.include_router(chat_api.router, prefix="/api")
+    controller = AdmissionController(
+        max_concurrency=1, queue_size=0, queue_timeout=1, rate=0
+    )
+    response = ChatResponse(
+        answer="ok", sources=[], confidence_score=1.0, response_time_ms=1
+    )
+
+    async def stream_chat(request):
+        yield {"type": "final", "answer": "ok"}
+
+    with patch.object(chat_api, "admission_controller", controller), patch.object(
+        chat_api.rag_pipeline,
+        "process_chat_request",
+        new=AsyncMock(return_value=response),
+    ), patch.object(chat_api.rag_pipeline, "stream_chat", new=stream_chat):
+        client = TestClient(app)
+        assert client.post("/api/chat", json={"question": "hi"}).status_code == 200
+        assert controller.in_flight == 0
+        assert (
+            client.post("/api/chat/stream", json={"question": "hi"}).status_code == 200
+        )
+        assert controller.in_flight == 0
+
+        controller.in_flight = 1
+        busy = client.post("/api/chat", json={"question": "hi"})
+        assert busy.status_code == 503
+        assert busy.headers["retry-after"] == "1"
+
+        busy_stream = client.post("/api/chat/stream", json={"question": "hi"})
+        assert busy_stream.status_code == 503
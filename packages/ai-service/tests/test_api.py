@@ -2,12 +2,29 @@
 Tests for FastAPI endpoints and API functionality.
 """
 
+import time
+from datetime import datetime
+from unittest.mock import AsyncMock, patch
+
 import pytest
-from unittest.mock import patch, AsyncMock
 from fastapi.testclient import TestClient
 
 from ai_service.main import app
 from ai_service.models.chat import ChatRequest, ChatResponse
+from ai_service.services.health_monitor import HealthSnapshot
+
+
+def _snapshot(**overrides):
+    values = {
+        "vector_db_status": "healthy",
+        "llm_status": "healthy",
+        "embedding_status": "healthy",
+        "documents_indexed": 10,
+        "checked_at": datetime.now(),
+        "checked_monotonic": time.monotonic(),
+    }
+    values.update(overrides)
+    return HealthSnapshot(**values)
 
 
 class TestHealthEndpoint:
@@ -15,26 +32,28 @@ class TestHealthEndpoint:
     
     def test_health_check_success(self, test_client):
         """Test successful health check."""
-        with patch('ai_service.services.rag.rag_pipeline.get_system_info') as mock_info:
-            mock_info.return_value = {
-                "vector_store": {"total_documents": 10},
-                "llm_service": {"status": "healthy"}
-            }
+        with patch(
+            "ai_service.api.health.health_monitor.get_snapshot", new_callable=AsyncMock
+        ) as mock_snapshot:
+            mock_snapshot.return_value = _snapshot()
             
             response = test_client.get("/health")
             
             assert response.status_code == 200
             data = response.json()
-            assert data["status"] in ["healthy", "degraded"]
+            assert data["status"] == "healthy"
             assert "version" in data
             assert "vector_db_status" in data
             assert "llm_status" in data
-            assert "documents_indexed" in data
+            assert data["documents_indexed"] == 10
+            assert data["age_seconds"] is not None
     
     def test_health_check_with_errors(self, test_client):
         """Test health check with service errors."""
-        with patch('ai_service.services.rag.rag_pipeline.get_system_info') as mock_info:
-            mock_info.return_value = {"error": "Service unavailable"}
+        with patch(
+            "ai_service.api.health.health_monitor.get_snapshot", new_callable=AsyncMock
+        ) as mock_snapshot:
+            mock_snapshot.return_value = _snapshot(llm_status="unhealthy")
             
             response = test_client.get("/health")
             
@@ -44,8 +63,10 @@ class TestHealthEndpoint:
     
     def test_health_check_exception(self, test_client):
         """Test health check with exception."""
-        with patch('ai_service.services.rag.rag_pipeline.get_system_info') as mock_info:
-            mock_info.side_effect = Exception("Service error")
+        with patch(
+            "ai_service.api.health.health_monitor.get_snapshot", new_callable=AsyncMock
+        ) as mock_snapshot:
+            mock_snapshot.side_effect = Exception("Service error")
             
             response = test_client.get("/health")
             
@@ -53,6 +74,29 @@ class TestHealthEndpoint:
             data = response.json()
             assert data["status"] == "unhealthy"
 
+    def test_liveness(self, test_client):
+        """Liveness does not touch any dependency."""
+        with patch(
+            "ai_service.api.health.health_monitor.get_snapshot", new_callable=AsyncMock
+        ) as mock_snapshot:
+            response = test_client.get("/health/live")
+
+            assert response.status_code == 200
+            mock_snapshot.assert_not_called()
+
+    def test_readiness(self, test_client):
+        """Readiness returns 503 until the vector store is usable."""
+        with patch(
+            "ai_service.api.health.health_monitor.get_snapshot", new_callable=AsyncMock
+        ) as mock_snapshot:
+            mock_snapshot.return_value = _snapshot(llm_status="unhealthy")
+            assert test_client.get("/health/ready").status_code == 200
+
+            mock_snapshot.return_value = _snapshot(vector_db_status="unhealthy")
+            response = test_client.get("/health/ready")
+            assert response.status_code == 503
+            assert response.json()["status"] == "not_ready"
+
 
 class TestChatEndpoint:
     """Test chat API endpoint."""
@@ -280,6 +324,56 @@ class TestVectorStoreEndpoints:
             assert data["document_path"] == "test-doc.md"
 
 
+class TestVectorSearchBatchEndpoint:
+    """Test the batch vector search endpoint."""
+
+    def test_batch_returns_results_per_query(self, test_client):
+        """Each query gets its own sources and timings, in request order."""
+
+        async def retrieve(queries, *, top_k, timings, query_timings):
+            timings["embed"] = 0.004
+            for stages in query_timings:
+                stages["post_filter"] = 0.001
+            return [[] for _ in queries]
+
+        with patch(
+            "ai_service.api.chat.rag_pipeline._retrieve_documents_batch",
+            new=AsyncMock(side_effect=retrieve),
+        ) as mock_retrieve:
+            response = test_client.post(
+                "/api/vector-search/batch",
+                json={"queries": ["What is HMR?", "vite proxy"], "top_k": 2},
+            )
+
+            assert response.status_code == 200
+            data = response.json()
+            assert [r["query"] for r in data["results"]] == [
+                "What is HMR?",
+                "vite proxy",
+            ]
+            assert data["results"][1]["timings_ms"] == {"post_filter": 1.0}
+            assert data["timings_ms"] == {"embed": 4.0}
+            assert mock_retrieve.await_args.kwargs["top_k"] == 2
+
+    def test_batch_rejects_too_many_or_empty_queries(self, test_client):
+        """Oversized batches and blank queries are rejected."""
+        from ai_service.config.settings import settings
+
+        response = test_client.post(
+            "/api/vector-search/batch",
+            json={"queries": ["q"] * (settings.vector_search_batch_max + 1)},
+        )
+        assert response.status_code == 400
+
+        response = test_client.post(
+            "/api/vector-search/batch", json={"queries": ["ok", " "]}
+        )
+        assert response.status_code == 400
+
+        response = test_client.post("/api/vector-search/batch", json={"queries": []})
+        assert response.status_code == 422
+
+
 class TestErrorHandling:
     """Test error handling and edge cases."""
     
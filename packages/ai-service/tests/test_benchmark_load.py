@@ -0,0 +1,131 @@
+"""
+Tests for the stub LLM server and the chat load generator.
+"""
+
+import json
+
+import httpx
+import openai
+import pytest
+
+from ai_service.benchmarks.load import (
+    EndpointStats,
+    _call_stream,
+    parse_mix,
+    run_load_test,
+)
+from ai_service.benchmarks.stub_llm import StubConfig, create_stub_app
+from ai_service.utils.tokens import count_tokens
+
+
+def _stub_client(config: StubConfig) -> openai.AsyncOpenAI:
+    transport = httpx.ASGITransport(app=create_stub_app(config))
+    return openai.AsyncOpenAI(
+        api_key="stub",
+        base_url="http://stub/v1",
+        http_client=httpx.AsyncClient(transport=transport),
+        max_retries=0,
+    )
+
+
+@pytest.mark.asyncio
+async def test_stub_server_is_openai_compatible():
+    client = _stub_client(
+        StubConfig(ttft_ms=0, tokens_per_second=0, completion_tokens=5)
+    )
+    messages = [{"role": "user", "content": "hello"}]
+
+    response = await client.chat.completions.create(model="m", messages=messages)
+    assert response.choices[0].message.content
+    assert response.usage.completion_tokens == 5
+
+    stream = await client.chat.completions.create(
+        model="m",
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+    )
+    tokens = []
+    usage = None
+    async for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            tokens.append(chunk.choices[0].delta.content)
+        if chunk.usage:
+            usage = chunk.usage
+    assert "".join(tokens) == response.choices[0].message.content
+    assert usage.completion_tokens == 5
+
+
+@pytest.mark.asyncio
+async def test_stub_server_injects_errors():
+    client = _stub_client(StubConfig(ttft_ms=0, error_rate=1.0, rate_limit_share=1.0))
+    with pytest.raises(openai.RateLimitError):
+        await client.chat.completions.create(
+            model="m", messages=[{"role": "user", "content": "hi"}]
+        )
+
+
+def test_parse_mix():
+    assert parse_mix("chat:1, stream:3") == {"chat": 1.0, "stream": 3.0}
+    with pytest.raises(ValueError):
+        parse_mix("unknown:1")
+
+
+@pytest.mark.asyncio
+async def test_load_test_reports_per_endpoint_stats():
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path == "/api/chat/stream":
+            lines = (
+                [{"type": "stage", "stage": "generate"}]
+                + [{"type": "token", "token": t} for t in ("a", "b", "c")]
+                + [{"type": "final"}]
+            )
+            body = "".join(json.dumps(line) + "\n" for line in lines)
+            return httpx.Response(200, text=body)
+        if json.loads(request.content)["question"] == "bad":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"answer": "ok"})
+
+    report = await run_load_test(
+        "http://service",
+        concurrency=3,
+        requests=30,
+        mix={"chat": 1, "stream": 1},
+        questions=["good", "bad"],
+        seed=7,
+        transport=httpx.MockTransport(handler),
+    )
+
+    endpoints = report["summary"]["endpoints"]
+    assert report["summary"]["requests"] == 30
+    assert endpoints["chat"]["requests"] + endpoints["stream"]["requests"] == 30
+    assert endpoints["chat"]["errors"] == endpoints["chat"]["status_codes"].get(
+        "503", 0
+    )
+    assert endpoints["stream"]["errors"] == 0
+    assert set(endpoints["stream"]["ttft_ms"]) == {"mean", "p50", "p95", "p99"}
+    assert "ttft_ms" not in endpoints["chat"]
+
+
+@pytest.mark.asyncio
+async def test_stream_tokens_are_counted_from_coalesced_frames():
+    frames = ["Hello", " world, this is", " Vite"]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        # Pinned to NDJSON whatever the server's default framing is
+        assert request.url.params["format"] == "ndjson"
+        lines = [{"type": "token", "token": t} for t in frames] + [{"type": "final"}]
+        return httpx.Response(
+            200, text="".join(json.dumps(line) + "\n" for line in lines)
+        )
+
+    stats = EndpointStats()
+    async with httpx.AsyncClient(
+        base_url="http://service", transport=httpx.MockTransport(handler)
+    ) as client:
+        await _call_stream(client, "q", stats)
+
+    assert stats.errors == 0
+    assert stats.tokens == sum(max(1, count_tokens(t)) for t in frames)
+    # One inter-token sample per token after the first frame
+    assert len(stats.inter_token_ms) == stats.tokens - max(1, count_tokens(frames[0]))
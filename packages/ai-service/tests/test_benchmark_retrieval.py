@@ -0,0 +1,149 @@
+"""
+Tests for the retrieval benchmark harness.
+"""
+
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from ai_service.benchmarks.retrieval import (
+    BenchmarkCase,
+    load_cases,
+    recall_at_k,
+    reciprocal_rank,
+    run_benchmark,
+    run_retrieval_benchmark,
+)
+from ai_service.config.settings import settings
+from ai_service.services.embedding import embedding_service
+
+
+def test_quality_metrics():
+    retrieved = ["a.md", "b.md", "c.md"]
+    assert recall_at_k(retrieved, ["b.md", "z.md"], 1) == 0.0
+    assert recall_at_k(retrieved, ["b.md", "z.md"], 2) == 0.5
+    assert reciprocal_rank(retrieved, ["c.md"]) == pytest.approx(1 / 3)
+    assert reciprocal_rank(retrieved, ["z.md"]) == 0.0
+
+
+def test_load_cases_jsonl_and_yaml(tmp_path: Path):
+    jsonl = tmp_path / "cases.jsonl"
+    jsonl.write_text(
+        '{"question": "q1", "expected": "./guide/a.md"}\n\n'
+        '{"question": "q2", "expected": ["b.md"]}\n',
+        encoding="utf-8",
+    )
+    yml = tmp_path / "cases.yaml"
+    yml.write_text(
+        "cases:\n  - question: q1\n    expected: [guide/a.md]\n", encoding="utf-8"
+    )
+
+    assert load_cases(jsonl) == [
+        BenchmarkCase("q1", ["guide/a.md"]),
+        BenchmarkCase("q2", ["b.md"]),
+    ]
+    assert load_cases(yml) == [BenchmarkCase("q1", ["guide/a.md"])]
+
+
+class _FakePipeline:
+    def __init__(self, answers):
+        self.answers = answers
+        self.calls = 0
+
+    async def _retrieve_documents(self, query, *, top_k=3, timings=None):
+        self.calls += 1
+        if timings is not None:
+            timings.update({"embed": 0.002, "query": 0.001, "post_filter": 0.0005})
+        return [
+            (SimpleNamespace(relative_path=path), 0.9) for path in self.answers[query]
+        ]
+
+
+@pytest.mark.asyncio
+async def test_run_benchmark_reports_quality_and_stage_latency():
+    pipeline = _FakePipeline({"q1": ["a.md", "a.md", "b.md"], "q2": ["c.md"]})
+    cases = [BenchmarkCase("q1", ["b.md"]), BenchmarkCase("q2", ["d.md"])]
+
+    report = await run_benchmark(cases, pipeline=pipeline, top_k=2, repeat=2, warmup=1)
+
+    summary = report["summary"]
+    assert pipeline.calls == 1 + 2 * 2
+    assert summary["recall"] == {"@1": 0.0, "@2": 0.5}
+    assert summary["mrr"] == 0.25
+    assert summary["latency_ms"]["embed"]["p50"] == pytest.approx(2.0)
+    assert set(summary["latency_ms"]) == {"total", "embed", "query", "post_filter"}
+    # Duplicate chunks from the same document collapse to one ranked entry
+    assert report["queries"][0]["retrieved"] == ["a.md", "b.md"]
+
+
+@pytest.mark.asyncio
+async def test_recall_stops_at_the_retrieval_cap():
+    pipeline = _FakePipeline({"q1": ["a.md", "b.md", "c.md"]})
+
+    report = await run_benchmark(
+        [BenchmarkCase("q1", ["c.md"])], pipeline=pipeline, top_k=10, warmup=0
+    )
+
+    assert report["summary"]["recall"] == {"@1": 0.0, "@2": 0.0, "@3": 1.0}
+    assert report["meta"]["top_k"] == 10
+    assert report["meta"]["max_retrieved_chunks"] == 3
+
+
+async def _bag_of_words(texts, usage=None):
+    """Deterministic stand-in embeddings: hashed word counts, L2-normalized."""
+    vectors = np.zeros((len(texts), 64), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            vectors[row, zlib.crc32(word.encode()) % 64] += 1.0
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+@pytest.mark.asyncio
+async def test_retrieval_benchmark_leaves_configured_snapshots_alone(
+    tmp_path: Path, monkeypatch
+):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "apples.md").write_text(
+        "# Apples\n\napples grow on apple trees in orchards", encoding="utf-8"
+    )
+    (docs / "rivers.md").write_text(
+        "# Rivers\n\nrivers flow from mountains to the sea", encoding="utf-8"
+    )
+    dataset = tmp_path / "cases.jsonl"
+    dataset.write_text(
+        '{"question": "where do apples grow", "expected": "apples.md"}\n',
+        encoding="utf-8",
+    )
+
+    # A live serving deployment: published snapshots and a NumPy working index
+    snapshots = tmp_path / "serving" / "snapshots"
+    snapshots.mkdir(parents=True)
+    (snapshots / "CURRENT").write_text("v-live\n", encoding="utf-8")
+    numpy_index = tmp_path / "serving" / "numpy_index"
+    monkeypatch.setattr(settings, "vector_db_type", "snapshot")
+    monkeypatch.setattr(settings, "snapshot_path", str(snapshots))
+    monkeypatch.setattr(settings, "numpy_index_path", str(numpy_index))
+    monkeypatch.setattr(settings, "chromadb_path", str(tmp_path / "serving" / "chroma"))
+    monkeypatch.setattr(settings, "similarity_threshold", 0.0)
+
+    async def _initialize():
+        return None
+
+    monkeypatch.setattr(embedding_service, "initialize", _initialize)
+    monkeypatch.setattr(embedding_service, "embed_texts", _bag_of_words)
+    monkeypatch.setattr(embedding_service, "_query_cache", OrderedDict())
+
+    report = await run_retrieval_benchmark(dataset, docs_path=docs, top_k=1)
+
+    assert report["queries"][0]["retrieved"][0] == "apples.md"
+    assert sorted(p.name for p in snapshots.iterdir()) == ["CURRENT"]
+    assert (snapshots / "CURRENT").read_text(encoding="utf-8") == "v-live\n"
+    assert not numpy_index.exists()
+    assert settings.snapshot_path == str(snapshots)
+    assert settings.numpy_index_path == str(numpy_index)
@@ -0,0 +1,182 @@
+"""
+Tests for markdown chunking.
+"""
+
+import random
+import re
+
+import pytest
+
+from ai_service.models.document import DocumentMetadata
+from ai_service.utils.chunking import ChunkingConfig, MarkdownChunker
+
+
+def _legacy_find_good_break_point(
+    chunker: MarkdownChunker, content: str, start: int, end: int
+) -> int:
+    """Reference copy of the original (quadratic) break point search."""
+    code_blocks = list(chunker.code_block_pattern.finditer(content))
+    for match in code_blocks:
+        if match.start() <= start < match.end() or match.start() <= end < match.end():
+            if start < match.start():
+                return match.start()
+            else:
+                return match.end()
+
+    search_area = content[start:end]
+    paragraph_breaks = [m.start() + start for m in re.finditer(r"\n\n", search_area)]
+    if paragraph_breaks:
+        return paragraph_breaks[-1] + 2
+
+    sentence_endings = [
+        m.start() + start for m in re.finditer(r"[.!?]\s+", search_area)
+    ]
+    if sentence_endings:
+        return sentence_endings[-1] + 1
+
+    line_breaks = [m.start() + start for m in re.finditer(r"\n", search_area)]
+    if line_breaks:
+        return line_breaks[-1] + 1
+
+    word_boundaries = [m.start() + start for m in re.finditer(r"\s+", search_area)]
+    if word_boundaries:
+        return word_boundaries[-1]
+
+    return end
+
+
+class _LegacyChunker(MarkdownChunker):
+    def _find_good_break_point(self, content, start, end, code_spans=None):
+        return _legacy_find_good_break_point(self, content, start, end)
+
+
+def _random_markdown(seed: int, size: int) -> str:
+    rng = random.Random(seed)
+    pieces = [
+        "Vite serves source files over native ESM. ",
+        "配置文件位于项目根目录。",
+        "Is HMR fast? Yes!  ",
+        "word",
+        " ",
+        "\t",
+        "\n",
+        "\n\n",
+        "\n\n\n",
+        "\n\n\n\n\n",
+        "e.g.",
+        "...",
+        "```js\nexport default { server: { port: 3000 } }\n```",
+        "```\nunterminated",
+        "- list item\n",
+        "x" * 120,
+    ]
+    out = []
+    length = 0
+    while length < size:
+        piece = rng.choice(pieces)
+        out.append(piece)
+        length += len(piece)
+    return "".join(out)
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_break_point_matches_legacy(seed: int):
+    chunker = MarkdownChunker()
+    content = _random_markdown(seed, 3000)
+    spans = chunker._find_code_spans(content)
+    rng = random.Random(seed)
+    for _ in range(200):
+        start = rng.randrange(0, len(content) - 1)
+        end = min(len(content) - 1, start + rng.randrange(1, 400))
+        assert chunker._find_good_break_point(content, start, end, spans) == (
+            _legacy_find_good_break_point(chunker, content, start, end)
+        )
+
+
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("max_size, overlap", [(1000, 200), (300, 50), (150, 0)])
+def test_chunk_document_matches_legacy(seed: int, max_size: int, overlap: int):
+    config = ChunkingConfig(max_chunk_size=max_size, chunk_overlap=overlap)
+    content = (
+        "# Title\n\n"
+        + _random_markdown(seed, 6000)
+        + "\n\n## Next\n\n"
+        + _random_markdown(seed + 100, 2000)
+    )
+    metadata = DocumentMetadata(title="Doc")
+
+    expected = _LegacyChunker(config).chunk_document(content, "doc.md", metadata)
+    actual = MarkdownChunker(config).chunk_document(content, "doc.md", metadata)
+
+    assert [(c.content, c.start_char, c.end_char, c.heading) for c in actual] == [
+        (c.content, c.start_char, c.end_char, c.heading) for c in expected
+    ]
+
+
+class _WhitespaceTokenizer:
+    """Minimal tokenizer exposing the transformers offset-mapping API."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=False):
+        self.calls += 1
+        return {"offset_mapping": [m.span() for m in re.finditer(r"\S+", text)]}
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+
+def test_token_chunks_fit_sequence_budget():
+    tokenizer = _WhitespaceTokenizer()
+    config = ChunkingConfig(
+        max_chunk_size=34, chunk_overlap=4, size_unit="tokens", min_chunk_size=1
+    )
+    content = " ".join(f"w{i}." if i % 7 == 6 else f"w{i}" for i in range(300))
+
+    chunks = MarkdownChunker(config, tokenizer=tokenizer).chunk_document(
+        content, "doc.md", DocumentMetadata(title="Doc")
+    )
+
+    assert len(chunks) > 1
+    assert all(len(chunk.content.split()) <= 32 for chunk in chunks)
+    # Consecutive chunks overlap and together cover the whole section
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert nxt.start_char < prev.end_char
+    assert chunks[-1].content.endswith("w299")
+    # The section is tokenized once, not once per chunk
+    assert tokenizer.calls == 1
+
+
+def test_token_chunks_split_code_blocks_longer_than_budget():
+    tokenizer = _WhitespaceTokenizer()
+    config = ChunkingConfig(
+        max_chunk_size=34, chunk_overlap=4, size_unit="tokens", min_chunk_size=1
+    )
+    code = "\n".join(f"const v{i} = {i};" for i in range(60))
+    content = f"Intro text here.\n\n```js\n{code}\n```\n\nOutro text."
+
+    chunks = MarkdownChunker(config, tokenizer=tokenizer).chunk_document(
+        content, "doc.md", DocumentMetadata(title="Doc")
+    )
+
+    assert len(chunks) > 2
+    assert all(len(chunk.content.split()) <= 32 for chunk in chunks)
+    assert chunks[-1].content.endswith("Outro text.")
+
+
+def test_token_mode_skips_tokenizer_for_short_sections():
+    tokenizer = _WhitespaceTokenizer()
+    config = ChunkingConfig(max_chunk_size=256, size_unit="tokens")
+
+    chunks = MarkdownChunker(config, tokenizer=tokenizer).chunk_document(
+        "# Intro\n\nVite is fast.", "doc.md", DocumentMetadata(title="Doc")
+    )
+
+    assert len(chunks) == 1
+    assert tokenizer.calls == 0
+
+
+def test_token_mode_requires_tokenizer():
+    with pytest.raises(ValueError):
+        MarkdownChunker(ChunkingConfig(size_unit="tokens"))
@@ -8,7 +8,8 @@ from unittest.mock import patch, MagicMock
 # Import the main CLI function
 from ai_service import cli
 
-@patch('ai_service.cli.serve_main')
+
+@patch("ai_service.main.main")
 def test_cli_serve_command(mock_serve_main):
     """Test that `serve` command calls the correct function."""
     
@@ -20,8 +21,9 @@ def test_cli_serve_command(mock_serve_main):
     # Verify that the serve function was called with the correct arguments
     mock_serve_main.assert_called_once_with(host='0.0.0.0', port=8001, workers=None)
 
-@patch('ai_service.cli.DocumentIngester')
-@patch('asyncio.run')
+
+@patch("ai_service.services.ingestion.DocumentIngester")
+@patch("asyncio.run")
 def test_cli_ingest_command(mock_asyncio_run, MockDocumentIngester):
     """Test that `ingest` command constructs ingester (no args) and runs ingestion."""
 
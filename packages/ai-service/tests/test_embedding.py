@@ -0,0 +1,155 @@
+"""
+Tests for the array-returning embedding API.
+"""
+
+import numpy as np
+import pytest
+
+from ai_service.config.settings import settings
+from ai_service.services.embedding import (
+    EmbeddingService,
+    encode_bucketed,
+    plan_batches,
+    token_lengths,
+)
+from ai_service.utils.metrics import CACHE_HITS, CACHE_MISSES
+
+
+class _FakeModel:
+    """SentenceTransformer stand-in returning unnormalized float64 vectors."""
+
+    max_seq_length = 128
+
+    @staticmethod
+    def _vector(text):
+        return [len(text), text.count("a"), 0.0, 2.0]
+
+    def encode(self, sentences, convert_to_numpy=True, batch_size=32):
+        if isinstance(sentences, str):
+            return np.array(self._vector(sentences))
+        return np.array([self._vector(s) for s in sentences])
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 4
+
+
+@pytest.fixture
+def service():
+    service = EmbeddingService("fake")
+    service.model = _FakeModel()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_embed_texts_returns_unit_float32_rows(service):
+    embeddings = await service.embed_texts(["abc", "", "de"])
+
+    assert embeddings.shape == (3, 4)
+    assert embeddings.dtype == np.float32
+    assert embeddings.flags["C_CONTIGUOUS"]
+    np.testing.assert_allclose(
+        np.linalg.norm(embeddings[[0, 2]], axis=1), [1.0, 1.0], rtol=1e-6
+    )
+    # Empty texts are not embedded and get zero rows
+    assert not embeddings[1].any()
+
+    assert (await service.embed_texts([])).shape == (0, 4)
+
+
+@pytest.mark.asyncio
+async def test_list_api_wraps_array_api(service):
+    embeddings = await service.embed_texts(["abc", "de"])
+
+    assert await service.embed_batch(["abc", "de"]) == embeddings.tolist()
+    assert await service.embed_text("abc") == pytest.approx(embeddings[0].tolist())
+    assert await service.embed_with_cache("abc") == pytest.approx(
+        service._generate_embedding("abc").tolist()
+    )
+    assert await service.compute_similarity("abc", "abc") == pytest.approx(1.0)
+
+
+@pytest.mark.asyncio
+async def test_embed_queries_reuses_recent_query_embeddings(service, monkeypatch):
+    monkeypatch.setattr(settings, "query_embedding_cache_size", 2)
+    embedded = []
+    embed_texts = service.embed_texts
+
+    async def counting_embed_texts(texts, usage=None):
+        embedded.append(list(texts))
+        return await embed_texts(texts, usage)
+
+    monkeypatch.setattr(service, "embed_texts", counting_embed_texts)
+    hits = CACHE_HITS.labels("query_embedding").get()
+    misses = CACHE_MISSES.labels("query_embedding").get()
+
+    first = await service.embed_queries(["abc", "de"])
+    again = await service.embed_queries(["de", "fgh", "de"])
+
+    np.testing.assert_array_equal(again[[0, 2]], first[[1, 1]])
+    np.testing.assert_array_equal(again, await embed_texts(["de", "fgh", "de"]))
+    assert again.dtype == np.float32 and again.flags["C_CONTIGUOUS"]
+    # Only queries not seen recently are embedded, each once per call
+    assert embedded == [["abc", "de"], ["fgh"]]
+    assert CACHE_HITS.labels("query_embedding").get() - hits == 2
+    assert CACHE_MISSES.labels("query_embedding").get() - misses == 3
+
+    # "abc" was evicted as least recently used
+    await service.embed_queries(["abc"])
+    assert embedded[-1] == ["abc"]
+
+
+def test_plan_batches_sorts_by_length_within_budget():
+    lengths = [50, 10, 200, 12, 48, 11]
+    batches = plan_batches(lengths, token_budget=100, max_batch_size=3)
+
+    assert sorted(i for batch in batches for i in batch) == list(range(len(lengths)))
+    assert batches == [[1, 5, 3], [4, 0], [2]]
+    # The over-budget text still gets a batch of its own
+    for batch in batches[:-1]:
+        assert len(batch) * max(lengths[i] for i in batch) <= 100
+
+
+def test_encode_bucketed_restores_input_order():
+    class _RecordingModel(_FakeModel):
+        def __init__(self):
+            self.batches = []
+
+        def encode(self, sentences, convert_to_numpy=True, batch_size=32):
+            self.batches.append(list(sentences))
+            return super().encode(sentences)
+
+    model = _RecordingModel()
+    texts = ["x" * 400, "aa", "x" * 200, "a"]
+    usage = {}
+    vectors = encode_bucketed(
+        model, texts, token_budget=64, max_batch_size=8, usage=usage
+    )
+
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [len(t) for t in texts]
+    # Short texts share a batch; the long ones are split off
+    assert model.batches[0] == ["aa", "a"]
+    assert len(model.batches) == 3
+    assert usage["tokens"] > 0 and usage["seconds"] >= 0
+
+
+def test_token_lengths_use_the_model_tokenizer():
+    class _Tokenizer:
+        """One token per word plus [CLS]/[SEP], truncated like HF tokenizers."""
+
+        def __call__(self, texts, truncation=False, max_length=None):
+            ids = [[0] * (len(text.split()) + 2) for text in texts]
+            return {
+                "input_ids": [row[:max_length] if truncation else row for row in ids]
+            }
+
+    model = _FakeModel()
+    model.tokenizer = _Tokenizer()
+    assert token_lengths(model, ["a b c", "x" * 400, " ".join(["w"] * 300)]) == [
+        5,
+        3,
+        128,
+    ]
+
+    # Without a tokenizer (e.g. the sidecar client) the estimate is used
+    assert token_lengths(_FakeModel(), ["x" * 400])[0] > 3
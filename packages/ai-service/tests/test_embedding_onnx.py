@@ -0,0 +1,133 @@
+"""
+Tests for the ONNX Runtime embedding backend.
+"""
+
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from ai_service.config.settings import settings
+from ai_service.services import embedding as embedding_module
+from ai_service.services.embedding_onnx import cosine_similarities, pool_embeddings
+
+
+def test_pool_embeddings_ignores_padding():
+    hidden = np.array(
+        [
+            [[1.0, 0.0], [3.0, 2.0], [100.0, 100.0]],
+            [[0.0, 4.0], [2.0, 0.0], [4.0, 2.0]],
+        ],
+        dtype=np.float32,
+    )
+    mask = np.array([[1, 1, 0], [1, 1, 1]])
+
+    np.testing.assert_allclose(pool_embeddings(hidden, mask), [[2.0, 1.0], [2.0, 2.0]])
+    np.testing.assert_allclose(
+        pool_embeddings(hidden, mask, pooling="cls"), hidden[:, 0]
+    )
+    np.testing.assert_allclose(
+        pool_embeddings(hidden, mask, pooling="max"), [[3.0, 2.0], [4.0, 4.0]]
+    )
+
+    normalized = pool_embeddings(hidden, mask, normalize=True)
+    np.testing.assert_allclose(
+        np.linalg.norm(normalized, axis=1), [1.0, 1.0], rtol=1e-6
+    )
+
+    a = np.array([[1.0, 0.0], [1.0, 1.0]])
+    b = np.array([[0.0, 3.0], [2.0, 2.0]])
+    np.testing.assert_allclose(cosine_similarities(a, b), [0.0, 1.0], atol=1e-9)
+
+
+def test_onnx_backend_falls_back_to_torch(monkeypatch):
+    monkeypatch.setattr(settings, "embedding_backend", "onnx")
+    torch_model = object()
+
+    with patch(
+        "ai_service.services.embedding_onnx.load_onnx_model",
+        side_effect=RuntimeError("disagree with torch"),
+    ), patch.object(
+        embedding_module, "load_sentence_transformer", return_value=torch_model
+    ) as load_torch:
+        assert embedding_module.load_embedding_model("some-model") is torch_model
+    load_torch.assert_called_once()
+
+
+@pytest.fixture
+def tiny_sentence_transformer(tmp_path):
+    """A tiny randomly initialised BERT SentenceTransformer saved to disk."""
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("sentence_transformers")
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers import models as st_models
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import BertConfig, BertModel, PreTrainedTokenizerFast
+
+    tokens = [
+        "[PAD]",
+        "[UNK]",
+        "[CLS]",
+        "[SEP]",
+        "[MASK]",
+        *"abcdefghijklmnopqrstuvwxyz?",
+        "vite",
+    ]
+    tokenizer = Tokenizer(
+        models.WordPiece({t: i for i, t in enumerate(tokens)}, unk_token="[UNK]")
+    )
+    tokenizer.normalizer = normalizers.BertNormalizer()
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]", special_tokens=[("[CLS]", 2), ("[SEP]", 3)]
+    )
+    fast = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="[UNK]",
+        pad_token="[PAD]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+    )
+    config = BertConfig(
+        vocab_size=len(tokens),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=64,
+    )
+    BertModel(config).save_pretrained(tmp_path / "bert")
+    fast.save_pretrained(tmp_path / "bert")
+
+    model = SentenceTransformer(
+        modules=[
+            st_models.Transformer(str(tmp_path / "bert"), max_seq_length=32),
+            st_models.Pooling(32),
+            st_models.Normalize(),
+        ]
+    )
+    model.save(str(tmp_path / "st"))
+    return model, str(tmp_path / "st")
+
+
+def test_onnx_export_matches_torch(tiny_sentence_transformer, tmp_path, monkeypatch):
+    from ai_service.services.embedding_onnx import load_onnx_model
+
+    torch_model, model_path = tiny_sentence_transformer
+    monkeypatch.setattr(settings, "embedding_onnx_dir", str(tmp_path / "onnx"))
+
+    texts = ["how do i configure vite?", "hot module replacement", "a"]
+    for quantize in (False, True):
+        model = load_onnx_model(model_path, num_threads=1, quantize=quantize)
+        vectors = model.encode(texts, batch_size=2)
+        assert vectors.shape == (3, 32)
+        assert model.encode(texts[0]).shape == (32,)
+        agreement = cosine_similarities(vectors, torch_model.encode(texts))
+        assert agreement.min() > 0.99
+
+    # A stricter threshold than the export can meet is refused at load time
+    monkeypatch.setattr(settings, "embedding_onnx_min_cosine", 1.5)
+    with pytest.raises(RuntimeError, match="disagree"):
+        load_onnx_model(model_path, quantize=False)
@@ -0,0 +1,130 @@
+"""
+Tests for the shared embedding sidecar and its client.
+"""
+
+import asyncio
+import os
+import tempfile
+from types import SimpleNamespace
+from typing import List
+
+import numpy as np
+import pytest
+import transformers
+
+from ai_service.services.embedding import EmbeddingService
+from ai_service.services.embedding_sidecar import (
+    EmbeddingSidecar,
+    SidecarEmbeddingModel,
+)
+
+
+class _FakeModel:
+    """Deterministic stand-in for SentenceTransformer that records batches."""
+
+    max_seq_length = 128
+
+    def __init__(self):
+        self.batches: List[List[str]] = []
+
+    def encode(self, texts, convert_to_numpy=True, batch_size=32):
+        self.batches.append(list(texts))
+        return np.array(
+            [[len(t), float(i), 1.0] for i, t in enumerate(texts)], dtype=np.float32
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 3
+
+
+@pytest.fixture
+def socket_path():
+    # Unix socket paths are length-limited, so avoid pytest's deep tmp_path
+    with tempfile.TemporaryDirectory(dir="/tmp") as directory:
+        yield os.path.join(directory, "embed.sock")
+
+
+@pytest.mark.asyncio
+async def test_sidecar_batches_requests_from_all_clients(socket_path):
+    model = _FakeModel()
+    sidecar = EmbeddingSidecar(
+        socket_path, model_name="fake", batch_wait=0.05, model=model
+    )
+    await sidecar.start()
+    try:
+        client = await asyncio.to_thread(SidecarEmbeddingModel, socket_path, 5)
+        assert client.model_name == "fake"
+        assert client.max_seq_length == 128
+        assert client.get_sentence_embedding_dimension() == 3
+
+        # Each call runs on its own executor thread (and connection)
+        results = await asyncio.gather(
+            asyncio.to_thread(client.encode, ["a", "bb"]),
+            asyncio.to_thread(client.encode, "ccc"),
+        )
+
+        assert len(model.batches) == 1
+        assert sorted(model.batches[0]) == ["a", "bb", "ccc"]
+        assert results[0].shape == (2, 3)
+        assert results[0][:, 0].tolist() == [1.0, 2.0]
+        assert results[1].shape == (3,)
+        assert results[1][0] == 3.0
+    finally:
+        await sidecar.stop()
+    assert not os.path.exists(socket_path)
+
+
+@pytest.mark.asyncio
+async def test_sidecar_reports_encode_errors(socket_path):
+    model = _FakeModel()
+
+    def failing_encode(*args, **kwargs):
+        raise ValueError("boom")
+
+    model.encode = failing_encode
+    sidecar = EmbeddingSidecar(
+        socket_path, model_name="fake", batch_wait=0, model=model
+    )
+    await sidecar.start()
+    try:
+        client = await asyncio.to_thread(SidecarEmbeddingModel, socket_path, 5)
+        with pytest.raises(RuntimeError, match="boom"):
+            await asyncio.to_thread(client.encode, ["x"])
+    finally:
+        await sidecar.stop()
+
+
+@pytest.mark.asyncio
+async def test_client_loads_the_sidecar_models_tokenizer_locally(
+    socket_path, monkeypatch
+):
+    model = _FakeModel()
+    model.tokenizer = SimpleNamespace(name_or_path="/models/fake")
+    loaded = []
+
+    def from_pretrained(path):
+        loaded.append(path)
+        return SimpleNamespace(name_or_path=path)
+
+    monkeypatch.setattr(transformers.AutoTokenizer, "from_pretrained", from_pretrained)
+    sidecar = EmbeddingSidecar(
+        socket_path, model_name="fake", batch_wait=0, model=model
+    )
+    await sidecar.start()
+    try:
+        client = await asyncio.to_thread(SidecarEmbeddingModel, socket_path, 5)
+        service = EmbeddingService("fake")
+        service.model = client
+
+        # Token-based chunking works the same as with a local model
+        assert service.get_tokenizer().name_or_path == "/models/fake"
+        assert service.get_tokenizer() is client.tokenizer
+        assert service.get_max_seq_length() == 128
+        assert loaded == ["/models/fake"]
+    finally:
+        await sidecar.stop()
+
+
+def test_client_gives_up_when_sidecar_is_missing(socket_path):
+    with pytest.raises(OSError):
+        SidecarEmbeddingModel(socket_path, connect_timeout=0)
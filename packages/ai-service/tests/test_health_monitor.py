@@ -0,0 +1,77 @@
+"""
+Tests for the cached background health monitor.
+"""
+
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from ai_service.services.health_monitor import HealthMonitor
+
+
+@pytest.fixture
+def dependencies():
+    with patch(
+        "ai_service.services.health_monitor.vector_store.count_documents",
+        new_callable=AsyncMock,
+    ) as count, patch(
+        "ai_service.services.health_monitor.llm_service.check_health",
+        new_callable=AsyncMock,
+    ) as llm_health, patch(
+        "ai_service.services.health_monitor.embedding_service.model", object()
+    ):
+        count.return_value = 42
+        llm_health.return_value = {"status": "healthy", "model": "m"}
+        yield count, llm_health
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_cached_between_refreshes(dependencies):
+    count, llm_health = dependencies
+    monitor = HealthMonitor(interval=60, timeout=1, check_llm=True)
+
+    first = await monitor.get_snapshot()
+    second = await monitor.get_snapshot()
+
+    assert first is second
+    assert first.status == "healthy"
+    assert first.documents_indexed == 42
+    assert count.await_count == 1
+    assert llm_health.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_llm_failure_degrades_but_stays_ready(dependencies):
+    _, llm_health = dependencies
+    llm_health.side_effect = RuntimeError("provider down")
+    monitor = HealthMonitor(interval=60, timeout=1, check_llm=True)
+
+    snapshot = await monitor.refresh()
+
+    assert snapshot.llm_status == "unhealthy"
+    assert snapshot.status == "degraded"
+    assert snapshot.ready
+
+
+@pytest.mark.asyncio
+async def test_vector_store_failure_is_not_ready(dependencies):
+    count, llm_health = dependencies
+    count.side_effect = RuntimeError("chroma unavailable")
+    monitor = HealthMonitor(interval=60, timeout=1, check_llm=False)
+
+    snapshot = await monitor.refresh()
+
+    assert not snapshot.ready
+    assert snapshot.status == "unhealthy"
+    assert snapshot.llm_status == "unknown"
+    llm_health.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_start_and_stop(dependencies):
+    monitor = HealthMonitor(interval=60, timeout=1, check_llm=False)
+
+    await monitor.start()
+    assert monitor._snapshot is not None
+    await monitor.stop()
+    assert monitor._task is None
@@ -0,0 +1,107 @@
+"""
+Tests for HNSW parameters, index rebuilds and the HNSW sweep benchmark.
+"""
+
+import numpy as np
+import pytest
+
+from ai_service.benchmarks.hnsw import (
+    exact_neighbors,
+    recall_at_k,
+    run_hnsw_benchmark,
+    synthetic_vectors,
+)
+from ai_service.config.settings import settings
+from ai_service.services.vector_store import VectorStoreService, active_collection_name
+
+pytest.importorskip("chromadb")
+
+
+@pytest.fixture
+def chroma_settings(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "chromadb_path", str(tmp_path / "chroma"))
+    monkeypatch.setattr(settings, "collection_name", "rebuild_test")
+    return settings
+
+
+@pytest.mark.asyncio
+async def test_rebuild_copies_into_new_collection_and_switches(
+    chroma_settings, monkeypatch
+):
+    store = VectorStoreService()
+    await store.initialize()
+    assert store.collection.metadata["hnsw:M"] == 16
+
+    vectors = synthetic_vectors(120, 16)
+    ids = [f"chunk-{i}" for i in range(120)]
+    metadatas = [
+        {"document_path": f"doc{i % 5}.md", "chunk_index": i} for i in range(120)
+    ]
+    await store._write(ids, vectors, metadatas, [f"text {i}" for i in range(120)])
+    before, _, _ = await store._query(vectors[7:8], n_results=3, where=None)
+
+    # One multi-query call returns each query's own neighbours
+    rows = [[], []]
+    batch = await store._query_batch(
+        vectors[7:9], n_results=3, where=None, embeddings=rows
+    )
+    second, _, _ = await store._query(vectors[8:9], n_results=3, where=None)
+    assert [documents for documents, _, _ in batch] == [before, second]
+    np.testing.assert_allclose(rows[1][0], vectors[8], rtol=1e-5)
+
+    monkeypatch.setattr(settings, "hnsw_m", 32)
+    monkeypatch.setattr(settings, "hnsw_search_ef", 64)
+    result = await store.rebuild_collection(drop_old=True, page_size=50)
+
+    assert result["previous"] == "rebuild_test"
+    assert result["count"] == 120
+    assert active_collection_name() == result["collection"]
+    after, metadatas_after, _ = await store._query(
+        vectors[7:8], n_results=3, where=None
+    )
+    assert after == before and metadatas_after[0]["chunk_index"] == 7
+
+    # A freshly started service opens the rebuilt collection
+    reopened = VectorStoreService()
+    await reopened.initialize()
+    assert reopened.collection.name == result["collection"]
+    assert reopened.collection.metadata["hnsw:M"] == 32
+    assert reopened.collection.metadata["hnsw:search_ef"] == 64
+    assert await reopened.count_documents() == 120
+    assert "rebuild_test" not in [c.name for c in reopened.client.list_collections()]
+
+
+def test_exact_neighbors_and_recall():
+    vectors = synthetic_vectors(200, 8, seed=1)
+    exact = exact_neighbors(vectors, vectors[:5], k=3)
+
+    assert exact[:, 0].tolist() == [0, 1, 2, 3, 4]
+    assert recall_at_k(exact.tolist(), exact) == 1.0
+    assert recall_at_k([[0, -1, -1]], exact[:1]) == pytest.approx(1 / 3)
+
+
+@pytest.mark.asyncio
+async def test_hnsw_sweep_reports_recall_and_latency_per_combination(tmp_path):
+    report = await run_hnsw_benchmark(
+        m_values=[8, 16],
+        construction_ef_values=[50],
+        search_ef_values=[10, 100],
+        k=5,
+        queries=20,
+        synthetic=500,
+        dim=16,
+        output=tmp_path / "hnsw.json",
+    )
+
+    rows = report["summary"]
+    assert [(r["M"], r["search_ef"]) for r in rows] == [
+        (8, 10),
+        (8, 100),
+        (16, 10),
+        (16, 100),
+    ]
+    for row in rows:
+        assert 0.0 < row["recall@5"] <= 1.0
+        assert row["latency_ms"]["p50"] > 0
+    assert report["meta"]["vectors"] == 500
+    assert (tmp_path / "hnsw.json").exists()
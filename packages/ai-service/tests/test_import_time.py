@@ -0,0 +1,60 @@
+"""
+Import-time budget checks.
+Runs ``python -X importtime`` in a subprocess and parses its report so that
+heavy dependencies stay out of the CLI and service import paths.
+"""
+
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+PACKAGE_ROOT = Path(__file__).resolve().parents[1]
+
+# Modules that must only load when a command or request actually needs them
+HEAVY_MODULES = {"torch", "sentence_transformers", "transformers", "chromadb"}
+
+# Cumulative import time allowed for the CLI entry point (generous for slow CI)
+CLI_IMPORT_BUDGET_MS = 500
+
+
+def _import_profile(module: str) -> Dict[str, int]:
+    """Return {module name: cumulative import microseconds} for ``import module``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PACKAGE_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    profile: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split(":", 1)[1].split("|")
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "ai_service.cli",
+        "ai_service.main",
+        "ai_service.migrations",
+        "ai_service.services.embedding",
+        "ai_service.services.vector_store",
+    ],
+)
+def test_import_does_not_load_heavy_dependencies(module):
+    profile = _import_profile(module)
+    assert module in profile
+    assert not HEAVY_MODULES & set(profile)
+
+
+def test_cli_import_within_budget():
+    profile = _import_profile("ai_service.cli")
+    assert "fastapi" not in profile
+    assert profile["ai_service.cli"] / 1000 < CLI_IMPORT_BUDGET_MS
@@ -7,6 +7,7 @@ import tempfile
 from pathlib import Path
 from unittest.mock import AsyncMock, patch
 
+import numpy as np
 import pytest
 
 from ai_service.services.ingestion import DocumentIngester, compute_file_hash
@@ -28,3 +29,41 @@ async def test_compute_file_hash_changes_on_content(tmp_path: Path):
     # Change model -> different hash
     h3 = compute_file_hash(file_path, cfg, "model-B")
     assert h2 != h3
+
+
+@pytest.mark.asyncio
+async def test_batch_embeds_changed_files_together(tmp_path: Path):
+    for name in ("a.md", "b.md", "c.md"):
+        (tmp_path / name).write_text(f"# {name}\n\nContent of {name}", encoding="utf-8")
+
+    embedding = AsyncMock()
+    embedding.model_name = "model-A"
+    embedding.embed_texts.side_effect = lambda texts, usage=None: np.arange(
+        len(texts), dtype=np.float32
+    ).reshape(-1, 1)
+    vector = AsyncMock()
+    vector.upsert_documents.side_effect = (
+        lambda path, chunks, file_hash, embeddings=None: len(chunks)
+    )
+
+    ingester = DocumentIngester(str(tmp_path), embedding=embedding, vector=vector)
+    unchanged_hash = compute_file_hash(
+        tmp_path / "b.md", ingester.chunking_config, "model-A"
+    )
+    vector.get_document_hash.side_effect = lambda path: (
+        unchanged_hash if path.endswith("b.md") else None
+    )
+
+    stats = await ingester._process_file_batch_upsert(sorted(tmp_path.glob("*.md")))
+
+    # One embedding call for both changed files; b.md is never embedded
+    embedding.embed_texts.assert_awaited_once()
+    assert stats["files_processed"] == 2
+    assert stats["files_skipped"] == 1
+    upserted = [call.args[0] for call in vector.upsert_documents.await_args_list]
+    assert [Path(p).name for p in upserted] == ["a.md", "c.md"]
+    rows = [
+        call.kwargs["embeddings"].ravel().tolist()
+        for call in vector.upsert_documents.await_args_list
+    ]
+    assert rows[0] + rows[1] == list(range(len(rows[0]) + len(rows[1])))
@@ -0,0 +1,100 @@
+"""
+Tests for the keyword matcher, intent rules and the intent benchmark.
+"""
+
+import json
+import random
+
+import pytest
+
+from ai_service.benchmarks.intent import run_intent_benchmark, substring_matches
+from ai_service.config.settings import settings
+from ai_service.services.intent import IntentRules, load_intent_rules
+from ai_service.services.rag import RAGPipeline
+from ai_service.utils.keyword_matcher import KeywordMatcher
+
+
+def test_matcher_agrees_with_substring_scans_on_overlapping_keywords():
+    table = {
+        "release": ["release", "released", "se"],
+        "config": ["config", "vite.config", "server.proxy", "proxy", "vs", "versus"],
+        "zh": ["发布", "变更", "发"],
+    }
+    matcher = KeywordMatcher(table)
+
+    assert matcher.matches("Released: vite.CONFIG server.proxy") == frozenset(
+        {"release", "released", "se", "config", "vite.config", "server.proxy", "proxy"}
+    )
+    assert matcher.match_classes("vsversus 发布说明") == {
+        "config": frozenset({"vs", "versus"}),
+        "zh": frozenset({"发布", "发"}),
+    }
+    assert matcher.matches("") == frozenset()
+
+    rng = random.Random(0)
+    alphabet = "aceilnoprsvx.发布变更 "
+    for _ in range(300):
+        text = "".join(rng.choices(alphabet, k=rng.randint(0, 40)))
+        assert matcher.match_classes(text) == substring_matches(table, text)
+
+
+def test_default_rules_classify_by_priority():
+    rules = load_intent_rules()
+
+    # Configuration outranks the other intents it overlaps with
+    assert rules.classify("Vite 5 proxy config release") == "configuration"
+    assert rules.classify("Vite vs webpack performance") == "performance"
+    assert rules.classify("为什么 Vite 这么快") == "performance"
+    assert rules.classify("Vite 5 发布了哪些新特性") == "version_release"
+    assert rules.classify("Tell me a joke") == "general"
+    assert "release_terms" in rules.content_matches("Breaking change in this release")
+
+
+def test_custom_rules_file_replaces_keywords(tmp_path, monkeypatch):
+    path = tmp_path / "rules.json"
+    path.write_text(
+        json.dumps({"intents": {"ssr": ["ssr", "服务端渲染"]}, "content": {}}),
+        encoding="utf-8",
+    )
+    monkeypatch.setattr(settings, "intent_rules_path", str(path))
+
+    pipeline = RAGPipeline()
+    assert pipeline._analyze_query_intent("How does SSR work?") == "ssr"
+    assert pipeline._analyze_query_intent("configure the proxy") == "general"
+
+    # A broken rules file falls back to the built-in rules
+    path.write_text(json.dumps({"intents": ["ssr"]}), encoding="utf-8")
+    assert RAGPipeline()._analyze_query_intent("configure the proxy") == "configuration"
+    with pytest.raises(ValueError):
+        load_intent_rules(path)
+
+
+def test_intent_benchmark_reports_agreement(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "guide.md").write_text(
+        "Use server.proxy in vite.config.ts. This release has a breaking change.\n"
+        * 40,
+        encoding="utf-8",
+    )
+
+    report = run_intent_benchmark(
+        docs_path=docs,
+        extra_keywords=[0, 50],
+        repeat=1,
+        output=tmp_path / "intent.json",
+    )
+
+    rows = report["summary"]
+    assert [row["extra_keywords_per_class"] for row in rows] == [0, 50]
+    assert rows[1]["query_keywords"] > rows[0]["query_keywords"]
+    for row in rows:
+        assert row["classify"]["mismatches"] == 0
+        assert row["content"]["mismatches"] == 0
+        assert row["content"]["texts"] == report["meta"]["chunks"] > 0
+    assert (tmp_path / "intent.json").exists()
+
+
+def test_intent_rules_accept_empty_content():
+    rules = IntentRules({"configuration": ["config"]})
+    assert rules.content_matches("config") == {}
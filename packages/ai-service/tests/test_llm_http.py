@@ -0,0 +1,96 @@
+"""
+Tests for the LLM HTTP client: pooling, pre-warming, timeouts and closing.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from ai_service.benchmarks.stub_llm import StubConfig, create_stub_app
+from ai_service.config.settings import settings
+from ai_service.services import llm as llm_module
+from ai_service.services.llm import LLMService
+from ai_service.services.llm_http import build_http_client
+from ai_service.utils.metrics import registry
+
+
+@pytest.fixture
+def stub_service(monkeypatch: pytest.MonkeyPatch):
+    def make(config: StubConfig) -> LLMService:
+        app = create_stub_app(config)
+        monkeypatch.setattr(
+            llm_module,
+            "build_http_client",
+            lambda provider="default": build_http_client(
+                provider, transport=httpx.ASGITransport(app=app)
+            ),
+        )
+        monkeypatch.setattr(settings, "api_key", "stub")
+        monkeypatch.setattr(settings, "base_url", "http://stub/v1")
+        monkeypatch.setattr(settings, "model", "stub-model")
+        return LLMService()
+
+    return make
+
+
+@pytest.mark.asyncio
+async def test_client_uses_pool_and_closes(
+    stub_service, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "llm_prewarm_connections", 2)
+    service = stub_service(
+        StubConfig(ttft_ms=0, tokens_per_second=0, completion_tokens=3)
+    )
+
+    await service.initialize()
+    http_client = service.openai_client._client
+    assert isinstance(http_client, httpx.AsyncClient)
+    assert http_client.timeout.connect == settings.llm_connect_timeout
+    assert http_client.timeout.read == settings.llm_read_timeout
+
+    text = await service.generate_response(
+        [{"role": "user", "content": "hi"}], stream=True
+    )
+    assert text
+    assert (
+        'ai_service_llm_http_requests_in_flight{provider="default"} 0'
+        in registry.render()
+    )
+
+    await service.close()
+    assert service.openai_client is None
+    assert http_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_stream_first_byte_timeout(stub_service, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(settings, "llm_prewarm_connections", 0)
+    monkeypatch.setattr(settings, "llm_first_byte_timeout", 0.05)
+    service = stub_service(StubConfig(ttft_ms=1000, jitter=0))
+
+    with pytest.raises(asyncio.TimeoutError):
+        await service.generate_response(
+            [{"role": "user", "content": "hi"}], stream=True
+        )
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_check_health_does_not_request_a_completion(
+    stub_service, monkeypatch: pytest.MonkeyPatch
+):
+    monkeypatch.setattr(settings, "llm_prewarm_connections", 0)
+    service = stub_service(StubConfig(ttft_ms=0, jitter=0))
+    await service.initialize()
+
+    async def no_completions(*args, **kwargs):
+        raise AssertionError("health check requested a completion")
+
+    monkeypatch.setattr(
+        service.openai_client.chat.completions, "create", no_completions
+    )
+
+    result = await service.check_health()
+    assert result == {"status": "healthy", "model": "stub-model"}
+    await service.close()
@@ -0,0 +1,200 @@
+"""
+Tests for LLM provider routing: hedging, retries and circuit breaking.
+"""
+
+import asyncio
+import random
+from types import SimpleNamespace
+from typing import List, Optional
+
+import httpx
+import openai
+import pytest
+
+from ai_service.services.llm_router import (
+    CircuitBreaker,
+    ProviderEndpoint,
+    ProviderRouter,
+)
+
+
+def _chunk(content: Optional[str]):
+    return SimpleNamespace(
+        choices=[SimpleNamespace(delta=SimpleNamespace(content=content))]
+    )
+
+
+class _FakeStream:
+    def __init__(self, tokens: List[str], delay: float):
+        self._tokens = list(tokens)
+        self._delay = delay
+        self.closed = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._delay:
+            await asyncio.sleep(self._delay)
+            self._delay = 0
+        if not self._tokens:
+            raise StopAsyncIteration
+        return _chunk(self._tokens.pop(0))
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeClient:
+    """Chat client whose calls fail or respond after a delay, per script."""
+
+    def __init__(
+        self, name: str, delay: float = 0.0, errors: Optional[List[Exception]] = None
+    ):
+        self.name = name
+        self.delay = delay
+        self.errors = list(errors or [])
+        self.calls = 0
+        self.streams: List[_FakeStream] = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    async def _create(self, **kwargs):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        if kwargs.get("stream"):
+            stream = _FakeStream([f"{self.name}-1", f"{self.name}-2"], self.delay)
+            self.streams.append(stream)
+            return stream
+        await asyncio.sleep(self.delay)
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=self.name))]
+        )
+
+
+def _status_error(cls, status: int):
+    request = httpx.Request("POST", "http://llm/v1/chat/completions")
+    response = httpx.Response(status, request=request, headers={"retry-after": "0"})
+    return cls("upstream error", response=response, body=None)
+
+
+def _router(*clients, **kwargs) -> ProviderRouter:
+    endpoints = [
+        ProviderEndpoint(name=client.name, client=client, weight=weight)
+        for client, weight in zip(clients, [1.0] + [0.0001] * (len(clients) - 1))
+    ]
+    options = dict(hedge_default_delay=0.05, backoff_base=0.001, rng=random.Random(1))
+    options.update(kwargs)
+    return ProviderRouter(endpoints, **options)
+
+
+@pytest.mark.asyncio
+async def test_slow_primary_is_hedged_and_cancelled():
+    slow, fast = _FakeClient("slow", delay=1.0), _FakeClient("fast")
+    router = _router(slow, fast)
+
+    response = await router.complete({"model": "m", "messages": []})
+
+    assert response.choices[0].message.content == "fast"
+    assert slow.calls == 1 and fast.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_hedge_forwards_only_the_winner():
+    slow, fast = _FakeClient("slow", delay=1.0), _FakeClient("fast")
+    router = _router(slow, fast)
+
+    tokens = [
+        chunk.choices[0].delta.content
+        async for chunk in router.stream({"messages": []})
+    ]
+
+    assert tokens == ["fast-1", "fast-2"]
+    assert slow.streams[0].closed
+    assert fast.streams[0].closed
+
+
+@pytest.mark.asyncio
+async def test_retryable_errors_are_retried():
+    flaky = _FakeClient(
+        "flaky",
+        errors=[
+            _status_error(openai.RateLimitError, 429),
+            _status_error(openai.InternalServerError, 500),
+        ],
+    )
+    router = _router(flaky, hedge=False, max_retries=2)
+
+    response = await router.complete({"messages": []})
+
+    assert response.choices[0].message.content == "flaky"
+    assert flaky.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_non_retryable_errors_fail_fast():
+    broken = _FakeClient("broken", errors=[_status_error(openai.BadRequestError, 400)])
+    router = _router(broken, hedge=False, max_retries=3)
+
+    with pytest.raises(openai.BadRequestError):
+        await router.complete({"messages": []})
+    assert broken.calls == 1
+    assert router.endpoints[0].breaker.failures == 0
+
+
+@pytest.mark.asyncio
+async def test_open_circuit_routes_to_healthy_endpoint():
+    down = _FakeClient(
+        "down", errors=[_status_error(openai.InternalServerError, 503)] * 2
+    )
+    healthy = _FakeClient("healthy")
+    router = _router(down, healthy, hedge=False, max_retries=0)
+    router.endpoints[0].breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+
+    with pytest.raises(openai.InternalServerError):
+        await router.complete({"messages": []})
+    assert router.endpoints[0].breaker.state == "open"
+
+    response = await router.complete({"messages": []})
+    assert response.choices[0].message.content == "healthy"
+    assert down.calls == 1
+
+
+def test_circuit_breaker_half_open_trial():
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+
+    breaker.begin()
+    assert not breaker.available()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.available()
+
+
+def test_hedge_delay_follows_latency_percentile():
+    endpoint = ProviderEndpoint(name="p", client=None)
+    router = ProviderRouter([endpoint], hedge_min_delay=0.1, hedge_default_delay=2.0)
+    assert router.hedge_delay(endpoint, "stream") == 2.0
+
+    endpoint.latencies["stream"].extend([0.2] * 95 + [5.0] * 5)
+    assert router.hedge_delay(endpoint, "stream") == 5.0
+    endpoint.latencies["stream"].extend([0.01] * 200)
+    assert router.hedge_delay(endpoint, "stream") == 0.1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_slow_attempts_are_kept_as_latency_samples():
+    slow, fast = _FakeClient("slow", delay=1.0), _FakeClient("fast")
+    router = _router(slow, fast, hedge_min_delay=0.02)
+    slow_endpoint = router.endpoints[0]
+    slow_endpoint.latencies["complete"].extend([0.01] * 20)
+
+    response = await router.complete({"messages": []})
+
+    assert response.choices[0].message.content == "fast"
+    # The losing attempt ran past the deadline: its elapsed time is a sample
+    assert len(slow_endpoint.latencies["complete"]) == 21
+    assert slow_endpoint.latencies["complete"][-1] >= 0.02
+    assert len(router.endpoints[1].latencies["complete"]) == 1
@@ -5,6 +5,7 @@ import pytest
 
 from ai_service.config.settings import settings
 from ai_service.services.llm import LLMService
+from ai_service.services.llm_router import ProviderEndpoint, ProviderRouter
 
 
 class _FakeStream:
@@ -58,7 +59,9 @@ class _FakeOpenAIClient:
 def _build_service(tokens: List[str], full_response: str, monkeypatch: pytest.MonkeyPatch) -> LLMService:
     service = LLMService()
     service._initialized = True
-    service.openai_client = _FakeOpenAIClient(tokens=tokens, full_response=full_response)  # type: ignore[assignment]
+    client = _FakeOpenAIClient(tokens=tokens, full_response=full_response)
+    service.router = ProviderRouter([ProviderEndpoint(name="default", client=client)])
+    service.openai_client = client  # type: ignore[assignment]
 
     monkeypatch.setattr(
         settings,
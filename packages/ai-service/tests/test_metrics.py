@@ -0,0 +1,65 @@
+"""
+Tests for the metrics registry and stage timing.
+"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai_service.api import metrics as metrics_api
+from ai_service.utils.metrics import STAGE_DURATION, MetricsRegistry
+from ai_service.utils.timing import stage_timer
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram(
+        "test_seconds", "Test.", ["stage"], buckets=(0.1, 1.0)
+    )
+    child = histogram.labels("embed")
+    for value in (0.05, 0.1, 0.5, 3.0):
+        child.observe(value)
+
+    text = registry.render()
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{stage="embed",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{stage="embed",le="1"} 3' in text
+    assert 'test_seconds_bucket{stage="embed",le="+Inf"} 4' in text
+    assert 'test_seconds_count{stage="embed"} 4' in text
+    assert histogram.labels("embed") is child
+
+
+def test_counter_and_gauge():
+    registry = MetricsRegistry()
+    counter = registry.counter("test_total", "Test.", ["intent"])
+    counter.labels("general").inc()
+    counter.labels("general").inc(2)
+    gauge = registry.gauge("test_gauge", "Test.")
+    gauge.set_function(lambda: 7)
+
+    text = registry.render()
+    assert 'test_total{intent="general"} 3' in text
+    assert "test_gauge 7" in text
+
+
+def test_stage_timer_records_histogram_and_timings():
+    timings = {}
+    with stage_timer(timings, "unit_test"):
+        pass
+    with stage_timer(None, "unit_test"):
+        pass
+
+    counts, _ = STAGE_DURATION.labels("unit_test").snapshot()
+    assert sum(counts) == 2
+    assert "unit_test" in timings
+
+
+def test_metrics_endpoint():
+    app = FastAPI()
+    app.include_router(metrics_api.router)
+    with stage_timer(None, "embed"):
+        pass
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'ai_service_stage_duration_seconds_count{stage="embed"}' in response.text
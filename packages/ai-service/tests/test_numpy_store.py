@@ -0,0 +1,143 @@
+"""
+Tests for the memory-mapped NumPy vector store.
+"""
+
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+
+from ai_service.config.settings import settings
+from ai_service.models.document import DocumentChunk, DocumentMetadata
+from ai_service.services import vector_store as vector_store_module
+from ai_service.services.numpy_store import MANIFEST_FILE, NumpyVectorStore
+
+
+def _chunks(path: str, count: int, author: str = "") -> list:
+    return [
+        DocumentChunk(
+            chunk_id=f"{path}#{i}",
+            document_path=path,
+            title=path,
+            content=f"{path} chunk {i}",
+            chunk_index=i,
+            start_char=0,
+            end_char=10,
+            metadata=DocumentMetadata(title=path, author=author or None),
+            word_count=3,
+        )
+        for i in range(count)
+    ]
+
+
+def _unit(*rows) -> np.ndarray:
+    array = np.array(rows, dtype=np.float32)
+    return array / np.linalg.norm(array, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return NumpyVectorStore(str(tmp_path))
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_by_cosine_and_applies_filters(store, monkeypatch):
+    await store.upsert_documents(
+        "a.md", _chunks("a.md", 2, "ann"), "h-a", _unit([1, 0, 0], [0.6, 0.8, 0])
+    )
+    await store.upsert_documents(
+        "b.md", _chunks("b.md", 2), "h-b", _unit([0, 1, 0], [0, 0, 1])
+    )
+
+    assert await store.count_documents() == 4
+    assert await store.list_document_paths() == ["a.md", "b.md"]
+    assert await store.get_document_hash("b.md") == "h-b"
+
+    documents, _, scores = await store._query(
+        _unit([1, 0.1, 0]), n_results=3, where=None
+    )
+    assert documents == ["a.md chunk 0", "a.md chunk 1", "b.md chunk 0"]
+    assert scores == sorted(scores, reverse=True)
+
+    documents, metadatas, _ = await store._query(
+        _unit([0, 1, 0]), n_results=5, where={"author": {"$ne": "ann"}}
+    )
+    assert {m["document_path"] for m in metadatas} == {"b.md"}
+    documents, _, _ = await store._query(
+        _unit([0, 1, 0]),
+        n_results=5,
+        where={"$or": [{"chunk_index": 1}, {"document_path": {"$in": ["b.md"]}}]},
+    )
+    assert documents == ["b.md chunk 0", "a.md chunk 1", "b.md chunk 1"]
+
+    monkeypatch.setattr(
+        vector_store_module.embedding_service,
+        "embed_queries",
+        AsyncMock(return_value=_unit([0, 0, 1])),
+    )
+    results = await store.search_similar("query", similarity_threshold=0.5)
+    assert [(chunk.chunk_id, round(score, 3)) for chunk, score in results] == [
+        ("b.md#1", 1.0)
+    ]
+
+    # Stored embeddings of the results, gathered across segments
+    embeddings = {}
+    await store.search_similar("query", similarity_threshold=0.0, embeddings=embeddings)
+    assert sorted(embeddings) == ["a.md#0", "a.md#1", "b.md#0", "b.md#1"]
+    np.testing.assert_allclose(embeddings["a.md#1"], _unit([0.6, 0.8, 0])[0])
+    np.testing.assert_allclose(embeddings["b.md#1"], [0, 0, 1])
+
+    # Several queries scored in one product give the single-query results
+    queries = _unit([1, 0.1, 0], [0, 0, 1])
+    batch_embeddings = [{}, {}]
+    batch = await store.search_similar_batch(
+        queries, similarity_threshold=0.0, embeddings=batch_embeddings
+    )
+    for row, results in enumerate(batch):
+        single = await store.search_similar(
+            "query", similarity_threshold=0.0, query_embeddings=queries[row : row + 1]
+        )
+        assert [(c.chunk_id, s) for c, s in results] == [
+            (c.chunk_id, s) for c, s in single
+        ]
+        assert sorted(batch_embeddings[row]) == sorted(c.chunk_id for c, _ in single)
+
+
+@pytest.mark.asyncio
+async def test_updates_survive_reload_and_compaction(store, tmp_path):
+    await store.upsert_documents(
+        "a.md", _chunks("a.md", 3), "h1", _unit([1, 0], [1, 1], [0, 1])
+    )
+    await store.upsert_documents("b.md", _chunks("b.md", 1), "h1", _unit([1, 0]))
+    # Replacing a.md tombstones its old rows and appends a new segment
+    await store.upsert_documents("a.md", _chunks("a.md", 1), "h2", _unit([0, 1]))
+    assert await store.count_documents() == 2
+    assert await store.get_document_hash("a.md") == "h2"
+
+    await store.optimize()
+    assert len(store._state.segments) == 1 and not store._state.deleted
+
+    reopened = NumpyVectorStore(str(tmp_path))
+    assert await reopened.count_documents() == 2
+    assert isinstance(reopened._state.blocks[0], np.memmap)
+    documents, _, _ = await reopened._query(_unit([0, 1]), n_results=1, where=None)
+    assert documents == ["a.md chunk 0"]
+
+    # Only the manifest and live segments remain on disk
+    index_dir = tmp_path / settings.collection_name
+    assert sorted(p.name for p in index_dir.iterdir()) == sorted(
+        [MANIFEST_FILE, *reopened._state.segments]
+    )
+
+    assert await reopened.delete_documents("b.md") == 1
+    assert await reopened.clear_collection()
+    assert await NumpyVectorStore(str(tmp_path)).count_documents() == 0
+
+
+def test_factory_selects_backend(monkeypatch):
+    monkeypatch.setattr(settings, "vector_db_type", "numpy")
+    assert isinstance(vector_store_module.create_vector_store(), NumpyVectorStore)
+
+    monkeypatch.setattr(settings, "vector_db_type", "milvus")
+    with pytest.raises(ValueError):
+        vector_store_module.create_vector_store()
@@ -0,0 +1,181 @@
+"""
+Tests for token counting and token-budgeted prompt assembly.
+"""
+
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+
+from ai_service.models.chat import ChatMessage, ChatRequest
+from ai_service.models.document import DocumentChunk, DocumentMetadata
+from ai_service.services.llm import LLMService
+from ai_service.services.rag import RAGPipeline
+from ai_service.utils.metrics import LLM_PROMPT_TOKENS
+from ai_service.utils.tokens import count_tokens, truncate_to_tokens
+
+
+def _chunk(index: int, content: str) -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=f"docs/guide.md#{index}",
+        document_path="../../docs/guide.md",
+        title=f"Guide {index}",
+        content=content,
+        chunk_index=index,
+        start_char=0,
+        end_char=len(content),
+        metadata=DocumentMetadata(),
+        word_count=len(content.split()),
+        token_count=count_tokens(content),
+    )
+
+
+def test_count_and_truncate_tokens():
+    text = "vite " * 200
+    assert count_tokens("") == 0
+    assert count_tokens(text) > count_tokens("vite " * 20)
+
+    truncated = truncate_to_tokens(text, 10)
+    assert truncated.endswith("…")
+    assert count_tokens(truncated) <= 11
+    assert truncate_to_tokens("short", 10) == "short"
+
+
+def test_build_context_drops_lowest_scored_chunks_first():
+    pipeline = RAGPipeline()
+    chunks = [
+        (_chunk(0, "alpha " * 100), 0.70),
+        (_chunk(1, "bravo " * 100), 0.95),
+        (_chunk(2, "delta " * 100), 0.80),
+    ]
+    one_chunk = count_tokens(pipeline._build_context(chunks[1:2], max_tokens=0))
+
+    context = pipeline._build_context(chunks, max_tokens=one_chunk * 2 + 20)
+
+    assert "bravo" in context and "delta" in context
+    assert "alpha" not in context
+    # Kept chunks are ordered by chunk id and renumbered
+    assert context.index("Document 1: Guide 1") < context.index("Document 2: Guide 2")
+
+
+def test_build_context_truncates_single_oversized_chunk():
+    pipeline = RAGPipeline()
+    chunks = [(_chunk(0, "kilo " * 1000), 0.9)]
+
+    context = pipeline._build_context(chunks, max_tokens=100)
+
+    assert "Document 1: Guide 0" in context
+    assert count_tokens(context) <= 105
+
+
+def test_build_history_keeps_latest_turn_and_truncates_older_ones(monkeypatch):
+    monkeypatch.setattr(
+        "ai_service.services.rag.settings.history_message_max_tokens", 5
+    )
+    pipeline = RAGPipeline()
+    history = [
+        ChatMessage(role="user", content="old question " * 50),
+        ChatMessage(role="assistant", content="old answer " * 50),
+        ChatMessage(role="user", content="latest question " * 10),
+        ChatMessage(role="assistant", content="latest answer " * 10),
+    ]
+
+    messages = pipeline._build_history(history, max_tokens=0)
+    assert [m["role"] for m in messages] == ["user", "assistant", "user", "assistant"]
+    assert messages[-1]["content"] == "latest answer " * 10
+    assert messages[0]["content"].endswith("…") and len(messages[0]["content"]) < 40
+
+    budget = count_tokens(messages[-1]["content"]) + 4
+    assert pipeline._build_history(history, max_tokens=budget) == messages[-1:]
+
+
+def test_build_messages_is_prefix_stable():
+    pipeline = RAGPipeline()
+    first, second = _chunk(0, "alpha"), _chunk(1, "bravo")
+    history = [
+        ChatMessage(role="user", content="What is Vite?"),
+        ChatMessage(role="assistant", content="A build tool."),
+    ]
+
+    messages = pipeline._build_messages(
+        "And HMR?", [(first, 0.9), (second, 0.8)], history
+    )
+    reordered = pipeline._build_messages(
+        "And HMR?", [(second, 0.95), (first, 0.7)], history
+    )
+    other = pipeline._build_messages("Other question", [(second, 0.5)], [])
+
+    # Identical retrievals render byte-identical prompts regardless of rank or score
+    assert messages == reordered
+    # Static instructions come first and never contain request data
+    assert (
+        messages[0] == other[0] == {"role": "system", "content": pipeline.system_prompt}
+    )
+    assert [m["role"] for m in messages] == [
+        "system",
+        "system",
+        "user",
+        "assistant",
+        "user",
+    ]
+    assert messages[-1] == {"role": "user", "content": "And HMR?"}
+
+
+@pytest.mark.asyncio
+async def test_tokens_used_prefers_provider_usage(monkeypatch):
+    pipeline = RAGPipeline()
+    monkeypatch.setattr(
+        pipeline,
+        "_retrieve_documents",
+        AsyncMock(return_value=[(_chunk(0, "echo"), 0.9)]),
+    )
+    monkeypatch.setattr(
+        pipeline, "_ensure_conversation_exists", AsyncMock(return_value="conv")
+    )
+    monkeypatch.setattr(
+        "ai_service.services.rag.conversation_store.append_message", AsyncMock()
+    )
+
+    async def fake_generate(*, usage=None, **kwargs):
+        usage.update(prompt_tokens=120, completion_tokens=30, total_tokens=150)
+        return "answer"
+
+    monkeypatch.setattr(
+        "ai_service.services.rag.llm_service.generate_response", fake_generate
+    )
+    response = await pipeline.process_chat_request(
+        ChatRequest(question="What is Vite?")
+    )
+    assert response.tokens_used == 150
+
+    monkeypatch.setattr(
+        "ai_service.services.rag.llm_service.generate_response",
+        AsyncMock(return_value="answer"),
+    )
+    response = await pipeline.process_chat_request(
+        ChatRequest(question="What is Vite?")
+    )
+    assert response.tokens_used and response.tokens_used > count_tokens("answer")
+
+
+def test_record_usage_counts_cached_prompt_tokens():
+    cached_before = LLM_PROMPT_TOKENS.labels("cached").value
+    uncached_before = LLM_PROMPT_TOKENS.labels("uncached").value
+    reported = SimpleNamespace(
+        prompt_tokens=1200,
+        completion_tokens=80,
+        total_tokens=1280,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=1024),
+    )
+
+    usage: dict = {}
+    LLMService._record_usage(usage, reported)
+
+    assert usage == {
+        "prompt_tokens": 1200,
+        "completion_tokens": 80,
+        "total_tokens": 1280,
+        "cached_tokens": 1024,
+    }
+    assert LLM_PROMPT_TOKENS.labels("cached").value - cached_before == 1024
+    assert LLM_PROMPT_TOKENS.labels("uncached").value - uncached_before == 176
@@ -3,16 +3,21 @@ Unit tests for the RAG (Retrieval-Augmented Generation) pipeline service.
 Focuses on testing individual, isolated methods.
 """
 
-import pytest
-from unittest.mock import MagicMock, AsyncMock, ANY
+import asyncio
 from types import SimpleNamespace
+from unittest.mock import ANY, AsyncMock, MagicMock
+
+import numpy as np
+import pytest
 
-from ai_service.services.rag import RAGPipeline
-from ai_service.models.document import DocumentChunk, DocumentMetadata
-from ai_service.models.chat import ChatRequest
 from ai_service.config.settings import settings
-from ai_service.services.llm import llm_service
+from ai_service.models.chat import ChatRequest
+from ai_service.models.document import DocumentChunk, DocumentMetadata
 from ai_service.services.conversation_store import conversation_store
+from ai_service.services.llm import llm_service
+from ai_service.services.rag import RAGPipeline
+from ai_service.utils.mmr import maximal_marginal_relevance
+
 
 @pytest.fixture
 def rag_pipeline() -> RAGPipeline:
@@ -68,6 +73,9 @@ class TestRAGPipelineUnit:
         mock_chunk.document_path = path
         mock_chunk.title = "Test Title"
         mock_chunk.content = content
+        # Keyword matching needs real strings, not auto-created mock attributes
+        mock_chunk.heading = None
+        mock_chunk.relative_path = ""
         
         boost = rag_pipeline._calculate_intent_relevance_boost(
             chunk=mock_chunk,
@@ -78,6 +86,230 @@ class TestRAGPipelineUnit:
         assert boost == pytest.approx(expected_boost, abs=1e-9)
 
 
+def _pool_chunk(path: str, index: int = 0) -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=f"{path}#{index}",
+        document_path=path,
+        title=path,
+        content=f"{path} chunk {index}",
+        chunk_index=index,
+        start_char=0,
+        end_char=10,
+        metadata=DocumentMetadata(),
+        word_count=3,
+    )
+
+
+class TestRetrievalCandidatePool:
+    """Candidate pool sizing, widening and the variant fallback."""
+
+    @pytest.fixture
+    def search(self, monkeypatch):
+        search = AsyncMock()
+        monkeypatch.setattr(
+            "ai_service.services.rag.vector_store.search_similar", search
+        )
+        monkeypatch.setattr(
+            "ai_service.services.rag.embedding_service.embed_queries",
+            AsyncMock(return_value="query-embedding"),
+        )
+        return search
+
+    def test_pool_size_follows_requested_k_and_learned_duplicate_rate(
+        self, rag_pipeline
+    ):
+        assert rag_pipeline._candidate_pool_size(3) == 9
+        assert rag_pipeline._candidate_pool_size(1) == 3
+
+        # Searches returning many chunks per page raise the estimate
+        pool = [(_pool_chunk("a.md", i), 0.9) for i in range(10)]
+        for _ in range(10):
+            rag_pipeline._observe_duplicate_rate(pool)
+        assert rag_pipeline._candidate_pool_size(3) > 9
+
+    @pytest.mark.asyncio
+    async def test_full_pool_of_one_document_is_widened_once(
+        self, rag_pipeline, search
+    ):
+        crowded = [(_pool_chunk("a.md", i), 0.95 - i * 0.01) for i in range(9)]
+        widened = crowded + [(_pool_chunk("b.md"), 0.8), (_pool_chunk("c.md"), 0.78)]
+        search.side_effect = [crowded, widened]
+
+        results = await rag_pipeline._retrieve_documents(
+            "configure the dev server proxy"
+        )
+
+        assert [chunk.document_path for chunk, _ in results] == ["a.md", "b.md", "c.md"]
+        assert [call.kwargs["n_candidates"] for call in search.await_args_list] == [
+            9,
+            36,
+        ]
+        # The query is embedded once and reused for the wider search
+        assert all(
+            call.kwargs["query_embeddings"] == "query-embedding"
+            for call in search.await_args_list
+        )
+
+    @pytest.mark.asyncio
+    async def test_pool_cut_by_threshold_goes_straight_to_variants(
+        self, rag_pipeline, search
+    ):
+        search.side_effect = [
+            [(_pool_chunk("a.md"), 0.9)],
+            [(_pool_chunk("b.md"), 0.85)],
+            [(_pool_chunk("c.md"), 0.8)],
+        ]
+
+        results = await rag_pipeline._retrieve_documents(
+            "configure the dev server proxy"
+        )
+
+        assert len(results) == 3
+        queries = [call.kwargs["query"] for call in search.await_args_list]
+        assert queries == [
+            "configure the dev server proxy",
+            "configure vite proxy",
+            "vite server proxy configuration",
+        ]
+        assert search.await_args_list[1].kwargs["query_embeddings"] is None
+
+    @pytest.mark.asyncio
+    async def test_batch_embeds_and_searches_once_then_filters_per_query(
+        self, rag_pipeline, search, monkeypatch
+    ):
+        embed = AsyncMock(return_value=np.eye(2, dtype=np.float32))
+        monkeypatch.setattr(
+            "ai_service.services.rag.embedding_service.embed_queries", embed
+        )
+        batch_search = AsyncMock(
+            return_value=[
+                [
+                    (_pool_chunk("a.md"), 0.9),
+                    (_pool_chunk("b.md"), 0.85),
+                    (_pool_chunk("c.md"), 0.8),
+                ],
+                [(_pool_chunk("d.md", i), 0.9 - i * 0.01) for i in range(9)],
+            ]
+        )
+        monkeypatch.setattr(
+            "ai_service.services.rag.vector_store.search_similar_batch", batch_search
+        )
+        search.return_value = [
+            (_pool_chunk("d.md"), 0.9),
+            (_pool_chunk("e.md"), 0.8),
+            (_pool_chunk("f.md"), 0.75),
+        ]
+        timings, query_timings = {}, [{}, {}]
+
+        results = await rag_pipeline._retrieve_documents_batch(
+            ["what is hmr", "what is ssr"], timings=timings, query_timings=query_timings
+        )
+
+        embed.assert_awaited_once_with(["what is hmr", "what is ssr"])
+        batch_search.assert_awaited_once()
+        assert [[chunk.document_path for chunk, _ in r] for r in results] == [
+            ["a.md", "b.md", "c.md"],
+            ["d.md", "e.md", "f.md"],
+        ]
+        # Only the second query's one-document pool was widened, with its own embedding
+        assert search.await_count == 1
+        np.testing.assert_array_equal(
+            search.await_args.kwargs["query_embeddings"], [[0, 1]]
+        )
+        assert "embed" in timings and "embed" not in query_timings[0]
+        assert "post_filter" in query_timings[0] and "post_filter" in query_timings[1]
+
+    @pytest.mark.asyncio
+    async def test_batch_selects_queries_concurrently(self, rag_pipeline, monkeypatch):
+        embed = AsyncMock(return_value=np.eye(3, dtype=np.float32))
+        monkeypatch.setattr(
+            "ai_service.services.rag.embedding_service.embed_queries", embed
+        )
+        monkeypatch.setattr(
+            "ai_service.services.rag.vector_store.search_similar_batch",
+            AsyncMock(return_value=[[], [], []]),
+        )
+        started = asyncio.Event()
+        in_flight = []
+
+        async def select(query, *args, **kwargs):
+            in_flight.append(query)
+            if len(in_flight) == 3:
+                started.set()
+            # Only returns once every query has started
+            await asyncio.wait_for(started.wait(), 1)
+            if query == "b":
+                raise RuntimeError("rerank failed")
+            return [(_pool_chunk(f"{query}.md"), 0.9)]
+
+        monkeypatch.setattr(rag_pipeline, "_select_documents", select)
+
+        results = await rag_pipeline._retrieve_documents_batch(["a", "b", "c"])
+
+        assert [[chunk.document_path for chunk, _ in r] for r in results] == [
+            ["a.md"],
+            [],
+            ["c.md"],
+        ]
+
+
+class TestMaximalMarginalRelevance:
+    """MMR selection over stored candidate embeddings."""
+
+    @staticmethod
+    def _unit(*rows):
+        array = np.array(rows, dtype=np.float32)
+        return array / np.linalg.norm(array, axis=1, keepdims=True)
+
+    def test_mmr_skips_near_duplicates(self):
+        embeddings = self._unit([1, 0, 0], [1, 0.01, 0], [0, 1, 0])
+        relevance = [0.9, 0.89, 0.8]
+
+        assert maximal_marginal_relevance(relevance, embeddings, 2, 1.0) == [0, 1]
+        assert maximal_marginal_relevance(relevance, embeddings, 2, 0.5) == [0, 2]
+        assert maximal_marginal_relevance(relevance, embeddings, 5, 0.5) == [0, 2, 1]
+        assert maximal_marginal_relevance([], embeddings[:0], 3) == []
+
+    def test_post_filter_keeps_neighbouring_chunks_and_drops_mirrors(
+        self, rag_pipeline, monkeypatch
+    ):
+        monkeypatch.setattr(settings, "similarity_threshold", 0.5)
+        monkeypatch.setattr(settings, "retrieval_mmr_lambda", 0.5)
+        intro, details = _pool_chunk("guide.md", 0), _pool_chunk("guide.md", 1)
+        mirror = _pool_chunk("mirror/guide.md", 0)
+        results = [(intro, 0.9), (mirror, 0.89), (details, 0.85)]
+        embeddings = dict(
+            zip(
+                [intro.chunk_id, mirror.chunk_id, details.chunk_id],
+                self._unit([1, 0, 0], [1, 0.01, 0], [0.5, 1, 0]),
+            )
+        )
+
+        selected = rag_pipeline._post_filter_results(
+            results, query_intent="general", max_results=2, embeddings=embeddings
+        )
+        assert [chunk.chunk_id for chunk, _ in selected] == ["guide.md#0", "guide.md#1"]
+
+        # Without embeddings each document keeps only its best chunk
+        selected = rag_pipeline._post_filter_results(
+            results, query_intent="general", max_results=2
+        )
+        assert [chunk.chunk_id for chunk, _ in selected] == [
+            "guide.md#0",
+            "mirror/guide.md#0",
+        ]
+
+        # An intent-specific lambda can favour relevance over diversity
+        monkeypatch.setattr(settings, "retrieval_mmr_intent_lambdas", {"general": 1.0})
+        selected = rag_pipeline._post_filter_results(
+            results, query_intent="general", max_results=2, embeddings=embeddings
+        )
+        assert [chunk.chunk_id for chunk, _ in selected] == [
+            "guide.md#0",
+            "mirror/guide.md#0",
+        ]
+
+
 class TestRAGPipelineConversationFlow:
     """Focused tests for conversation persistence logic."""
 
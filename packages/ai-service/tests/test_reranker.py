@@ -0,0 +1,203 @@
+"""
+Tests for the cross-encoder rerank stage.
+"""
+
+import asyncio
+import time
+from unittest.mock import AsyncMock
+
+import numpy as np
+import pytest
+
+from ai_service.config.settings import settings
+from ai_service.models.document import DocumentChunk, DocumentMetadata
+from ai_service.services import reranker as reranker_module
+from ai_service.services.rag import RAGPipeline
+from ai_service.services.reranker import RerankerService
+from ai_service.utils.metrics import CACHE_HITS, CACHE_MISSES
+
+
+def _chunk(path: str, content: str = "") -> DocumentChunk:
+    return DocumentChunk(
+        chunk_id=f"{path}#0",
+        document_path=path,
+        title=path,
+        content=content or path,
+        chunk_index=0,
+        start_char=0,
+        end_char=10,
+        metadata=DocumentMetadata(),
+        word_count=1,
+    )
+
+
+class _FakeCrossEncoder:
+    """Scores a pair by how often the query's words occur in the passage."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    def predict(self, pairs, batch_size=32, show_progress_bar=False):
+        self.calls.append([passage for _, passage in pairs])
+        time.sleep(self.delay)
+        return np.array(
+            [
+                sum(passage.count(word) for word in query.split())
+                for query, passage in pairs
+            ],
+            dtype=np.float32,
+        )
+
+
+@pytest.fixture
+def service():
+    service = RerankerService("fake")
+    service.model = _FakeCrossEncoder()
+    return service
+
+
+@pytest.mark.asyncio
+async def test_scores_are_cached_per_query_and_chunk(service):
+    chunks = [_chunk("a.md", "proxy proxy"), _chunk("b.md", "alias")]
+
+    scores = await service.rerank_scores("proxy", chunks)
+    assert scores == {"a.md#0": 2.0, "b.md#0": 0.0}
+
+    hits, misses = (
+        CACHE_HITS.labels("rerank").get(),
+        CACHE_MISSES.labels("rerank").get(),
+    )
+    more = chunks + [_chunk("c.md", "proxy")]
+    assert (await service.rerank_scores("proxy", more))["c.md#0"] == 1.0
+    assert CACHE_HITS.labels("rerank").get() - hits == 2
+    assert CACHE_MISSES.labels("rerank").get() - misses == 1
+    # Only the chunk not scored for this query went to the model
+    assert service.model.calls == [["proxy proxy", "alias"], ["proxy"]]
+
+    await service.rerank_scores("alias", chunks[:1])
+    assert len(service.model.calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_budget_overrun_returns_none_and_fills_cache_later(service, monkeypatch):
+    service.model = _FakeCrossEncoder(delay=0.2)
+    chunks = [_chunk("a.md", "proxy")]
+
+    assert await service.rerank_scores("proxy", chunks, budget_ms=20) is None
+
+    await asyncio.sleep(0.3)
+    assert await service.rerank_scores("proxy", chunks, budget_ms=20) == {"a.md#0": 1.0}
+
+
+@pytest.mark.asyncio
+async def test_missing_model_loads_in_background(monkeypatch):
+    model = _FakeCrossEncoder()
+    monkeypatch.setattr(reranker_module, "load_reranker_model", lambda name: model)
+    service = RerankerService("fake")
+
+    assert await service.rerank_scores("proxy", [_chunk("a.md")]) is None
+    await service._load_task
+    assert service.model is model
+
+
+@pytest.mark.asyncio
+async def test_pipeline_orders_by_rerank_scores(service, monkeypatch):
+    monkeypatch.setattr(settings, "rerank_enabled", True)
+    monkeypatch.setattr(settings, "similarity_threshold", 0.5)
+    monkeypatch.setattr("ai_service.services.rag.reranker_service", service)
+    monkeypatch.setattr(
+        "ai_service.services.rag.embedding_service.embed_queries",
+        AsyncMock(return_value=np.zeros((1, 4), dtype=np.float32)),
+    )
+    monkeypatch.setattr(
+        "ai_service.services.rag.vector_store.search_similar",
+        AsyncMock(
+            return_value=[
+                (_chunk("a.md", "about plugins"), 0.9),
+                (_chunk("b.md", "dev server proxy setup"), 0.8),
+                (_chunk("c.md", "proxy"), 0.7),
+            ]
+        ),
+    )
+    pipeline = RAGPipeline()
+    timings = {}
+
+    results = await pipeline._retrieve_documents("dev server proxy", timings=timings)
+
+    assert [chunk.document_path for chunk, _ in results] == ["b.md", "c.md", "a.md"]
+    assert "rerank" in timings
+
+    # Over budget: the heuristic order is kept
+    monkeypatch.setattr(service, "rerank_scores", AsyncMock(return_value=None))
+    fallback = await pipeline._retrieve_documents("dev server proxy")
+    assert [chunk.document_path for chunk, _ in fallback] == ["a.md", "b.md", "c.md"]
+    # Returned scores stay the intent-adjusted similarities either way
+    assert {c.chunk_id: s for c, s in results} == {c.chunk_id: s for c, s in fallback}
+
+
+def test_onnx_export_matches_torch(tmp_path, monkeypatch):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("sentence_transformers")
+    from tokenizers import Tokenizer, models, normalizers, pre_tokenizers, processors
+    from transformers import (
+        BertConfig,
+        BertForSequenceClassification,
+        PreTrainedTokenizerFast,
+    )
+
+    tokens = [
+        "[PAD]",
+        "[UNK]",
+        "[CLS]",
+        "[SEP]",
+        "[MASK]",
+        *"abcdefghijklmnopqrstuvwxyz?",
+        "vite",
+    ]
+    tokenizer = Tokenizer(
+        models.WordPiece({t: i for i, t in enumerate(tokens)}, unk_token="[UNK]")
+    )
+    tokenizer.normalizer = normalizers.BertNormalizer()
+    tokenizer.pre_tokenizer = pre_tokenizers.BertPreTokenizer()
+    tokenizer.post_processor = processors.TemplateProcessing(
+        single="[CLS] $A [SEP]",
+        pair="[CLS] $A [SEP] $B:1 [SEP]:1",
+        special_tokens=[("[CLS]", 2), ("[SEP]", 3)],
+    )
+    fast = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer,
+        unk_token="[UNK]",
+        pad_token="[PAD]",
+        cls_token="[CLS]",
+        sep_token="[SEP]",
+        mask_token="[MASK]",
+    )
+    config = BertConfig(
+        vocab_size=len(tokens),
+        hidden_size=32,
+        num_hidden_layers=2,
+        num_attention_heads=2,
+        intermediate_size=64,
+        max_position_embeddings=128,
+        num_labels=1,
+    )
+    BertForSequenceClassification(config).save_pretrained(tmp_path / "cross")
+    fast.save_pretrained(tmp_path / "cross")
+
+    monkeypatch.setattr(settings, "embedding_onnx_dir", str(tmp_path / "onnx"))
+    monkeypatch.setattr(settings, "rerank_max_length", 64)
+    model = reranker_module.load_onnx_reranker(str(tmp_path / "cross"), num_threads=1)
+
+    pairs = [
+        ("vite proxy", "configure the proxy"),
+        ("hmr", "hot module replacement"),
+        ("a", "b"),
+    ]
+    torch_scores = reranker_module.load_cross_encoder(str(tmp_path / "cross")).predict(
+        pairs
+    )
+    np.testing.assert_allclose(
+        model.predict(pairs, batch_size=2), torch_scores, atol=1e-4
+    )
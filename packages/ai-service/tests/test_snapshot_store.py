@@ -0,0 +1,92 @@
+"""
+Tests for read-only index snapshots and hot swapping.
+"""
+
+import time
+
+import numpy as np
+import pytest
+
+from ai_service.config.settings import settings
+from ai_service.services import vector_store as vector_store_module
+from ai_service.services.numpy_store import NumpyVectorStore
+from ai_service.services.snapshot_store import (
+    CURRENT_FILE,
+    SnapshotVectorStore,
+    current_version,
+    publish_snapshot,
+    write_snapshot,
+)
+
+
+def _records(count: int, dim: int = 8, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((count, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"chunk-{i}" for i in range(count)]
+    documents = [f"document {i}" for i in range(count)]
+    metadatas = [
+        {"chunk_id": f"c{i}", "document_path": f"doc{i % 7}.md"} for i in range(count)
+    ]
+    return ids, vectors, documents, metadatas
+
+
+@pytest.mark.asyncio
+async def test_snapshot_is_served_read_only_and_hot_swapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "snapshot_reload_interval", 0.0)
+    monkeypatch.setattr(settings, "snapshot_keep", 2)
+    ids, vectors, documents, metadatas = _records(50)
+    first = write_snapshot(tmp_path, ids, vectors, documents, metadatas)
+
+    store = SnapshotVectorStore(str(tmp_path))
+    assert await store.count_documents() == 50
+    assert store.version == first
+    assert isinstance(store._state.blocks[0], np.memmap)
+    found, _, scores = await store._query(vectors[3:4], n_results=1, where=None)
+    assert found == ["document 3"] and scores[0] == pytest.approx(1.0)
+
+    assert await store.add_documents([]) == 0
+    assert await store.delete_documents("doc1.md") == 0
+    assert not await store.clear_collection()
+
+    # A newer snapshot replaces the old one on refresh, without a restart
+    second = write_snapshot(tmp_path, *_records(20, seed=1))
+    assert current_version(tmp_path) == second
+    assert await store.refresh()
+    assert store.version == second
+    assert await store.count_documents() == 20
+
+    third = write_snapshot(tmp_path, *_records(10, seed=2))
+    snapshots = sorted(p.name for p in tmp_path.iterdir() if p.is_dir())
+    assert snapshots == sorted([second, third])
+    assert (tmp_path / CURRENT_FILE).read_text() == third
+
+    # Automatic reload on the query path once the interval has passed
+    monkeypatch.setattr(settings, "snapshot_reload_interval", 0.001)
+    time.sleep(0.002)
+    await store._query(vectors[:1], n_results=1, where=None)
+    assert store.version == third
+
+
+@pytest.mark.asyncio
+async def test_publish_from_working_index_and_fast_startup(tmp_path, monkeypatch):
+    working = NumpyVectorStore(str(tmp_path / "working"))
+    await working.initialize()
+    ids, vectors, documents, metadatas = _records(20000, dim=384)
+    await working._write(ids, vectors, metadatas, documents)
+
+    version = await publish_snapshot(working, tmp_path / "snapshots")
+
+    start = time.perf_counter()
+    store = SnapshotVectorStore(str(tmp_path / "snapshots"))
+    await store.initialize()
+    assert time.perf_counter() - start < 1.0
+    assert store.version == version
+    assert await store.count_documents() == 20000
+    assert await store.get_document_hash("doc3.md") is None
+    assert (await store.get_collection_stats())["snapshot_version"] == version
+
+    # Ingestion writes to the working index while snapshots are served
+    monkeypatch.setattr(vector_store_module, "vector_store", store)
+    writable = vector_store_module.writable_vector_store()
+    assert isinstance(writable, NumpyVectorStore) and not writable.read_only
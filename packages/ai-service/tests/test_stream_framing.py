@@ -0,0 +1,132 @@
+"""
+Tests for chat stream framing and flush coalescing.
+"""
+
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from ai_service.api import chat as chat_api
+from ai_service.utils.stream_framing import coalesce_events, encode_ndjson, encode_sse
+
+
+async def _events(*items, delay: float = 0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def _collect(stream) -> list:
+    return [chunk async for chunk in stream]
+
+
+def test_encoders():
+    event = {"type": "token", "token": "你好"}
+    assert json.loads(encode_ndjson(event)) == event
+    assert encode_ndjson(event).endswith(b"\n")
+
+    frame = encode_sse(event)
+    assert frame.startswith(b"event: token\ndata: ")
+    assert frame.endswith(b"\n\n")
+    assert json.loads(frame.split(b"data: ", 1)[1]) == event
+
+
+@pytest.mark.asyncio
+async def test_coalesce_merges_tokens_and_flushes_before_other_events():
+    events = _events(
+        {"type": "stage", "stage": "generate"},
+        {"type": "token", "token": "Hel"},
+        {"type": "token", "token": "lo"},
+        {"type": "final", "answer": "Hello"},
+    )
+
+    chunks = await _collect(coalesce_events(events, flush_interval=10.0))
+
+    lines = [json.loads(line) for line in b"".join(chunks).splitlines()]
+    assert lines == [
+        {"type": "stage", "stage": "generate"},
+        {"type": "token", "token": "Hello"},
+        {"type": "final", "answer": "Hello"},
+    ]
+    # The merged token and the final event go out in a single write
+    assert len(chunks) == 2
+
+
+@pytest.mark.asyncio
+async def test_coalesce_flushes_on_interval_and_size():
+    slow = _events(*({"type": "token", "token": "x"} for _ in range(3)), delay=0.05)
+    chunks = await _collect(coalesce_events(slow, flush_interval=0.01))
+    assert len(chunks) == 3
+
+    # The first token goes out at once; later ones wait for the interval or size
+    fast = _events(*({"type": "token", "token": "abcd"} for _ in range(4)))
+    chunks = await _collect(coalesce_events(fast, flush_interval=10.0, flush_bytes=8))
+    assert [json.loads(c)["token"] for c in chunks] == ["abcd", "abcdabcd", "abcd"]
+
+
+@pytest.mark.asyncio
+async def test_coalesce_iterates_source_in_the_caller_task():
+    tasks = []
+
+    async def source():
+        for token in "abc":
+            tasks.append(asyncio.current_task())
+            yield {"type": "token", "token": token}
+
+    chunks = await _collect(coalesce_events(source(), flush_interval=10.0))
+
+    assert b"".join(chunks).count(b'"type":"token"') == 2
+    assert tasks == [asyncio.current_task()] * 3
+
+
+@pytest.mark.asyncio
+async def test_coalesce_disabled_writes_each_event():
+    events = _events({"type": "token", "token": "a"}, {"type": "token", "token": "b"})
+    chunks = await _collect(coalesce_events(events, flush_interval=0))
+    assert [json.loads(c)["token"] for c in chunks] == ["a", "b"]
+
+
+def test_chat_stream_sse_format():
+    app = FastAPI()
+    app.include_router(chat_api.router, prefix="/api")
+
+    async def stream_chat(request):
+        yield {"type": "token", "token": "o"}
+        yield {"type": "token", "token": "k"}
+        yield {"type": "final", "answer": "ok"}
+
+    with patch.object(chat_api.rag_pipeline, "stream_chat", new=stream_chat):
+        client = TestClient(app)
+        response = client.post(
+            "/api/chat/stream",
+            json={"question": "hi"},
+            headers={"Accept": "text/event-stream"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "event: token\ndata: " in response.text
+        tokens = [
+            json.loads(frame.split("data: ", 1)[1])["token"]
+            for frame in response.text.split("\n\n")
+            if frame.startswith("event: token")
+        ]
+        assert "".join(tokens) == "ok"
+
+        ndjson = client.post("/api/chat/stream?format=ndjson", json={"question": "hi"})
+        assert ndjson.headers["content-type"].startswith("application/x-ndjson")
+        assert json.loads(ndjson.text.splitlines()[-1]) == {
+            "type": "final",
+            "answer": "ok",
+        }
+
+        assert (
+            client.post(
+                "/api/chat/stream?format=xml", json={"question": "hi"}
+            ).status_code
+            == 400
+        )
@@ -92,6 +92,21 @@ export interface VectorSearchResponse {
   took_ms: number;
 }
 
+export interface VectorSearchBatchRequest {
+  queries: string[];
+  top_k?: number;
+}
+
+export interface VectorSearchBatchResponse {
+  results: {
+    query: string;
+    sources: SourceReference[];
+    timings_ms: Record<string, number>;
+  }[];
+  timings_ms: Record<string, number>;
+  took_ms: number;
+}
+
 export interface ConversationInfo {
   id: string;
   title: string;
@@ -248,6 +263,18 @@ class AIApiClient {
     return response.data;
   }
 
+  /**
+   * Vector search for several queries (e.g. prefetched suggestions) in one request
+   */
+  async vectorSearchBatch(request: VectorSearchBatchRequest): Promise<VectorSearchBatchResponse> {
+    const response = await axios.post<VectorSearchBatchResponse>(
+      `${this.baseURL}/vector-search/batch`,
+      request,
+      { headers: { 'Content-Type': 'application/json' }, timeout: 15000 }
+    );
+    return response.data;
+  }
+
   /**
    * Check AI service health
    */